@@ -0,0 +1,131 @@
+"""
+Request parsing and Server-Sent Events formatting shared by the API servers
+(Flask, ASGI and the multi-worker production server)
+"""
+
+import json
+import os
+import re
+
+# Fill each checkout page with one script execution unless the request says otherwise
+BULK_FILL_DEFAULT = os.getenv('BULK_FILL', '0').lower() in ('1', 'true', 'yes')
+
+# Tabs per job kept busy at once unless the request says otherwise; 1 runs accounts one after another
+PIPELINE_DEPTH_DEFAULT = int(os.getenv('PIPELINE_DEPTH', '1'))
+
+FINAL_STATUSES = ('completed', 'error', 'stopped')
+
+SSE_HEADERS = {
+    'Cache-Control': 'no-cache',
+    'X-Accel-Buffering': 'no'
+}
+
+
+# Account types are signup URL slugs, e.g. 50k-Tradovate
+ACCOUNT_PATTERN = re.compile(r'^[A-Za-z0-9._-]+$')
+MAX_LINE_ITEMS = 20
+
+# Accounts a lineItems order may buy, per line item and in total; well above real jobs (a few hundred),
+# it only stops a malformed order from holding a browser for days. numberOfAccounts requests are not capped
+MAX_ACCOUNTS_PER_JOB = int(os.getenv('MAX_ACCOUNTS_PER_JOB', '5000'))
+
+
+def parse_line_items(data):
+    """Line items of a purchase request as [{'account': ..., 'count': ...}].
+
+    Multi-product orders send lineItems: [{account, count}, ...]; single-product
+    requests send selectedAccount and numberOfAccounts, which become one line item.
+    """
+    capped = 'lineItems' in data
+    if capped:
+        items = data['lineItems']
+        if not isinstance(items, list) or not items:
+            raise ValueError('lineItems must be a non-empty list of {account, count}')
+        if len(items) > MAX_LINE_ITEMS:
+            raise ValueError(f'At most {MAX_LINE_ITEMS} line items per order')
+    else:
+        for field in ('numberOfAccounts', 'selectedAccount'):
+            if field not in data or not data[field]:
+                raise ValueError(f'Missing required field: {field}')
+        items = [{'account': data['selectedAccount'], 'count': data['numberOfAccounts']}]
+    
+    line_items = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f'Line item {index + 1} must be an object with account and count')
+        account = item.get('account')
+        if not isinstance(account, str) or not ACCOUNT_PATTERN.match(account):
+            raise ValueError(f'Line item {index + 1}: invalid account {account!r}')
+        try:
+            count = int(item.get('count'))
+        except (TypeError, ValueError):
+            raise ValueError(f'Line item {index + 1}: count must be an integer')
+        if count < 1:
+            raise ValueError(f'Line item {index + 1}: count must be at least 1')
+        if capped and count > MAX_ACCOUNTS_PER_JOB:
+            raise ValueError(f'Line item {index + 1}: count must be at most {MAX_ACCOUNTS_PER_JOB}')
+        line_items.append({'account': account, 'count': count})
+    if capped and sum(item['count'] for item in line_items) > MAX_ACCOUNTS_PER_JOB:
+        raise ValueError(f'At most {MAX_ACCOUNTS_PER_JOB} accounts per order')
+    return line_items
+
+
+def parse_purchase(data):
+    """Validate a purchase request body and return the run_automation arguments after session_id"""
+    # Validate required fields
+    required_fields = ['username', 'password', 'cardNumber', 'cvv', 'expiryMonth', 'expiryYear']
+    for field in required_fields:
+        if field not in data or not data[field]:
+            raise ValueError(f'Missing required field: {field}')
+    
+    # Extract data
+    username = data['username']
+    password = data['password']
+    card_number = data['cardNumber']
+    card_expired_month = data['expiryMonth']
+    card_expired_year = data['expiryYear']
+    card_code = data['cvv']
+    
+    # One or more {account, count} line items, all bought in the same browser session
+    line_items = parse_line_items(data)
+    loop_count = sum(item['count'] for item in line_items)
+    selected_account = line_items[0]['account']
+    
+    # Optional coupon code from frontend, fallback to .env file
+    coupon_code = data.get('couponCode', os.getenv('COUPON_CODE', 'JAYPELLE'))
+    
+    # Optional single-command form filling, fallback to .env file
+    bulk_fill = bool(data.get('bulkFill', BULK_FILL_DEFAULT))
+    
+    # Optional tab pipelining depth, fallback to .env file
+    try:
+        pipeline_depth = int(data.get('pipelineDepth', PIPELINE_DEPTH_DEFAULT))
+    except (TypeError, ValueError):
+        raise ValueError('pipelineDepth must be an integer')
+    if pipeline_depth < 1:
+        raise ValueError('pipelineDepth must be at least 1')
+    
+    return (username, password, card_number, card_expired_month, card_expired_year, card_code, loop_count, coupon_code, selected_account, bulk_fill, pipeline_depth, line_items)
+
+
+def sse_event(event, data, event_id=None):
+    """Format one Server-Sent Events message"""
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def log_event(record):
+    """SSE message for one log record, with its sequence number as the event id"""
+    return sse_event('log', {'message': record.format(), 'level': record.level,
+                             'iteration': record.iteration, 'step': record.step}, event_id=record.seq)
+
+
+def stream_cursor(headers, args):
+    """Resume point of a reconnecting SSE client (Last-Event-ID header or ?since=)"""
+    try:
+        return int(headers.get('Last-Event-ID') or args.get('since', 0))
+    except ValueError:
+        return 0
@@ -1,18 +1,31 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import threading
 import time
 import os
 import sys
-import uuid
 import random
 from datetime import datetime
-import undetected_chromedriver as uc
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import Select
 from dotenv import load_dotenv
+from browser import create_driver, launch_listeners
+from driver_pool import pool_from_env
+from resource_governor import InsufficientMemoryError, governor_from_env, quit_driver
+from job_scheduler import DuplicateJobError, QueueFullError, scheduler_from_env
+from session_cache import cache_from_env, inject_cookies
+from session_store import SessionStore
+from api_common import FINAL_STATUSES, SSE_HEADERS, log_event, parse_purchase, sse_event, stream_cursor
+from cookie_consent import handle_cookie_consent as reject_cookie_consent
+from metrics import CONTENT_TYPE, Registry
+from log_pipeline import pipeline_from_env, route_logger
+from job_journal import IN_PROGRESS, journal_from_env
+from command_trace import TRACE_DIR, span, start_trace, stop_trace
+from page_readiness import format_navigation, navigate, wait_until_interactive
+from checkout_steps import (
+    BULK_CHECKOUT_STEPS, CHECKOUT_STEPS, SessionExpiredError, classify_error, run_steps, timing_summary, format_timing,
+)
+from tab_pipeline import TabPipeline
 
 # Load environment variables
 load_dotenv()
@@ -20,64 +33,189 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)  # Enable CORS for frontend communication
 
-# Global session storage for multiple users
-sessions = {}
-
-def create_session():
-    """Create a new session with unique ID"""
-    session_id = str(uuid.uuid4())
-    sessions[session_id] = {
-        'status': 'ready',  # ready, processing, completed, error, stopped
-        'logs': [],
-        'current_iteration': 0,
-        'total_iterations': 0,
-        'should_stop': False,
-        'driver': None,
-        'created_at': datetime.now(),
-        'last_activity': datetime.now()
-    }
-    return session_id
+# Dashboard root; point at mock_server.py for offline runs
+APEX_BASE_URL = os.getenv('APEX_BASE_URL', 'https://dashboard.apextraderfunding.com').rstrip('/')
+
+def live_drivers():
+    """Every browser the server still owns: session browsers by session ID plus idle pooled ones"""
+    drivers = {session.session_id: session.driver for session in sessions.values() if session.driver is not None}
+    drivers.update(driver_pool.idle_drivers())
+    return drivers
+
+# Per-job RSS/CPU sampling, free-memory admission and orphaned Chrome reaping
+governor = governor_from_env(live_drivers)
+
+# Pre-launched browsers shared by all jobs; every launch passes the governor's memory check
+driver_pool = pool_from_env(factory=governor.guard(create_driver))
+
+# Bounded queue of purchase jobs; limits concurrent browsers
+scheduler = scheduler_from_env()
+
+# Encrypted per-user cookie jars so repeat jobs can skip login
+session_cache = cache_from_env()
+
+# Flask debugger and reloader for the development server (off by default)
+FLASK_DEBUG = os.getenv('FLASK_DEBUG', '0').lower() in ('1', 'true', 'yes')
+
+# Per-session log ring buffer size and the most records one status call returns
+LOG_BUFFER_CAPACITY = int(os.getenv('LOG_BUFFER_CAPACITY', '1000'))
+# Console/file log output: a background writer drains a queue (LOG_LEVEL, LOG_FILE, LOG_CONSOLE)
+log_pipeline = pipeline_from_env().start()
+STATUS_LOG_LIMIT = int(os.getenv('STATUS_LOG_LIMIT', '200'))
+
+# Prometheus metrics served on /metrics
+metrics = Registry()
+STEP_SECONDS = metrics.histogram('apex_step_duration_seconds', 'Latency of each purchase flow phase', ['step'])
+ITERATIONS = metrics.counter('apex_iterations_total', 'Purchase iterations by result', ['result'])
+RETRIES = metrics.counter('apex_step_retries_total', 'Checkout step retries by step and reason', ['step', 'reason'])
+LAUNCHES = metrics.histogram('apex_browser_launch_seconds', 'Chrome launch time by driver cache result', ['cache'])
+metrics.gauge('apex_active_browsers', 'Browsers currently attached to a job',
+              callback=lambda: sum(1 for session in sessions.values() if session.driver is not None))
+metrics.gauge('apex_queued_jobs', 'Jobs waiting for a browser slot', callback=lambda: scheduler.stats()['queued'])
+metrics.gauge('apex_running_jobs', 'Jobs currently running', callback=lambda: scheduler.stats()['running'])
+metrics.gauge('apex_live_sessions', 'Sessions held by the server', callback=lambda: len(sessions))
+metrics.gauge('apex_idle_pooled_browsers', 'Warm browsers waiting in the pool', callback=lambda: driver_pool.stats()['idle'])
+metrics.gauge('apex_browser_rss_megabytes', 'Resident memory of all sampled browser process trees',
+              callback=governor.total_rss_mb)
+metrics.gauge('apex_free_memory_megabytes', 'Memory available for new browsers', callback=governor.free_memory_mb)
+metrics.counter('apex_orphan_processes_killed_total', 'Orphaned browser processes killed since startup',
+              callback=lambda: governor.orphans_killed)
+metrics.gauge('apex_log_queue_depth', 'Log records waiting for the log writer', callback=log_pipeline.depth)
+
+def record_launch(report):
+    """Time every browser launch, split by whether the driver binary came from the cache"""
+    LAUNCHES.observe(report['launch_seconds'], cache=report['cache'])
+    print(f"[BROWSER] Chrome {report['chrome_version']} launched in {report['launch_seconds']:.2f}s "
+          f"(driver cache {report['cache']})")
+
+launch_listeners.append(record_launch)
+
+# Re-logins allowed per account when the dashboard logs the browser out mid-checkout
+SESSION_RELOGINS = int(os.getenv('SESSION_RELOGINS', '1'))
+
+# Purchase outcome -> result label of the iterations counter
+ITERATION_RESULTS = {
+    'confirmed': 'succeeded',
+    'declined': 'declined',
+    'validation_error': 'invalid',
+}
+
+# Checkout step -> phase label in the latency histogram; unlisted steps are form filling
+STEP_PHASES = {
+    'navigate': 'navigate',
+    'pay': 'pay',
+}
+
+def expire_session(session):
+    """Reaper callback: stop the job and close the browser of an expired session"""
+    session.should_stop = True
+    if scheduler.cancel(session.session_id):
+        forget_job(session.session_id)
+    if session.driver:
+        quit_driver(session.driver, log=lambda message: log_pipeline.emit(f"[REAPER] {message}", 'warning'))
+    log_pipeline.emit(f"[REAPER] Expired session {session.session_id[:8]}...")
+
+# Global session storage for multiple users; idle sessions expire after SESSION_TTL seconds
+SESSION_TTL = float(os.getenv('SESSION_TTL', '3600'))
+sessions = SessionStore(ttl=SESSION_TTL, log_capacity=LOG_BUFFER_CAPACITY, on_expire=expire_session)
+sessions.start_reaper()
+
+# Durable record of queued and running jobs for resuming after a restart (None when JOB_JOURNAL_PATH is empty)
+journal = journal_from_env()
+
+def forget_job(session_id):
+    """Drop a job from the journal once it has ended or been cancelled"""
+    if journal:
+        journal.finish(session_id)
+
+def journal_outcome(session_id, iteration, ctx, result):
+    """Commit one iteration's result to the journal"""
+    if journal:
+        journal.record_iteration(session_id, iteration, ctx['line_item'], ctx['account'], result)
+
+def create_session(session_id=None):
+    """Create a new session with unique ID (or the given one)"""
+    return sessions.create(session_id).session_id
 
 def get_session(session_id):
-    """Get session by ID, create if doesn't exist"""
-    if session_id not in sessions:
-        return None
-    sessions[session_id]['last_activity'] = datetime.now()
-    return sessions[session_id]
-
-def cleanup_old_sessions():
-    """Clean up sessions older than 1 hour"""
-    current_time = datetime.now()
-    expired_sessions = []
-    
-    for session_id, session_data in sessions.items():
-        if (current_time - session_data['last_activity']).total_seconds() > 3600:  # 1 hour
-            expired_sessions.append(session_id)
-    
-    for session_id in expired_sessions:
-        cleanup_session(session_id)
-
-def cleanup_session(session_id):
-    """Clean up a specific session"""
-    if session_id in sessions:
-        session = sessions[session_id]
-        if session['driver']:
-            try:
-                session['driver'].quit()
-            except:
-                pass
-        del sessions[session_id]
-
-def add_log(session_id, message):
-    """Add a log message with timestamp to specific session"""
+    """Get session by ID and mark it active, or None if it doesn't exist"""
+    return sessions.get(session_id)
+
+def discard_session(session_id):
+    """Drop the session of a job the scheduler rejected; it never ran, so there is nothing to stop or close"""
+    sessions.remove(session_id)
+
+def add_log(session_id, message, level='info', step=None):
+    """Add a structured log record to the session's ring buffer"""
     session = get_session(session_id)
     if not session:
         return
         
-    timestamp = datetime.now().strftime('%H:%M:%S')
-    log_entry = f'[{timestamp}] {message}'
-    session['logs'].append(log_entry)
-    print(f"[Session {session_id[:8]}...] {log_entry}")  # Also print to console
+    record = session.logs.append(message, level, session.current_iteration, step)
+    notify_change(session)
+    # Console and file output happen on the log writer thread
+    log_pipeline.emit(message, level, session_id, record.iteration, step, record.timestamp)
+
+def debug(message):
+    """Diagnostic output, written only when LOG_LEVEL=debug"""
+    log_pipeline.emit(message, 'debug')
+
+# Extra callables(session) run on every session change; the ASGI server uses this to wake its event loop
+change_listeners = []
+
+def notify_change(session):
+    """Wake up any event streams watching this session"""
+    with session.changed:
+        session.changed.notify_all()
+    for listener in change_listeners:
+        listener(session)
+
+def set_status(session_id, status):
+    """Update the session status and notify streams"""
+    session = get_session(session_id)
+    if not session:
+        return
+    with session.changed:
+        session.status = status
+    notify_change(session)
+
+def set_iteration(session_id, current, total=None):
+    """Update iteration progress and notify streams"""
+    session = get_session(session_id)
+    if not session:
+        return
+    with session.changed:
+        session.current_iteration = current
+        if total is not None:
+            session.total_iterations = total
+    notify_change(session)
+
+def set_line_items(session_id, line_items):
+    """Start per-product progress tracking for a job's {account, count} line items"""
+    session = get_session(session_id)
+    if not session:
+        return
+    with session.changed:
+        session.line_items = [dict(item, done=0, purchased=0, failed=0, status='pending') for item in line_items]
+    notify_change(session)
+
+def start_line_item(session, index):
+    """Mark a line item as in progress when its first checkout starts"""
+    with session.changed:
+        item = session.line_items[index]
+        if item['status'] == 'pending':
+            item['status'] = 'processing'
+    notify_change(session)
+
+def finish_line_item(session, index, purchased):
+    """Count one finished checkout towards its line item"""
+    with session.changed:
+        item = session.line_items[index]
+        item['done'] += 1
+        item['purchased' if purchased else 'failed'] += 1
+        if item['done'] == item['count']:
+            item['status'] = 'completed'
+    notify_change(session)
 
 def reset_session(session_id):
     """Reset session to initial state"""
@@ -85,382 +223,719 @@ def reset_session(session_id):
     if not session:
         return
         
-    session['status'] = 'ready'
-    session['logs'] = []
-    session['current_iteration'] = 0
-    session['total_iterations'] = 0
-    session['should_stop'] = False
-    if session['driver']:
-        try:
-            session['driver'].quit()
-        except:
-            pass
-    session['driver'] = None
+    if scheduler.cancel(session_id):
+        forget_job(session_id)
+    session.logs.clear()
+    set_status(session_id, 'ready')
+    set_iteration(session_id, 0, 0)
+    session.timings = []
+    session.line_items = []
+    session.should_stop = False
+    if session.driver:
+        quit_driver(session.driver, log=lambda message: add_log(session_id, message, level='warning'))
+    session.driver = None
 
 def handle_cookie_consent(driver, session_id):
-    """Handle cookie consent dialog using shadow DOM"""
-    add_log(session_id, "Looking for cookie consent dialog...")
+    """Reject the cookie consent dialog in one browser round-trip and log the timing report"""
+    report = reject_cookie_consent(driver, log=lambda message: add_log(session_id, message, step='consent'))
+    STEP_SECONDS.observe(report['total_ms'] / 1000, step='consent')
+    return report
+
+def login(driver, session_id, username, password):
+    """Log in through the member page; sets the session status and returns False on failure"""
+    session = get_session(session_id)
+
+    # Navigate to login page
+    add_log(session_id, "Navigating to login page...")
+    report = navigate(driver, f'{APEX_BASE_URL}/member/')
+    STEP_SECONDS.observe(report['time_to_interactive_ms'] / 1000, step='time_to_interactive')
+    add_log(session_id, format_navigation(report))
+
+    # Handle cookie consent
+    handle_cookie_consent(driver, session_id)
+
+    # Check if stop was requested
+    if session.should_stop:
+        add_log(session_id, "Process stopped by user before login.")
+        set_status(session_id, 'stopped')
+        return False
+
+    # Login
+    add_log(session_id, "Logging in...")
+    user_name = driver.find_element(By.ID, "amember-login")
+    user_name.send_keys(username)
+    pwd = driver.find_element(By.ID, "amember-pass")
+    pwd.send_keys(password)
+
+    login_button = driver.find_element(By.CSS_SELECTOR, 'input[type="submit"][value="Login"]')
+    login_page = driver.execute_script('return performance.timeOrigin')
+    login_button.click()
+
+    # Check if login was successful
     try:
-        wait = WebDriverWait(driver, 10)
+        # Wait for the page the login form posts to, instead of a fixed pause
+        report = wait_until_interactive(driver, 'login result', login_page)
+        add_log(session_id, format_navigation(report))
         
-        # First, check for the shadow DOM container
+        # Look for login error messages first
         try:
-            shadow_container = wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div.cf_modal_container")))
-            add_log(session_id, "Cookie consent shadow DOM container detected")
-            
-            # Now try to access the shadow root and find the dialog
-            shadow_root = driver.execute_script("return arguments[0].shadowRoot", shadow_container)
-            if shadow_root:
-                add_log(session_id, "Successfully accessed shadow root")
-                
-                # Look for the dialog inside the shadow root
-                dialog = shadow_root.find_element(By.CSS_SELECTOR, "dialog.cf_modal")
-                if dialog and dialog.get_attribute("open"):
-                    add_log(session_id, "Cookie consent dialog found in shadow DOM")
-                    
-                    # Try multiple selectors to find the reject button
-                    reject_button_selectors = [
-                        "#cf_consent-buttons__reject-all",
-                        "button#cf_consent-buttons__reject-all",
-                        ".cf_button--reject",
-                        "button.cf_button--reject",
-                        "button[class*='reject']",
-                    ]
-                    
-                    reject_button = None
-                    for selector in reject_button_selectors:
-                        try:
-                            button = shadow_root.find_element(By.CSS_SELECTOR, selector)
-                            if button and button.is_displayed():
-                                add_log(session_id, f"Found Reject All button using selector: {selector}")
-                                reject_button = button
-                                break
-                        except:
-                            continue
-                    
-                    # If CSS selectors fail, try finding by text content
-                    if not reject_button:
-                        try:
-                            all_buttons = shadow_root.find_elements(By.TAG_NAME, "button")
-                            for button in all_buttons:
-                                if "reject" in button.text.lower():
-                                    add_log(session_id, f"Found button with 'reject' text: {button.text}")
-                                    reject_button = button
-                                    break
-                        except:
-                            pass
-                    
-                    if reject_button:
-                        add_log(session_id, "Found Reject All button in shadow DOM, clicking it...")
-                        # Click the button using JavaScript
-                        driver.execute_script("arguments[0].click();", reject_button)
-                        add_log(session_id, "Clicked Reject All button")
-                        time.sleep(3)
-                    else:
-                        add_log(session_id, "Reject All button not found in shadow DOM")
-                else:
-                    add_log(session_id, "Dialog not open in shadow DOM")
-            else:
-                add_log(session_id, "Could not access shadow root")
-                
-        except Exception as e:
-            add_log(session_id, f"Shadow DOM approach failed: {e}")
-            
+            error_elements = driver.find_elements(By.CSS_SELECTOR, ".error, .alert-danger, .am-error, .alert, .message")
+            if error_elements:
+                for element in error_elements:
+                    error_text = element.text.strip()
+                    if error_text and ("invalid" in error_text.lower() or "incorrect" in error_text.lower() or "failed" in error_text.lower()):
+                        add_log(session_id, f"❌ Login failed: {error_text}", level='error')
+                        set_status(session_id, 'error')
+                        debug(f"[DEBUG] Login failed - setting status to error for session {session_id}")
+                        return False
+        except:
+            pass
+        
+        # Check current URL and page content
+        current_url = driver.current_url
+        page_source = driver.page_source.lower()
+        
+        # If still on login page or contains login elements, login failed
+        if ("login" in current_url or "member" not in current_url or 
+            "amember-login" in page_source or "amember-pass" in page_source):
+            add_log(session_id, "❌ Login failed: Still on login page after login attempt", level='error')
+            add_log(session_id, f"Current URL: {current_url}")
+            set_status(session_id, 'error')
+            debug(f"[DEBUG] Login failed - setting status to error for session {session_id}")
+            return False
+        else:
+            add_log(session_id, "✅ Login successful!")
+            return True
+    except Exception as e:
+        add_log(session_id, f"❌ Error checking login status: {str(e)}", level='error')
+        set_status(session_id, 'error')
+        return False
+
+def restore_session(driver, session_id, username, password, url):
+    """Inject a cached login and open url; returns False if there is none or it was rejected"""
+    cookies = session_cache.load(username, password)
+    if not cookies:
+        return False
+    
+    add_log(session_id, "Found cached login session, injecting cookies...")
+    try:
+        inject_cookies(driver, cookies)
+        report = navigate(driver, url, selector='#coupon-0, #amember-login')
+        add_log(session_id, format_navigation(report))
+        # The signup form means the session is live; the login form means it was rejected
+        element = WebDriverWait(driver, 15).until(EC.any_of(
+            EC.presence_of_element_located((By.ID, 'coupon-0')),
+            EC.presence_of_element_located((By.ID, 'amember-login')),
+        ))
+        if element.get_attribute('id') == 'coupon-0':
+            add_log(session_id, "✅ Cached session accepted, skipping login")
+            return True
     except Exception as e:
-        add_log(session_id, f"Error handling cookie consent: {e}")
+        add_log(session_id, f"Cached session check failed: {str(e)}")
+    
+    add_log(session_id, "Cached session rejected, falling back to full login")
+    session_cache.invalidate(username)
+    driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+    return False
 
-    add_log(session_id, "Cookie consent handling completed, continuing with script...")
+def record_iteration(session_id, session, iteration, timings, ctx):
+    """Store, log and count one finished checkout; returns True if the purchase was confirmed"""
+    account_type = ctx['account']
+    summary = timing_summary(timings)
+    summary['iteration'] = iteration
+    summary['account'] = account_type
+    summary['line_item'] = ctx['line_item']
+    summary['retries'] = len(ctx.get('retries', ()))
+    navigation = ctx.get('navigation')
+    if navigation:
+        summary['time_to_interactive_ms'] = navigation['time_to_interactive_ms']
+        STEP_SECONDS.observe(navigation['time_to_interactive_ms'] / 1000, step='time_to_interactive')
+        add_log(session_id, f"Account {iteration}: {format_navigation(navigation)}", step='navigate')
+    outcome = ctx['outcome']
+    summary['outcome'] = outcome['outcome']
+    summary['time_to_outcome_ms'] = outcome['time_to_outcome_ms']
+    session.timings.append(summary)
+    add_log(session_id, f"Account {iteration}: {format_timing(summary)}")
+    for step_name, seconds in timings:
+        STEP_SECONDS.observe(seconds, step=STEP_PHASES.get(step_name, 'fill'))
+    STEP_SECONDS.observe(outcome['time_to_outcome_ms'] / 1000, step='outcome')
+    ITERATIONS.inc(result=ITERATION_RESULTS[outcome['outcome']])
+    finish_line_item(session, ctx['line_item'], outcome['outcome'] == 'confirmed')
+    journal_outcome(session_id, iteration, ctx, outcome['outcome'])
+    if outcome['outcome'] == 'confirmed':
+        add_log(session_id, f"Account {iteration} ({account_type}) purchased successfully! "
+                            f"Confirmed in {outcome['time_to_outcome_ms'] / 1000:.2f}s", step='outcome')
+        return True
+    add_log(session_id, f"❌ Account {iteration} ({account_type}) {outcome['outcome'].replace('_', ' ')}: "
+                        f"{outcome['message']}", level='error', step='outcome')
+    return False
 
-def run_automation(session_id, username, password, card_number, card_expired_month, card_expired_year, card_code, loop_count, coupon_code, selected_account):
-    """Run the automation process in a separate thread for specific session"""
+def record_failure(session_id, session, driver, iteration, ctx, error):
+    """Count and log a checkout that ended without a purchase outcome"""
+    ITERATIONS.inc(result='failed')
+    finish_line_item(session, ctx['line_item'], False)
+    journal_outcome(session_id, iteration, ctx, 'failed')
+    add_log(session_id, f"Error processing account {iteration} ({classify_error(driver, error)}): {str(error)}", level='error')
+
+def record_retries(ctx):
+    """Count the retries a checkout needed"""
+    for retry in ctx.get('retries', ()):
+        RETRIES.inc(step=retry['step'], reason=retry['reason'])
+
+def run_automation(session_id, username, password, card_number, card_expired_month, card_expired_year, card_code, loop_count, coupon_code, selected_account, bulk_fill=False, pipeline_depth=1, line_items=None, resume=None):
+    """Run the automation process in a separate thread for specific session.
+
+    resume = {'start_at': n, 'outcomes': journaled outcomes} continues an interrupted
+    job: iterations before n, and later ones with a recorded outcome, are not run again.
+    """
+    session = None
+    driver = None
     try:
         add_log(session_id, "Starting automation process...")
         session = get_session(session_id)
         if not session:
             return
             
-        session['status'] = 'processing'
-        session['total_iterations'] = loop_count
+        # A single-product request is one line item
+        line_items = line_items or [{'account': selected_account, 'count': loop_count}]
+        set_line_items(session_id, line_items)
+        set_iteration(session_id, 0, loop_count)
+        set_status(session_id, 'processing')
         
-        # Load coupon code from environment
-        add_log(session_id, f"Using coupon code: {coupon_code}")
+        # Line item index of every iteration, in order; all line items share this browser and login
+        schedule = [index for index, item in enumerate(line_items) for _ in range(item['count'])]
         
-        # Initialize Chrome driver with undetected-chromedriver
-        add_log(session_id, "Initializing Chrome driver...")
+        # Iterations still to run; on a resume the journaled ones count towards the totals as they are
+        resume = resume or {'start_at': 1, 'outcomes': {}}
+        pending = []
+        purchased = 0
+        never_started = []
+        for iteration in range(1, loop_count + 1):
+            outcome = resume['outcomes'].get(iteration)
+            result = outcome['result'] if outcome else IN_PROGRESS
+            if iteration >= resume['start_at'] and result == IN_PROGRESS:
+                pending.append(iteration)
+                continue
+            if result == IN_PROGRESS:
+                # Before startAt without an outcome: skipped on request
+                result = 'skipped'
+                if outcome:
+                    add_log(session_id, f"⚠️ Account {iteration} was in progress when the server stopped; skipping it", level='warning')
+                else:
+                    never_started.append(iteration)
+                if journal:
+                    journal.record_iteration(session_id, iteration, schedule[iteration - 1],
+                                             line_items[schedule[iteration - 1]]['account'], result)
+            purchased += result == 'confirmed'
+            finish_line_item(session, schedule[iteration - 1], result == 'confirmed')
+        if never_started:
+            add_log(session_id, f"⏭️ Skipping account(s) {never_started}, which never started, as startAt {resume['start_at']} requested")
+        if resume['start_at'] > 1 or resume['outcomes']:
+            add_log(session_id, f"⏯️ Resuming: {loop_count - len(pending)} of {loop_count} accounts already done "
+                                f"({purchased} purchased), {len(pending)} to go")
         
-        # Use undetected-chromedriver with version override
-        options = uc.ChromeOptions()
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
+        # Opt-in WebDriver command trace of this job (TRACE_DIR)
+        if start_trace(session_id):
+            add_log(session_id, f"Tracing WebDriver commands to {TRACE_DIR}")
         
-        # Try to force download of correct ChromeDriver version
-        driver = uc.Chrome(options=options, version_main=139)
+        # Load coupon code from environment
+        add_log(session_id, f"Using coupon code: {coupon_code}")
         
-        session['driver'] = driver
+        # Check a warm browser out of the pool instead of cold-starting Chrome
+        add_log(session_id, "Acquiring Chrome driver...")
+        acquire_started = time.perf_counter()
+        with span('browser_acquire', step='browser_acquire'):
+            driver = driver_pool.acquire()
+        STEP_SECONDS.observe(time.perf_counter() - acquire_started, step='browser_acquire')
+        add_log(session_id, f"Browser ready in {time.perf_counter() - acquire_started:.2f}s")
+        launch = getattr(driver, 'launch_report', None)
+        if launch:
+            add_log(session_id, f"Chrome {launch['chrome_version']} (launched in {launch['launch_seconds']:.2f}s, "
+                                f"driver cache {launch['cache']})")
         
-        # Navigate to login page
-        add_log(session_id, "Navigating to login page...")
-        driver.get('https://dashboard.apextraderfunding.com/member/')
-        time.sleep(5)
+        session.driver = driver
         
-        # Handle cookie consent
-        handle_cookie_consent(driver, session_id)
+        # Reuse a cached login when possible, otherwise log in through the member page
+        first_url = f"{APEX_BASE_URL}/signup/{line_items[0]['account']}"
+        preloaded_url = None
+        login_started = time.perf_counter()
+        with span('session_restore', step='session_restore'):
+            restored = restore_session(driver, session_id, username, password, first_url)
+        if restored:
+            preloaded_url = first_url
+            STEP_SECONDS.observe(time.perf_counter() - login_started, step='session_restore')
+        else:
+            with span('login', step='login'):
+                logged_in = login(driver, session_id, username, password)
+            if not logged_in:
+                return
+            STEP_SECONDS.observe(time.perf_counter() - login_started, step='login')
+            session_cache.store(username, password, driver.get_cookies())
         
-        # Check if stop was requested
-        if session['should_stop']:
-            add_log(session_id, "Process stopped by user before login.")
-            driver.quit()
-            session['status'] = 'stopped'
-            return
+        checkout_steps = BULK_CHECKOUT_STEPS if bulk_fill else CHECKOUT_STEPS
+        add_log(session_id, f"Starting purchase loop for {loop_count} accounts...")
+        add_log(session_id, f"Form fill mode: {'bulk (one command per page)' if bulk_fill else 'per field'}")
+        for item in line_items:
+            add_log(session_id, f"Line item: {item['count']} x {item['account']}")
         
-        # Login
-        add_log(session_id, "Logging in...")
-        user_name = driver.find_element(By.ID, "amember-login")
-        user_name.send_keys(username)
-        pwd = driver.find_element(By.ID, "amember-pass")
-        pwd.send_keys(password)
-        time.sleep(1)
+        def make_ctx(iteration):
+            index = schedule[iteration - 1]
+            account_type = line_items[index]['account']
+            return {
+                'account': account_type,
+                'line_item': index,
+                'url': f'{APEX_BASE_URL}/signup/{account_type}',
+                'coupon_code': coupon_code,
+                'card_number': card_number,
+                'card_expired_month': card_expired_month,
+                'card_expired_year': card_expired_year,
+                'card_code': card_code,
+            }
         
-        login_button = driver.find_element(By.CSS_SELECTOR, 'input[type="submit"][value="Login"]')
-        login_button.click()
-        time.sleep(5)
+        def relogin():
+            session_cache.invalidate(username)
+            with span('relogin', step='login'):
+                logged_in = login(driver, session_id, username, password)
+            if not logged_in:
+                return False
+            session_cache.store(username, password, driver.get_cookies())
+            return True
         
-        # Check if login was successful
-        try:
-            # Wait a bit more for page to load
-            time.sleep(3)
+        def start_iteration(iteration, index):
+            set_iteration(session_id, iteration)
+            start_line_item(session, index)
+            if journal:
+                journal.start_iteration(session_id, iteration, index, line_items[index]['account'])
+            add_log(session_id, f"🔄 Processing account {iteration}/{loop_count} ({line_items[index]['account']})")
+        
+        if pipeline_depth > 1 and len(pending) > 1:
+            # Later accounts fill in other tabs of this browser while earlier payments process
+            # The pipeline numbers its purchases 1..len(pending); these map them back to job iterations
+            results = []
+            
+            def on_start(number):
+                start_iteration(pending[number - 1], schedule[pending[number - 1] - 1])
             
-            # Look for login error messages first
-            try:
-                error_elements = driver.find_elements(By.CSS_SELECTOR, ".error, .alert-danger, .am-error, .alert, .message")
-                if error_elements:
-                    for element in error_elements:
-                        error_text = element.text.strip()
-                        if error_text and ("invalid" in error_text.lower() or "incorrect" in error_text.lower() or "failed" in error_text.lower()):
-                            add_log(session_id, f"❌ Login failed: {error_text}")
-                            session['status'] = 'error'
-                            print(f"[DEBUG] Login failed - setting status to error for session {session_id}")
-                            driver.quit()
-                            return
-            except:
-                pass
+            def on_result(number, ctx, timings):
+                record_retries(ctx)
+                results.append(record_iteration(session_id, session, pending[number - 1], timings, ctx))
             
-            # Check current URL and page content
-            current_url = driver.current_url
-            page_source = driver.page_source.lower()
+            def on_error(number, ctx, error):
+                record_retries(ctx)
+                record_failure(session_id, session, driver, pending[number - 1], ctx, error)
             
-            # If still on login page or contains login elements, login failed
-            if ("login" in current_url or "member" not in current_url or 
-                "amember-login" in page_source or "amember-pass" in page_source):
-                add_log(session_id, "❌ Login failed: Still on login page after login attempt")
-                add_log(session_id, f"Current URL: {current_url}")
-                session['status'] = 'error'
-                print(f"[DEBUG] Login failed - setting status to error for session {session_id}")
-                driver.quit()
+            def pipeline_relogin():
+                add_log(session_id, "⚠️ Logged out mid-checkout, logging in again", level='warning')
+                return relogin()
+            
+            pipeline = TabPipeline(driver, checkout_steps, len(pending), pipeline_depth,
+                                   lambda number: make_ctx(pending[number - 1]), on_result, on_error,
+                                   on_start=on_start, should_stop=lambda: session.should_stop,
+                                   relogin=pipeline_relogin, max_relogins=SESSION_RELOGINS,
+                                   log=lambda message, step=None: add_log(session_id, message, step=step))
+            add_log(session_id, f"Pipelining checkouts over {pipeline.depth} tabs")
+            started = pipeline.run()
+            purchased += sum(results)
+            if pipeline.aborted:
                 return
-            else:
-                add_log(session_id, "✅ Login successful!")
-        except Exception as e:
-            add_log(session_id, f"❌ Error checking login status: {str(e)}")
-            session['status'] = 'error'
-            driver.quit()
-            return
-        
-        add_log(session_id, f"Starting purchase loop for {loop_count} accounts...")
-        add_log(session_id, f"Selected account type: {selected_account}")
-        
-        # Main workflow loop
-        for iteration in range(loop_count):
-            if session['should_stop']:
+            if started < len(pending):
                 add_log(session_id, "Purchase process stopped by user.")
-                break
+                ITERATIONS.inc(len(pending) - started, result='stopped')
+        else:
+            # Main workflow loop
+            for position, iteration in enumerate(pending):
+                if session.should_stop:
+                    add_log(session_id, "Purchase process stopped by user.")
+                    ITERATIONS.inc(len(pending) - position, result='stopped')
+                    break
+                    
+                ctx = make_ctx(iteration)
+                start_iteration(iteration, ctx['line_item'])
                 
-            session['current_iteration'] = iteration + 1
-            add_log(session_id, f"🔄 Processing account {iteration + 1}/{loop_count}")
+                with span('checkout', iteration=iteration):
+                    try:
+                        steps = checkout_steps
+                        if preloaded_url == ctx['url']:
+                            # The cached-session check already opened this signup page
+                            steps = checkout_steps[1:]
+                            preloaded_url = None
+
+                        # Each step proceeds as soon as its element is ready instead of sleeping; transient
+                        # failures are retried in place and a lost login restarts the checkout after re-login
+                        for attempt in range(SESSION_RELOGINS + 1):
+                            try:
+                                timings = run_steps(driver, steps, ctx,
+                                                    log=lambda message, step=None: add_log(session_id, f"Account {iteration}: {message}", step=step))
+                                break
+                            except SessionExpiredError as e:
+                                ctx.setdefault('retries', []).append({'step': e.step_name, 'reason': 'session_expired'})
+                                if attempt == SESSION_RELOGINS:
+                                    raise
+                                add_log(session_id, f"⚠️ Account {iteration}: {e}, logging in again", level='warning')
+                                if not relogin():
+                                    return
+                                steps = checkout_steps
+                        if record_iteration(session_id, session, iteration, timings, ctx):
+                            purchased += 1
+                    
+                    except Exception as e:
+                        record_failure(session_id, session, driver, iteration, ctx, e)
+                        continue
+                    finally:
+                        record_retries(ctx)
             
-            try:
-                # Use the selected account type for all purchases
-                account_type = selected_account
-                account_url = f'https://dashboard.apextraderfunding.com/signup/{account_type}'
-                
-                # Navigate to signup page
-                driver.get(account_url)
-                time.sleep(5)
-                add_log(session_id, f"Navigated to signup page for account {iteration + 1} ({account_type})")
-
-                # Use coupon code from environment file
-                coupon = driver.find_element(By.ID, 'coupon-0')
-                driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", coupon)
-                coupon.clear()
-                coupon.send_keys(coupon_code)
-                time.sleep(2)
-                add_log(session_id, f"Entered coupon code '{coupon_code}' for account {iteration + 1}")
-
-                agree = driver.find_element(By.ID, '_i_agree-page-0-0-0')
-                driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", agree)
-                driver.execute_script("arguments[0].click();", agree)
-                time.sleep(2)
-                add_log(session_id, f"Agreed to terms for account {iteration + 1}")
-
-                next_button = driver.find_element(By.ID,'_qf_page-0_next-0')
-                next_button.click()
-                time.sleep(3)
-                add_log(session_id, f"Clicked next button for account {iteration + 1}")
-
-                card_number_input = driver.find_element(By.ID, "cc_number")
-                card_number_input.clear()
-                card_number_input.send_keys(card_number)
-                time.sleep(2)
-                add_log(session_id, f"Entered card number for account {iteration + 1}")
-
-                card_ex_month_select = driver.find_element(By.ID, "m-0")
-                select_month = Select(card_ex_month_select)
-                select_month.select_by_value(card_expired_month)
-                time.sleep(2)
-                add_log(session_id, f"Selected expiration month for account {iteration + 1}")
-
-                card_ex_year_select = driver.find_element(By.ID, "y-0")
-                select_year = Select(card_ex_year_select)
-                select_year.select_by_value(card_expired_year)
-                time.sleep(2)
-                add_log(session_id, f"Selected expiration year for account {iteration + 1}")
-
-                card_code_button = driver.find_element(By.ID, "cc_code")
-                card_code_button.clear()
-                card_code_button.send_keys(card_code)
-                time.sleep(2)
-                add_log(session_id, f"Entered card code for account {iteration + 1}")
-
-                pay_button = driver.find_element(By.ID, "qfauto-0")
-                driver.execute_script("arguments[0].click();", pay_button)
-                time.sleep(5)
-                add_log(session_id, f"Clicked pay button for account {iteration + 1}")
-                
-                # Wait for processing
-                time.sleep(3)
-                add_log(session_id, f"Account {iteration + 1} ({account_type}) purchased successfully!")
-                
-            except Exception as e:
-                add_log(session_id, f"Error processing account {iteration + 1}: {str(e)}")
-                continue
+        # Keep the cached session fresh in case the site rotated its cookies
+        try:
+            session_cache.store(username, password, driver.get_cookies())
+        except Exception:
+            pass
         
-        if session['should_stop']:
+        if len(line_items) > 1:
+            for item in session.line_items:
+                add_log(session_id, f"📦 {item['account']}: {item['purchased']}/{item['count']} purchased")
+        
+        if session.should_stop:
+            with session.changed:
+                for item in session.line_items:
+                    if item['status'] != 'completed':
+                        item['status'] = 'stopped'
             add_log(session_id, "🛑 Purchase process stopped by user.")
-            session['status'] = 'stopped'
+            set_status(session_id, 'stopped')
         else:
-            add_log(session_id, "✅ All purchases completed successfully!")
-            add_log(session_id, f"📊 Summary: {loop_count} accounts processed")
-            session['status'] = 'completed'
+            if purchased == loop_count:
+                add_log(session_id, "✅ All purchases completed successfully!")
+            else:
+                add_log(session_id, f"⚠️ {loop_count - purchased} of {loop_count} purchases were not confirmed", level='warning')
+            add_log(session_id, f"📊 Summary: {purchased}/{loop_count} accounts purchased")
+            set_status(session_id, 'completed')
         
         # Ensure status is properly set before cleanup
-        print(f"[DEBUG] Final status set to: {session['status']}")
+        debug(f"[DEBUG] Final status set to: {session.status}")
         
+    except InsufficientMemoryError as e:
+        add_log(session_id, f"❌ Browser refused: {str(e)}", level='error')
+        set_status(session_id, 'error')
     except Exception as e:
-        add_log(session_id, f"❌ Automation error: {str(e)}")
-        session['status'] = 'error'
+        add_log(session_id, f"❌ Automation error: {str(e)}", level='error')
+        set_status(session_id, 'error')
     finally:
-        if session and session['driver']:
-            try:
-                add_log(session_id, "🔄 Closing browser...")
-                session['driver'].quit()
-                add_log(session_id, "✅ Browser closed successfully")
-            except Exception as e:
-                add_log(session_id, f"⚠️ Error closing browser: {str(e)}")
-            session['driver'] = None
+        if driver is not None:
+            add_log(session_id, "🔄 Releasing browser...")
+            if session:
+                session.driver = None
+            driver_pool.release(driver, origins=(APEX_BASE_URL,))
+            add_log(session_id, "✅ Browser released")
             
             # Final status update to ensure frontend gets the final state
-            print(f"[DEBUG] Final session status: {session['status']}")
-            add_log(session_id, f"🏁 Process finished with status: {session['status']}")
+            debug(f"[DEBUG] Final session status: {session.status}")
+            add_log(session_id, f"🏁 Process finished with status: {session.status}")
+        trace_path = stop_trace()
+        if trace_path:
+            add_log(session_id, f"📈 WebDriver trace written to {trace_path}")
+        # Only a crash or shutdown leaves the journal entry (and the credentials in it) behind
+        forget_job(session_id)
+
+def queue_job(job_args, session_id=None, resume=None):
+    """Create a session and queue its automation; returns (session_id, queue position).
+
+    A session still in memory under session_id (a resumed job) is reused, so event
+    streams attached to it keep receiving updates. Raises QueueFullError or
+    DuplicateJobError after discarding the session, or restoring the reused one.
+    """
+    session = get_session(session_id) if session_id else None
+    previous_status = session.status if session else None
+    if session is None:
+        session_id = create_session(session_id)
+    else:
+        with session.changed:
+            session.should_stop = False
+            session.timings = []
+    set_status(session_id, 'queued')
+    # Journaled before the job can start, so its outcomes always have a job to belong to
+    if journal:
+        journal.begin(session_id, job_args[0], list(job_args), job_args[6])
+    try:
+        # The scheduler caps how many browsers run at once
+        position = scheduler.submit(session_id, job_args[0], run_automation, (session_id,) + tuple(job_args) + (resume,))
+    except (QueueFullError, DuplicateJobError):
+        if resume is None:
+            forget_job(session_id)
+        if session is None:
+            discard_session(session_id)
+        else:
+            set_status(session_id, previous_status)
+        raise
+    return session_id, position
+
+def queued_response(job_args, session_id=None, resume=None):
+    """Queue a job and build the API response; returns (payload, status code, headers)"""
+    try:
+        session_id, position = queue_job(job_args, session_id, resume)
+    except QueueFullError as e:
+        return {'error': str(e)}, 429, {'Retry-After': '30'}
+    except DuplicateJobError as e:
+        return {'error': str(e)}, 409, {}
+    
+    return {
+        'message': 'Purchase process queued successfully',
+        'status': 'queued',
+        'queue_position': position,
+        'session_id': session_id
+    }, 200, {}
+
+def queue_purchase(data):
+    """Validate a purchase request and queue its job; returns (payload, status code, headers)"""
+    try:
+        job_args = parse_purchase(data)
+    except ValueError as e:
+        return {'error': str(e)}, 400, {}
+    return queued_response(job_args)
+
+def unfinished_jobs():
+    """Journaled jobs that no session of this process is running, i.e. left over from a previous run"""
+    if not journal:
+        return []
+    return [job for job in journal.unfinished() if job['session_id'] not in sessions]
+
+def resumable_payload():
+    """Progress of every job that can be resumed"""
+    jobs = unfinished_jobs()
+    return {'jobs': jobs, 'total': len(jobs)}
+
+def resume_job(session_id, data):
+    """Queue an interrupted job again under its old session ID; returns (payload, status code, headers).
+
+    The job continues at the first iteration without a recorded outcome, or at
+    data['startAt']. When accounts were mid-checkout at the interruption their
+    payment may have gone through, so startAt must then be given explicitly.
+    """
+    job = next((job for job in unfinished_jobs() if job['session_id'] == session_id), None)
+    if job is None:
+        return {'error': 'No interrupted job with this ID'}, 404, {}
+    
+    if job['in_progress'] and 'startAt' not in data:
+        skip_at = job['in_progress'][-1] + 1
+        skip = (f"startAt {skip_at} skips them" if skip_at <= job['total_iterations']
+                else "nothing is left after them, so discard the job")
+        return {
+            'error': f"Account(s) {job['in_progress']} were mid-checkout and may have been charged; check them, "
+                     f"then resume with an explicit startAt ({skip}; startAt {job['resume_at']} retries them)",
+            'in_progress': job['in_progress'],
+        }, 409, {}
+    start_at = data.get('startAt', job['resume_at'])
+    if not isinstance(start_at, int) or not 1 <= start_at <= job['total_iterations']:
+        return {'error': f"startAt must be an integer from 1 to {job['total_iterations']}"}, 400, {}
+    
+    outcomes = journal.outcomes(session_id)
+    payload, status_code, headers = queued_response(journal.job_args(session_id), session_id,
+                                                    {'start_at': start_at, 'outcomes': outcomes})
+    if status_code == 200:
+        payload['message'] = f"Purchase process resumed at account {start_at}"
+        payload['resume_at'] = start_at
+    return payload, status_code, headers
+
+def discard_job(session_id):
+    """Forget an interrupted job without resuming it; returns (payload, status code)"""
+    if not any(job['session_id'] == session_id for job in unfinished_jobs()):
+        return {'error': 'No interrupted job with this ID'}, 404
+    forget_job(session_id)
+    return {'message': 'Interrupted job discarded'}, 200
+
+def announce_unfinished():
+    """Print the jobs a previous run left unfinished and how to resume or discard them"""
+    jobs = unfinished_jobs()
+    if not jobs:
+        return
+    print(f"⏸️ {len(jobs)} unfinished job(s) from a previous run:")
+    for job in jobs:
+        in_progress = f", account(s) {job['in_progress']} were mid-checkout (check them before resuming)" if job['in_progress'] else ''
+        print(f"   {job['session_id']} {job['username']}: {job['finished_iterations']}/{job['total_iterations']} done, "
+              f"{job['purchased']} purchased{in_progress}")
+    print("   Resume with POST /api/resume/<session_id> ({\"startAt\": n} is required after a mid-checkout interruption) "
+          "or discard with DELETE /api/resumable/<session_id>")
 
 @app.route('/api/purchase', methods=['POST'])
 def start_purchase():
     """Start the purchase process with data from frontend"""
     try:
-        data = request.json
-        
-        # Validate required fields
-        required_fields = ['username', 'password', 'cardNumber', 'cvv', 'expiryMonth', 'expiryYear', 'numberOfAccounts', 'selectedAccount']
-        for field in required_fields:
-            if field not in data or not data[field]:
-                return jsonify({'error': f'Missing required field: {field}'}), 400
-        
-        # Create new session for this user
-        session_id = create_session()
-        
-        # Extract data
-        username = data['username']
-        password = data['password']
-        card_number = data['cardNumber']
-        card_expired_month = data['expiryMonth']
-        card_expired_year = data['expiryYear']
-        card_code = data['cvv']
-        loop_count = int(data['numberOfAccounts'])
-        selected_account = data['selectedAccount']
-        
-        # Optional coupon code from frontend, fallback to .env file
-        coupon_code = data.get('couponCode', os.getenv('COUPON_CODE', 'JAYPELLE'))
-        
-        # Start automation in a separate thread
-        thread = threading.Thread(
-            target=run_automation,
-            args=(session_id, username, password, card_number, card_expired_month, card_expired_year, card_code, loop_count, coupon_code, selected_account)
-        )
-        thread.daemon = True
-        thread.start()
-        
-        return jsonify({
-            'message': 'Purchase process started successfully',
-            'status': 'processing',
-            'session_id': session_id
-        }), 200
-        
+        payload, status_code, headers = queue_purchase(request.json)
+        return jsonify(payload), status_code, headers
     except Exception as e:
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+@app.route('/api/resumable', methods=['GET'])
+def list_resumable():
+    """List jobs interrupted by a restart or crash, with their progress"""
+    return jsonify(resumable_payload()), 200
+
+@app.route('/api/resume/<session_id>', methods=['POST'])
+def resume_purchase(session_id):
+    """Continue an interrupted job where it stopped"""
+    try:
+        payload, status_code, headers = resume_job(session_id, request.get_json(silent=True) or {})
+        return jsonify(payload), status_code, headers
+    except Exception as e:
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@app.route('/api/resumable/<session_id>', methods=['DELETE'])
+def discard_resumable(session_id):
+    """Forget an interrupted job without resuming it"""
+    payload, status_code = discard_job(session_id)
+    return jsonify(payload), status_code
+
 @app.route('/api/status/<session_id>', methods=['GET'])
 def get_status(session_id):
-    """Get current status and logs for specific session"""
+    """Get current status and logs for specific session.
+
+    Accepts ?since=<seq>&limit=<n> so clients only fetch log records newer than
+    the last sequence number they saw (returned as next_since).
+    """
+    payload, status_code = status_payload(session_id, request.args)
+    return jsonify(payload), status_code
+
+def status_payload(session_id, args):
+    """Build the /api/status response from query args; returns (payload, status code)"""
+    session = get_session(session_id)
+    if not session:
+        return {'error': 'Session not found'}, 404
+    
+    try:
+        since = int(args.get('since', 0))
+        limit = min(int(args.get('limit', STATUS_LOG_LIMIT)), STATUS_LOG_LIMIT)
+    except ValueError:
+        return {'error': 'since and limit must be integers'}, 400
+    
+    debug(f"[DEBUG] Status request for session {session_id}: {session.status}")
+    
+    # Without a cursor (the bundled frontend) show the newest lines, not the first ones of a long job
+    records = session.logs.since(since, limit) if 'since' in args else session.logs.latest(limit)
+    payload = {
+        'status': session.status,
+        'queue_position': scheduler.position(session_id) if session.status == 'queued' else None,
+        'current_iteration': session.current_iteration,
+        'total_iterations': session.total_iterations,
+        'timings': session.timings,
+        'line_items': [dict(item) for item in session.line_items],
+        'resources': governor.samples.get(session_id),
+        'logs': [record.format() for record in records],
+        'next_since': records[-1].seq if records else max(since, 0),
+        'last_seq': session.logs.last_seq
+    }
+    if args.get('structured'):
+        payload['log_records'] = [record.to_dict() for record in records]
+    return payload, 200
+
+class EventStream:
+    """Cursor and last-sent state of one SSE client; shared by the Flask and ASGI streams"""
+
+    __slots__ = ('session_id', 'session', 'cursor', 'last_status', 'last_iteration', 'last_line_items', 'finished')
+
+    def __init__(self, session_id, session, cursor):
+        self.session_id = session_id
+        self.session = session
+        self.cursor = cursor
+        self.last_status = None
+        self.last_iteration = None
+        self.last_line_items = None
+        self.finished = False
+
+    def has_news(self):
+        session = self.session
+        return (session.logs.last_seq > self.cursor or session.status != self.last_status or
+                (session.current_iteration, session.total_iterations) != self.last_iteration or
+                session.line_items != self.last_line_items)
+
+    def wait_timeout(self):
+        return 2 if self.last_status in FINAL_STATUSES else 15
+
+    def collect(self):
+        """Snapshot the session and return the SSE messages to send next"""
+        session = self.session
+        with session.changed:
+            latest_seq = session.logs.last_seq
+            new_logs = session.logs.since(self.cursor)
+            status = session.status
+            iteration = (session.current_iteration, session.total_iterations)
+            line_items = [dict(item) for item in session.line_items]
+        
+        events = []
+        for record in new_logs:
+            events.append(log_event(record))
+        # Records evicted from the ring buffer are skipped rather than waited on
+        self.cursor = new_logs[-1].seq if new_logs else max(self.cursor, latest_seq)
+        if iteration != self.last_iteration:
+            self.last_iteration = iteration
+            events.append(sse_event('iteration', {'current_iteration': iteration[0], 'total_iterations': iteration[1]}))
+        if line_items != self.last_line_items:
+            self.last_line_items = line_items
+            events.append(sse_event('line_items', {'line_items': line_items}))
+        if status != self.last_status:
+            self.last_status = status
+            events.append(sse_event('status', {
+                'status': status,
+                'queue_position': scheduler.position(self.session_id) if status == 'queued' else None
+            }))
+        if self.session_id not in sessions or (status in FINAL_STATUSES and not events):
+            # Finished and quiet: the job's closing logs have all been delivered
+            events.append(sse_event('end', {'status': status}))
+            self.finished = True
+        elif not events:
+            events.append(': keepalive\n\n')
+        return events
+
+@app.route('/api/stream/<session_id>', methods=['GET'])
+def stream_status(session_id):
+    """Push new logs, iteration changes and status transitions as Server-Sent Events.
+
+    Log events carry the record's sequence number as the event id, so a
+    reconnecting client resumes after the last log it saw via the Last-Event-ID
+    header (or ?since= for clients that cannot set headers).
+    """
     session = get_session(session_id)
     if not session:
         return jsonify({'error': 'Session not found'}), 404
     
-    # Debug logging
-    print(f"[DEBUG] Status request for session {session_id}: {session['status']}")
+    stream = EventStream(session_id, session, stream_cursor(request.headers, request.args))
+    
+    def generate():
+        while not stream.finished:
+            with session.changed:
+                session.changed.wait_for(stream.has_news, timeout=stream.wait_timeout())
+            yield from stream.collect()
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=SSE_HEADERS)
+
+def stop_session(session_id):
+    """Stop a session's job and close its browser; returns (payload, status code)"""
+    session = get_session(session_id)
+    if not session:
+        return {'error': 'Session not found'}, 404
         
-    return jsonify({
-        'status': session['status'],
-        'current_iteration': session['current_iteration'],
-        'total_iterations': session['total_iterations'],
-        'logs': session['logs']
-    }), 200
+    session.should_stop = True
+    add_log(session_id, "Stop request received from frontend")
+    if scheduler.cancel(session_id):
+        forget_job(session_id)
+        add_log(session_id, "Removed queued job before it started")
+    
+    # If driver is active, try to close it
+    if session.driver:
+        quit_driver(session.driver, log=lambda message: add_log(session_id, message, level='warning'))
+        session.driver = None
+        add_log(session_id, "Browser closed successfully")
+    
+    set_status(session_id, 'stopped')
+    
+    return {
+        'message': 'Stop request processed',
+        'status': 'stopped'
+    }, 200
 
 @app.route('/api/stop/<session_id>', methods=['POST'])
 def stop_purchase(session_id):
     """Stop the current purchase process for specific session"""
     try:
-        session = get_session(session_id)
-        if not session:
-            return jsonify({'error': 'Session not found'}), 404
-            
-        session['should_stop'] = True
-        add_log(session_id, "Stop request received from frontend")
-        
-        # If driver is active, try to close it
-        if session['driver']:
-            try:
-                session['driver'].quit()
-                session['driver'] = None
-                add_log(session_id, "Browser closed successfully")
-            except:
-                add_log(session_id, "Error closing browser")
-        
-        session['status'] = 'stopped'
-        
-        return jsonify({
-            'message': 'Stop request processed',
-            'status': 'stopped'
-        }), 200
-        
+        payload, status_code = stop_session(session_id)
+        return jsonify(payload), status_code
     except Exception as e:
         return jsonify({'error': f'Error stopping process: {str(e)}'}), 500
 
@@ -470,28 +945,49 @@ def reset(session_id):
     reset_session(session_id)
     return jsonify({'message': 'Status reset successfully'}), 200
 
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Expose step latencies, iteration outcomes and load gauges in Prometheus text format"""
+    return Response(metrics.render(), mimetype=CONTENT_TYPE)
+
 @app.route('/api/sessions', methods=['GET'])
 def list_sessions():
     """List all active sessions (for debugging)"""
-    cleanup_old_sessions()  # Clean up expired sessions
-    
+    return jsonify(sessions_payload()), 200
+
+def sessions_payload():
+    """Summary of every session plus scheduler, pool and resource stats"""
     active_sessions = {}
-    for session_id, session_data in sessions.items():
-        active_sessions[session_id] = {
-            'status': session_data['status'],
-            'created_at': session_data['created_at'].isoformat(),
-            'last_activity': session_data['last_activity'].isoformat(),
-            'current_iteration': session_data['current_iteration'],
-            'total_iterations': session_data['total_iterations']
+    for session_data in sessions.values():
+        active_sessions[session_data.session_id] = {
+            'status': session_data.status,
+            'created_at': datetime.fromtimestamp(session_data.created_at).isoformat(),
+            'last_activity': datetime.fromtimestamp(session_data.last_activity).isoformat(),
+            'current_iteration': session_data.current_iteration,
+            'total_iterations': session_data.total_iterations
         }
     
-    return jsonify({
+    return {
         'active_sessions': active_sessions,
-        'total_sessions': len(active_sessions)
-    }), 200
+        'total_sessions': len(active_sessions),
+        'scheduler': scheduler.stats(),
+        'driver_pool': driver_pool.stats(),
+        'resources': {
+            'browser_rss_mb': governor.total_rss_mb(),
+            'free_memory_mb': round(governor.free_memory_mb()),
+            'orphans_killed': governor.orphans_killed
+        }
+    }
 
 if __name__ == '__main__':
     print("Starting APEX Purchasing Bot API Server...")
     print("Server will be available at http://localhost:8000")
     print("Multi-user support enabled - each user gets a unique session")
-    app.run(host='0.0.0.0', port=8000, debug=True)
+    announce_unfinished()
+    print(f"Warming driver pool ({driver_pool.size} browsers)...")
+    driver_pool.start()
+    governor.start()
+    # Per-request access lines would otherwise be written synchronously by the request threads
+    route_logger('werkzeug', log_pipeline)
+    # The debug reloader would import undetected-chromedriver in a second process; opt in with FLASK_DEBUG=1
+    app.run(host='0.0.0.0', port=8000, debug=FLASK_DEBUG, threaded=True)
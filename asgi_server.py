@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+ASGI entry point for the purchase API
+Serves the same endpoints as api_server.py on an asyncio event loop. Status polls
+and event streams are answered on the loop without holding a thread each; handlers
+that can block on a browser run in a small thread pool.
+
+Run with `python asgi_server.py` or `uvicorn asgi_server:app --port 8000`.
+Sessions live in this process's memory, so keep to a single worker.
+"""
+
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+import uvicorn
+
+import api_server
+
+# Threads for handlers that can block on WebDriver (stop and reset quit browsers) or on the job journal's fsyncs
+BLOCKING_WORKERS = int(os.getenv('ASGI_BLOCKING_WORKERS', '4'))
+executor = ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix='asgi-blocking')
+
+
+class ChangeNotifier:
+    """Wakes event-stream coroutines when automation threads change their session"""
+
+    def __init__(self):
+        self._waiters = {}  # session_id -> {(loop, asyncio.Event)}
+        self._lock = threading.Lock()
+
+    def notify(self, session):
+        """Change listener called from any thread"""
+        with self._lock:
+            waiters = list(self._waiters.get(session.session_id, ()))
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # Loop already closed during shutdown
+                continue
+
+    async def wait(self, stream, timeout):
+        """Sleep until the stream's session changes or the timeout passes"""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.setdefault(stream.session_id, set()).add(waiter)
+        try:
+            # Registered before checking, so a change in between still wakes us
+            if not stream.has_news():
+                await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(stream.session_id)
+                if waiters is not None:
+                    waiters.discard(waiter)
+                    if not waiters:
+                        del self._waiters[stream.session_id]
+
+
+notifier = ChangeNotifier()
+api_server.change_listeners.append(notifier.notify)
+
+
+async def run_blocking(func, *args):
+    """Run a blocking call in the executor so the event loop keeps serving"""
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+async def start_purchase(request):
+    """Start the purchase process with data from frontend"""
+    try:
+        # Queueing journals the job to SQLite with an fsync, so it runs off the event loop
+        payload, status_code, headers = await run_blocking(api_server.queue_purchase, await request.json())
+        return JSONResponse(payload, status_code=status_code, headers=headers)
+    except Exception as e:
+        return JSONResponse({'error': f'Server error: {str(e)}'}, status_code=500)
+
+
+async def get_status(request):
+    """Get current status and logs for specific session"""
+    payload, status_code = api_server.status_payload(request.path_params['session_id'], request.query_params)
+    return JSONResponse(payload, status_code=status_code)
+
+
+async def stream_status(request):
+    """Push session changes as Server-Sent Events without a thread per client"""
+    session_id = request.path_params['session_id']
+    session = api_server.get_session(session_id)
+    if not session:
+        return JSONResponse({'error': 'Session not found'}, status_code=404)
+
+    stream = api_server.EventStream(session_id, session,
+                                    api_server.stream_cursor(request.headers, request.query_params))
+
+    async def generate():
+        while not stream.finished:
+            await notifier.wait(stream, stream.wait_timeout())
+            for event in stream.collect():
+                yield event
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers=api_server.SSE_HEADERS)
+
+
+async def stop_purchase(request):
+    """Stop the current purchase process for specific session"""
+    try:
+        payload, status_code = await run_blocking(api_server.stop_session, request.path_params['session_id'])
+        return JSONResponse(payload, status_code=status_code)
+    except Exception as e:
+        return JSONResponse({'error': f'Error stopping process: {str(e)}'}, status_code=500)
+
+
+async def reset(request):
+    """Reset the status for specific session"""
+    await run_blocking(api_server.reset_session, request.path_params['session_id'])
+    return JSONResponse({'message': 'Status reset successfully'})
+
+
+async def list_resumable(request):
+    """List jobs interrupted by a restart or crash, with their progress"""
+    return JSONResponse(await run_blocking(api_server.resumable_payload))
+
+
+async def resume_purchase(request):
+    """Continue an interrupted job where it stopped"""
+    try:
+        body = await request.body()
+        data = json.loads(body) if body else {}
+        payload, status_code, headers = await run_blocking(api_server.resume_job, request.path_params['session_id'], data)
+        return JSONResponse(payload, status_code=status_code, headers=headers)
+    except Exception as e:
+        return JSONResponse({'error': f'Server error: {str(e)}'}, status_code=500)
+
+
+async def discard_resumable(request):
+    """Forget an interrupted job without resuming it"""
+    payload, status_code = await run_blocking(api_server.discard_job, request.path_params['session_id'])
+    return JSONResponse(payload, status_code=status_code)
+
+
+async def prometheus_metrics(request):
+    """Expose step latencies, iteration outcomes and load gauges in Prometheus text format"""
+    return Response(api_server.metrics.render(), headers={'Content-Type': api_server.CONTENT_TYPE})
+
+
+async def list_sessions(request):
+    """List all active sessions (for debugging)"""
+    return JSONResponse(api_server.sessions_payload())
+
+
+@asynccontextmanager
+async def lifespan(app):
+    api_server.announce_unfinished()
+    print(f"Warming driver pool ({api_server.driver_pool.size} browsers)...")
+    api_server.driver_pool.start()
+    api_server.governor.start()
+    yield
+    api_server.driver_pool.shutdown()
+    executor.shutdown(wait=False)
+
+
+app = Starlette(
+    routes=[
+        Route('/api/purchase', start_purchase, methods=['POST']),
+        Route('/api/status/{session_id}', get_status, methods=['GET']),
+        Route('/api/stream/{session_id}', stream_status, methods=['GET']),
+        Route('/api/stop/{session_id}', stop_purchase, methods=['POST']),
+        Route('/api/reset/{session_id}', reset, methods=['POST']),
+        Route('/api/resumable', list_resumable, methods=['GET']),
+        Route('/api/resume/{session_id}', resume_purchase, methods=['POST']),
+        Route('/api/resumable/{session_id}', discard_resumable, methods=['DELETE']),
+        Route('/metrics', prometheus_metrics, methods=['GET']),
+        Route('/api/sessions', list_sessions, methods=['GET']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan,
+)
+
+
+if __name__ == '__main__':
+    print("Starting APEX Purchasing Bot API Server (ASGI)...")
+    print("Server will be available at http://localhost:8000")
+    uvicorn.run(app, host='0.0.0.0', port=8000)
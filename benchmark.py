@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark for the purchase automation
+Runs run_automation against the local mock dashboard and reports iteration
+latency percentiles, throughput and peak browser memory
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+import psutil
+
+import api_server
+import mock_server
+from browser import create_driver, launch_listeners
+from driver_pool import DriverPool
+from job_journal import JobJournal
+from resource_governor import bot_process_roots, process_tree
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def browser_rss_bytes():
+    """Total resident memory of the bot's Chrome/chromedriver process trees.
+
+    undetected-chromedriver launches Chrome detached, so the browsers are found
+    by the marker switch rather than as children of this process.
+    """
+    total = 0
+    for process in process_tree([root.pid for root in bot_process_roots()]).values():
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            continue
+    return total
+
+
+class RssSampler(threading.Thread):
+    """Background thread recording the peak browser RSS"""
+
+    def __init__(self, interval=0.5):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, browser_rss_bytes())
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def warm_pool(pool, timeout=120):
+    """Pre-launch the pool's browsers and wait until they are all idle"""
+    pool.start()
+    deadline = time.monotonic() + timeout
+    while pool.stats()['idle'] < pool.size and time.monotonic() < deadline:
+        time.sleep(0.2)
+
+
+def run_benchmark(iterations, sessions, account='50k-Tradovate', latency=0.0, jitter=0.0, pay_latency=0.0,
+                  pool_size=None, warm=False, bulk_fill=False, lean=False, pipeline_depth=1):
+    """Run `sessions` concurrent jobs of `iterations` purchases each against the mock server"""
+    server, base_url = mock_server.start_in_thread(latency=latency, jitter=jitter, pay_latency=pay_latency)
+    api_server.APEX_BASE_URL = base_url
+    # Benchmark jobs go to a throwaway journal, never the one the servers offer for resuming
+    journal_dir = tempfile.mkdtemp(prefix='apex-benchmark-')
+    api_server.journal = JobJournal(os.path.join(journal_dir, 'journal.db'))
+    launches = []
+    launch_listeners.append(launches.append)
+    api_server.driver_pool = DriverPool(size=sessions if pool_size is None else pool_size,
+                                        factory=api_server.governor.guard(lambda: create_driver(lean=lean)))
+    if warm:
+        warm_pool(api_server.driver_pool)
+
+    session_ids = [api_server.create_session() for _ in range(sessions)]
+    threads = [
+        threading.Thread(
+            target=api_server.run_automation,
+            args=(session_id, f'bench{index}', 'bench-password', '4242424242424242', '12', '2030', '123',
+                  iterations, 'BENCH', account, bulk_fill, pipeline_depth),
+            daemon=True,
+        )
+        for index, session_id in enumerate(session_ids)
+    ]
+
+    sampler = RssSampler()
+    sampler.start()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_seconds = time.perf_counter() - started
+    sampler.stop()
+    api_server.driver_pool.shutdown()
+    server.shutdown()
+    shutil.rmtree(journal_dir, ignore_errors=True)
+    launch_listeners.remove(launches.append)
+    launch_times = [launch['launch_seconds'] for launch in launches]
+
+    latencies = []
+    page_loads = []
+    outcome_times = []
+    outcomes = {}
+    statuses = {}
+    for session_id in session_ids:
+        session = api_server.get_session(session_id)
+        latencies.extend(timing['total_seconds'] for timing in session.timings)
+        page_loads.extend(timing['steps']['navigate'] for timing in session.timings if 'navigate' in timing['steps'])
+        statuses[session.status] = statuses.get(session.status, 0) + 1
+        for timing in session.timings:
+            outcomes[timing['outcome']] = outcomes.get(timing['outcome'], 0) + 1
+            outcome_times.append(timing['time_to_outcome_ms'] / 1000)
+
+    return {
+        'iterations_requested': iterations * sessions,
+        'iterations_completed': len(latencies),
+        'sessions': sessions,
+        'session_statuses': statuses,
+        'wall_seconds': round(wall_seconds, 2),
+        'iterations_per_minute': round(len(latencies) / wall_seconds * 60, 2) if wall_seconds else 0.0,
+        'latency_seconds': {
+            'p50': round(percentile(latencies, 50), 3),
+            'p90': round(percentile(latencies, 90), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'max': round(max(latencies), 3) if latencies else 0.0,
+        },
+        'outcomes': outcomes,
+        'time_to_outcome_seconds': {
+            'p50': round(percentile(outcome_times, 50), 3),
+            'p95': round(percentile(outcome_times, 95), 3),
+        },
+        'page_load_seconds': {
+            'p50': round(percentile(page_loads, 50), 3),
+            'p95': round(percentile(page_loads, 95), 3),
+        },
+        'browser_launch_seconds': {
+            'p50': round(percentile(launch_times, 50), 3),
+            'max': round(max(launch_times, default=0.0), 3),
+            'driver_cache_misses': sum(1 for launch in launches if launch['cache'] == 'miss'),
+        },
+        'peak_browser_rss_mb': round(sampler.peak / (1024 * 1024), 1),
+        'peak_rss_per_browser_mb': round(sampler.peak / (1024 * 1024) / sessions, 1),
+        'lean': lean,
+        'pipeline_depth': pipeline_depth,
+    }
+
+
+def print_report(result):
+    latency = result['latency_seconds']
+    print(f"Iterations: {result['iterations_completed']}/{result['iterations_requested']} "
+          f"across {result['sessions']} session(s) {result['session_statuses']}")
+    print(f"Wall time: {result['wall_seconds']}s ({result['iterations_per_minute']} iterations/min, "
+          f"pipeline depth {result['pipeline_depth']})")
+    print(f"Iteration latency: p50 {latency['p50']}s, p90 {latency['p90']}s, "
+          f"p95 {latency['p95']}s, p99 {latency['p99']}s, max {latency['max']}s")
+    print(f"Outcomes: {result['outcomes']}; time to outcome p50 {result['time_to_outcome_seconds']['p50']}s, "
+          f"p95 {result['time_to_outcome_seconds']['p95']}s")
+    print(f"Signup page load: p50 {result['page_load_seconds']['p50']}s, p95 {result['page_load_seconds']['p95']}s")
+    launch = result['browser_launch_seconds']
+    print(f"Browser launch: p50 {launch['p50']}s, max {launch['max']}s "
+          f"({launch['driver_cache_misses']} driver cache miss(es))")
+    print(f"Peak browser RSS: {result['peak_browser_rss_mb']} MB ({result['peak_rss_per_browser_mb']} MB per browser)")
+
+
+def print_comparison(off, on):
+    """Side-by-side view of a normal run and a lean-mode run"""
+    rows = [
+        ('Iteration p50 (s)', off['latency_seconds']['p50'], on['latency_seconds']['p50']),
+        ('Page load p50 (s)', off['page_load_seconds']['p50'], on['page_load_seconds']['p50']),
+        ('Page load p95 (s)', off['page_load_seconds']['p95'], on['page_load_seconds']['p95']),
+        ('RSS per browser (MB)', off['peak_rss_per_browser_mb'], on['peak_rss_per_browser_mb']),
+        ('Iterations/min', off['iterations_per_minute'], on['iterations_per_minute']),
+    ]
+    print(f"{'':24}{'lean off':>12}{'lean on':>12}")
+    for label, before, after in rows:
+        print(f"{label:24}{before:>12}{after:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark run_automation against the local mock dashboard')
+    parser.add_argument('-n', '--iterations', type=int, default=5, help='purchases per session')
+    parser.add_argument('-m', '--sessions', type=int, default=1, help='concurrent browser sessions')
+    parser.add_argument('--account', default='50k-Tradovate')
+    parser.add_argument('--latency', type=float, default=0.0, help='mock server latency per response, in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='random extra mock latency, in seconds')
+    parser.add_argument('--pay-latency', type=float, default=0.0, help='mock payment processing time, in seconds')
+    parser.add_argument('--pool-size', type=int, default=None, help='driver pool size (default: one per session, 0 disables)')
+    parser.add_argument('--warm', action='store_true', help='pre-launch pooled browsers before starting the clock')
+    parser.add_argument('--bulk-fill', action='store_true', help='fill each checkout page with one script execution')
+    parser.add_argument('--pipeline-depth', type=int, default=1, help='checkout tabs kept busy per session')
+    parser.add_argument('--lean', action='store_true', help='headless browsers with CDP resource blocking')
+    parser.add_argument('--compare-lean', action='store_true', help='run with lean mode off, then on, and compare')
+    parser.add_argument('--json', action='store_true', help='print the result as JSON')
+    args = parser.parse_args()
+
+    options = dict(pool_size=args.pool_size, warm=args.warm, bulk_fill=args.bulk_fill,
+                   pipeline_depth=args.pipeline_depth)
+    run_args = (args.iterations, args.sessions, args.account, args.latency, args.jitter, args.pay_latency)
+    if args.compare_lean:
+        off = run_benchmark(*run_args, lean=False, **options)
+        on = run_benchmark(*run_args, lean=True, **options)
+        if args.json:
+            print(json.dumps({'lean_off': off, 'lean_on': on}, indent=2))
+        else:
+            print_comparison(off, on)
+        return
+
+    result = run_benchmark(*run_args, lean=args.lean, **options)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Chrome driver construction shared by the API server, app.py and the driver pool
+"""
+
+import os
+import time
+import undetected_chromedriver as uc
+from command_trace import instrument
+from driver_cache import ensure_driver
+from page_readiness import PAGE_LOAD_STRATEGY
+from resource_governor import BROWSER_MARKER
+
+# Lean mode: headless Chrome that skips resources the checkout flow never looks at
+LEAN_MODE = os.getenv('LEAN_MODE', '0').lower() in ('1', 'true', 'yes')
+HEADLESS = os.getenv('HEADLESS', '0').lower() in ('1', 'true', 'yes')
+
+# URL patterns blocked over CDP in lean mode. Images, media and fonts are
+# matched by extension; the domains are analytics, ad and session-replay
+# vendors. Stylesheets and first-party scripts stay enabled because the
+# forms and the consent dialog depend on them. Extend with BLOCKED_URLS.
+BLOCKED_RESOURCE_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico', '*.bmp',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.mp3', '*.ogg',
+]
+BLOCKED_DOMAIN_PATTERNS = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*analytics.js*', '*doubleclick.net*',
+    '*googlesyndication.com*', '*googleadservices.com*', '*facebook.net*', '*connect.facebook.com*',
+    '*hotjar.com*', '*clarity.ms*', '*segment.io*', '*cdn.segment.com*', '*mixpanel.com*',
+    '*intercom.io*', '*intercomcdn.com*', '*tiktok.com*', '*twitter.com/i/adsct*', '*bing.com/bat*',
+    '*fullstory.com*', '*sentry.io*', '*youtube.com*', '*vimeo.com*', '*fonts.googleapis.com*',
+    '*fonts.gstatic.com*', '*use.typekit.net*',
+]
+
+
+# Callables(report) run after every browser launch with the driver cache report and launch_seconds
+launch_listeners = []
+
+
+def blocked_url_patterns():
+    """Full blocklist including any comma-separated BLOCKED_URLS additions"""
+    extra = [pattern.strip() for pattern in os.getenv('BLOCKED_URLS', '').split(',') if pattern.strip()]
+    return BLOCKED_RESOURCE_PATTERNS + BLOCKED_DOMAIN_PATTERNS + extra
+
+
+def build_options(lean=False):
+    """Chrome options used for every automation browser"""
+    options = uc.ChromeOptions()
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument(BROWSER_MARKER)
+    # Commands no longer block on third-party resources; page_readiness decides when a page is usable
+    options.page_load_strategy = PAGE_LOAD_STRATEGY
+    # Background tabs of a pipelined job must load and run their timers at full speed
+    options.add_argument('--disable-background-timer-throttling')
+    options.add_argument('--disable-renderer-backgrounding')
+    options.add_argument('--disable-backgrounding-occluded-windows')
+    if lean:
+        options.add_argument('--blink-settings=imagesEnabled=false')
+        options.add_argument('--disable-extensions')
+        options.add_argument('--disable-background-networking')
+        options.add_argument('--mute-audio')
+    return options
+
+
+def apply_lean_mode(driver):
+    """Block the lean-mode URL patterns on the driver's current tab"""
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked_url_patterns()})
+
+
+def create_driver(lean=None, headless=None):
+    """Launch a new undetected Chrome instance (defaults from LEAN_MODE / HEADLESS)"""
+    lean = LEAN_MODE if lean is None else lean
+    headless = (HEADLESS or lean) if headless is None else headless
+    started = time.perf_counter()
+    # A cached, already patched driver binary lets concurrent launches skip uc's download and patch
+    report = ensure_driver()
+    driver = uc.Chrome(options=build_options(lean), headless=headless, version_main=report['version_main'],
+                       driver_executable_path=report['driver_path'], browser_executable_path=report['chrome_path'])
+    report['launch_seconds'] = round(time.perf_counter() - started, 3)
+    driver.launch_report = report
+    instrument(driver)
+    for listener in launch_listeners:
+        listener(report)
+    driver.lean_mode = lean
+    if lean:
+        apply_lean_mode(driver)
+    return driver
+
+
+def open_tab(driver):
+    """Open a new tab, switch to it and return its handle; lean drivers block URLs there too"""
+    driver.switch_to.new_window('tab')
+    if getattr(driver, 'lean_mode', False):
+        apply_lean_mode(driver)
+    return driver.current_window_handle
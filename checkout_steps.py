@@ -0,0 +1,403 @@
+"""
+Declarative checkout step engine for the Apex signup flow
+Each step waits on an explicit readiness condition instead of a fixed sleep
+"""
+
+import json
+import os
+import time
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import Select
+from selenium.common.exceptions import (
+    ElementClickInterceptedException, ElementNotInteractableException, JavascriptException,
+    NoSuchElementException, StaleElementReferenceException, TimeoutException, WebDriverException,
+)
+from command_trace import sleep, span
+from page_readiness import NavigationError, navigate
+
+# Fixed pauses the old loop slept after each action, kept for the timing comparison
+LEGACY_SLEEP_SCHEDULE = {
+    'navigate': 5,
+    'coupon': 2,
+    'agree': 2,
+    'next': 3,
+    'card_number': 2,
+    'expiry_month': 2,
+    'expiry_year': 2,
+    'cvv': 2,
+    'pay': 8,
+    # Bulk-fill steps cover the same fields as coupon+agree+next and card_number..cvv
+    'fill_signup': 7,
+    'fill_card': 8,
+}
+
+
+# How often a step's completion condition is re-checked
+DONE_POLL_SECONDS = 0.05
+
+
+class StepTimeoutError(Exception):
+    """Raised when a step's readiness condition does not hold within its timeout"""
+
+    def __init__(self, step_name, timeout):
+        super().__init__(f"Step '{step_name}' not ready after {timeout}s")
+        self.step_name = step_name
+        self.timeout = timeout
+
+
+class BulkFillMismatch(Exception):
+    """Raised when fields set by a bulk fill do not read back with the expected values"""
+
+    def __init__(self, mismatches):
+        super().__init__(f"Bulk fill mismatch on {', '.join(item['id'] for item in mismatches)}")
+        self.mismatches = mismatches
+
+
+class SessionExpiredError(Exception):
+    """Raised when the dashboard bounced the browser back to the login form mid-checkout"""
+
+    def __init__(self, step_name):
+        super().__init__(f"Logged out during step '{step_name}'")
+        self.step_name = step_name
+
+
+class ActionUncertainError(Exception):
+    """Raised when a non-idempotent step failed after its action ran; it may have taken effect, so it is never repeated"""
+
+    def __init__(self, step_name, error):
+        super().__init__(f"Step '{step_name}' failed after its action ran, not repeating it: {error}")
+        self.step_name = step_name
+        self.error = error
+
+
+class Step:
+    """One action in the checkout flow plus the condition that must hold before it runs"""
+
+    def __init__(self, name, ready, action, timeout=15, done=None, fallback=None, idempotent=True):
+        self.name = name
+        self.ready = ready  # callable(ctx) -> expected condition, or None to run immediately
+        self.action = action  # callable(driver, element, ctx)
+        self.timeout = timeout
+        self.done = done  # optional callable(element, ctx) -> condition to wait for after the action
+        self.fallback = fallback  # steps to run instead if the action raises BulkFillMismatch
+        self.idempotent = idempotent  # False if repeating the action could have side effects (paying twice)
+
+
+# Failures worth retrying at the same step: the DOM moved or was not ready yet
+TRANSIENT_ERRORS = (
+    StaleElementReferenceException, ElementClickInterceptedException, ElementNotInteractableException,
+    NoSuchElementException, JavascriptException, StepTimeoutError, NavigationError,
+)
+
+# Retries per step for transient failures, with exponential backoff between attempts
+STEP_RETRIES = int(os.getenv('STEP_RETRIES', '2'))
+RETRY_BACKOFF_SECONDS = float(os.getenv('RETRY_BACKOFF_SECONDS', '0.25'))
+RETRY_BACKOFF_MAX_SECONDS = 2.0
+
+
+def session_lost(driver):
+    """True when the browser is showing the login form instead of the checkout"""
+    try:
+        return bool(driver.find_elements(By.ID, 'amember-login'))
+    except Exception:
+        # A dead or half-built driver cannot tell; let the original error stand
+        return False
+
+
+def classify_error(driver, error):
+    """Sort a step failure into 'session_expired', 'transient' or 'terminal'"""
+    if isinstance(error, SessionExpiredError) or session_lost(driver):
+        return 'session_expired'
+    if isinstance(error, TRANSIENT_ERRORS):
+        return 'transient'
+    return 'terminal'
+
+
+def scroll_into_view(driver, element):
+    """Center an element in the viewport without the smooth-scroll animation delay"""
+    driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
+
+
+def type_into(driver, element, text):
+    """Clear an input and type text into it"""
+    scroll_into_view(driver, element)
+    element.clear()
+    element.send_keys(text)
+
+
+def _navigate(driver, element, ctx):
+    ctx['navigation'] = navigate(driver, ctx['url'], selector='#coupon-0')
+
+
+def _coupon(driver, element, ctx):
+    type_into(driver, element, ctx['coupon_code'])
+
+
+def _agree(driver, element, ctx):
+    scroll_into_view(driver, element)
+    if not element.is_selected():
+        driver.execute_script("arguments[0].click();", element)
+
+
+def _next(driver, element, ctx):
+    element.click()
+
+
+def _card_number(driver, element, ctx):
+    type_into(driver, element, ctx['card_number'])
+
+
+def _expiry_month(driver, element, ctx):
+    Select(element).select_by_value(ctx['card_expired_month'])
+
+
+def _expiry_year(driver, element, ctx):
+    Select(element).select_by_value(ctx['card_expired_year'])
+
+
+def _cvv(driver, element, ctx):
+    type_into(driver, element, ctx['card_code'])
+
+
+def _pay(driver, element, ctx):
+    ctx['payment_page'] = driver.execute_script('return performance.timeOrigin')
+    ctx['paid_at'] = time.perf_counter()
+    driver.execute_script("arguments[0].click();", element)
+
+
+def _clickable(element_id):
+    return lambda ctx: EC.element_to_be_clickable((By.ID, element_id))
+
+
+def _visible(element_id):
+    return lambda ctx: EC.visibility_of_element_located((By.ID, element_id))
+
+
+# URLs of aMember's thank-you page; it usually carries a query string or fragment (/thanks?id=...).
+# The same source is a valid case-insensitive pattern for Python's re and JavaScript
+CONFIRMED_URL_PATTERN = r'/thanks?(/|-you|[?#]|$)|payment[-_]?success'
+
+# Classifies the page that replaced the payment page, or returns null while it is
+# still loading. arguments: performance.timeOrigin of the payment page
+OUTCOME_SCRIPT = """
+const previousOrigin = arguments[0];
+if (performance.timeOrigin === previousOrigin || document.readyState === 'loading') return null;
+const url = location.href;
+if (new RegExp(%s, 'i').test(url) ||
+        document.querySelector('#thank-you, .am-thanks, .thank-you')) {
+    return {outcome: 'confirmed', message: null, url: url};
+}
+const errors = Array.from(document.querySelectorAll('.error, .am-error, .alert-danger, .errors'))
+    .map(element => element.textContent.trim()).filter(Boolean);
+if (errors.length) {
+    const message = errors.join(' | ');
+    const declined = /declin|insufficient|do not honou?r|refused|fraud|card was not/i.test(message);
+    return {outcome: declined ? 'declined' : 'validation_error', message: message, url: url};
+}
+if (document.getElementById('cc_number')) {
+    return {outcome: 'validation_error', message: 'Payment form shown again', url: url};
+}
+return null;
+""" % json.dumps(CONFIRMED_URL_PATTERN)
+
+# Outcomes after the pay click; only 'confirmed' counts as a purchase
+PURCHASE_OUTCOMES = ('confirmed', 'declined', 'validation_error')
+
+
+def _outcome_known(element, ctx):
+    """Condition racing the confirmation, decline and validation-error signals"""
+    def detect(driver):
+        try:
+            result = driver.execute_script(OUTCOME_SCRIPT, ctx['payment_page'])
+        except WebDriverException:
+            # The payment page unloaded mid-script; the next poll sees the new one
+            return False
+        if not result:
+            return False
+        result['time_to_outcome_ms'] = round((time.perf_counter() - ctx['paid_at']) * 1000, 1)
+        ctx['outcome'] = result
+        return result
+    return detect
+
+
+# Fills several fields in one script execution, firing the events a user would,
+# then reads every value back. arguments: [[id, kind, value], ...], id to click if all match
+BULK_FILL_SCRIPT = """
+const fields = arguments[0];
+const clickId = arguments[1];
+const mismatches = [];
+const valueSetters = {
+    INPUT: Object.getOwnPropertyDescriptor(HTMLInputElement.prototype, 'value').set,
+    SELECT: Object.getOwnPropertyDescriptor(HTMLSelectElement.prototype, 'value').set,
+};
+function fire(element, type) {
+    element.dispatchEvent(new Event(type, {bubbles: true}));
+}
+for (const [id, kind, value] of fields) {
+    const element = document.getElementById(id);
+    if (!element) {
+        mismatches.push({id: id, expected: value, actual: null});
+        continue;
+    }
+    element.scrollIntoView({block: 'center'});
+    fire(element, 'focus');
+    if (kind === 'checkbox') {
+        if (element.checked !== value) element.click();
+    } else {
+        // The native setter keeps framework-managed inputs in sync with the DOM value
+        valueSetters[element.tagName].call(element, value);
+        fire(element, 'input');
+        fire(element, 'change');
+    }
+    fire(element, 'blur');
+    const actual = kind === 'checkbox' ? element.checked : element.value;
+    if (actual !== value) mismatches.push({id: id, expected: value, actual: actual});
+}
+if (clickId && mismatches.length === 0) document.getElementById(clickId).click();
+return {ok: mismatches.length === 0, mismatches: mismatches};
+"""
+
+
+def bulk_fill(driver, fields, click_id=None):
+    """Set fields in one WebDriver command; raises BulkFillMismatch if any value did not stick"""
+    result = driver.execute_script(BULK_FILL_SCRIPT, fields, click_id)
+    if not result['ok']:
+        raise BulkFillMismatch(result['mismatches'])
+
+
+def _fill_signup(driver, element, ctx):
+    bulk_fill(driver, [
+        ['coupon-0', 'text', str(ctx['coupon_code'])],
+        ['_i_agree-page-0-0-0', 'checkbox', True],
+    ], click_id='_qf_page-0_next-0')
+
+
+def _fill_card(driver, element, ctx):
+    bulk_fill(driver, [
+        ['cc_number', 'text', str(ctx['card_number'])],
+        ['m-0', 'select', str(ctx['card_expired_month'])],
+        ['y-0', 'select', str(ctx['card_expired_year'])],
+        ['cc_code', 'text', str(ctx['card_code'])],
+    ])
+
+
+NAVIGATE_STEP = Step('navigate', None, _navigate, timeout=30)
+SIGNUP_STEPS = [
+    Step('coupon', _visible('coupon-0'), _coupon),
+    Step('agree', lambda ctx: EC.presence_of_element_located((By.ID, '_i_agree-page-0-0-0')), _agree),
+    Step('next', _clickable('_qf_page-0_next-0'), _next),
+]
+CARD_STEPS = [
+    Step('card_number', _visible('cc_number'), _card_number, timeout=20),
+    Step('expiry_month', _visible('m-0'), _expiry_month),
+    Step('expiry_year', _visible('y-0'), _expiry_year),
+    Step('cvv', _visible('cc_code'), _cvv),
+]
+PAY_STEP = Step('pay', _clickable('qfauto-0'), _pay, timeout=30, done=_outcome_known, idempotent=False)
+
+# Ordered checkout flow for a single account purchase, one WebDriver call per field
+CHECKOUT_STEPS = [NAVIGATE_STEP] + SIGNUP_STEPS + CARD_STEPS + [PAY_STEP]
+
+# Same flow with each checkout page filled by a single script execution;
+# a page whose values do not verify is redone field by field
+BULK_CHECKOUT_STEPS = [
+    NAVIGATE_STEP,
+    Step('fill_signup', _visible('coupon-0'), _fill_signup, fallback=SIGNUP_STEPS),
+    Step('fill_card', _visible('cc_number'), _fill_card, timeout=20, fallback=CARD_STEPS),
+    PAY_STEP,
+]
+
+
+def run_steps(driver, steps, ctx, log=None, retries=STEP_RETRIES):
+    """Run steps in order, moving on as soon as each readiness condition holds.
+
+    Transient failures are retried at the failing step with exponential backoff
+    and recorded in ctx['retries']. Any failure of a step that is not idempotent
+    after its action has run raises ActionUncertainError; otherwise a logged-out
+    browser raises SessionExpiredError and terminal failures are re-raised.
+
+    Returns a list of (step_name, seconds) pairs for the timing breakdown.
+    """
+    timings = []
+    for step in steps:
+        with span(step.name, step=step.name):
+            started = time.perf_counter()
+            fell_back = False
+            for attempt in range(retries + 1):
+                acted = False
+                try:
+                    element = None
+                    if step.ready is not None:
+                        try:
+                            element = WebDriverWait(driver, step.timeout).until(step.ready(ctx))
+                        except TimeoutException:
+                            raise StepTimeoutError(step.name, step.timeout)
+
+                    acted = True
+                    step.action(driver, element, ctx)
+
+                    if step.done is not None:
+                        try:
+                            WebDriverWait(driver, step.timeout, poll_frequency=DONE_POLL_SECONDS).until(step.done(element, ctx))
+                        except TimeoutException:
+                            raise StepTimeoutError(step.name, step.timeout)
+                    break
+                except BulkFillMismatch as e:
+                    if not step.fallback:
+                        raise
+                    if log:
+                        log(f"{e}; falling back to per-field entry", step=step.name)
+                    timings.append((f'{step.name}_attempt', time.perf_counter() - started))
+                    timings.extend(run_steps(driver, step.fallback, ctx, log, retries))
+                    fell_back = True
+                    break
+                except Exception as e:
+                    if acted and not step.idempotent:
+                        # The pay click may have gone through: terminal for this account, even if logged out,
+                        # so neither a retry here nor a re-login restarting the checkout can repeat it
+                        if isinstance(e, ActionUncertainError):
+                            raise
+                        raise ActionUncertainError(step.name, e) from e
+                    kind = classify_error(driver, e)
+                    if kind == 'session_expired':
+                        if isinstance(e, SessionExpiredError):
+                            raise
+                        raise SessionExpiredError(step.name) from e
+                    if kind != 'transient' or attempt == retries:
+                        raise
+                    reason = type(e).__name__
+                    delay = min(RETRY_BACKOFF_MAX_SECONDS, RETRY_BACKOFF_SECONDS * 2 ** attempt)
+                    ctx.setdefault('retries', []).append({'step': step.name, 'reason': reason})
+                    if log:
+                        log(f"Step '{step.name}' hit {reason}, retry {attempt + 1}/{retries} in {delay:.2f}s", step=step.name)
+                    sleep(delay, 'retry_backoff')
+            if fell_back:
+                continue
+
+            elapsed = time.perf_counter() - started
+            timings.append((step.name, elapsed))
+            if log:
+                log(f"Step '{step.name}' done in {elapsed:.2f}s", step=step.name)
+    return timings
+
+
+def timing_summary(timings):
+    """Build a JSON-friendly per-iteration breakdown compared to the sleep schedule"""
+    total = sum(seconds for _, seconds in timings)
+    legacy_sleep = sum(LEGACY_SLEEP_SCHEDULE.get(name, 0) for name, _ in timings)
+    return {
+        'steps': {name: round(seconds, 3) for name, seconds in timings},
+        'total_seconds': round(total, 3),
+        'legacy_sleep_seconds': legacy_sleep,
+        'saved_seconds': round(legacy_sleep - total, 3),
+    }
+
+
+def format_timing(summary):
+    """Render a timing summary as a single log line"""
+    steps = ', '.join(f"{name} {seconds:.2f}s" for name, seconds in summary['steps'].items())
+    return (f"⏱️ {steps} | total {summary['total_seconds']:.2f}s vs "
+            f"{summary['legacy_sleep_seconds']}s of fixed sleeps "
+            f"(saved {summary['saved_seconds']:.2f}s)")
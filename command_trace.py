@@ -0,0 +1,154 @@
+"""
+Opt-in WebDriver command tracing
+With TRACE_DIR set, every job writes a JSONL trace of its WebDriver commands,
+pacing sleeps and the spans (login, checkout, step) they ran in, so
+trace_report.py can show where an iteration's time went.
+
+One record per line, times in ms since the trace started:
+    {"k": "cmd"|"sleep"|"span", "n": name, "t": start, "d": duration,
+     "u": enclosing span id, "id": span id (spans only), "i": iteration, "s": step,
+     "e": exception class or WebDriver error code (failed commands only)}
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Directory for trace files; tracing is off when unset
+TRACE_DIR = os.getenv('TRACE_DIR')
+
+_local = threading.local()
+
+
+class Tracer:
+    """Appends trace records for one job to a JSONL file; used only from the job's thread"""
+
+    def __init__(self, path, session_id):
+        self.path = path
+        self._file = open(path, 'w', encoding='utf-8')
+        self._origin = time.perf_counter()
+        self._next_id = 1
+        self._spans = [{'id': 0, 'i': None, 's': None}]  # open spans, innermost last
+        self._write({'k': 'trace', 'session': session_id, 'started': time.time(), 'pid': os.getpid()})
+
+    def _write(self, record):
+        self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def _ms(self, moment):
+        return round((moment - self._origin) * 1000, 3)
+
+    def record(self, kind, name, started, ended, error=None):
+        """Write one leaf record (a command or a sleep) inside the innermost open span"""
+        parent = self._spans[-1]
+        record = {'k': kind, 'n': name, 't': self._ms(started), 'd': round((ended - started) * 1000, 3),
+                  'u': parent['id'], 'i': parent['i'], 's': parent['s']}
+        if error is not None:
+            record['e'] = error
+        self._write(record)
+
+    def open_span(self, name, iteration=None, step=None):
+        parent = self._spans[-1]
+        span = {'id': self._next_id, 'n': name, 'u': parent['id'], 'started': time.perf_counter(),
+                'i': parent['i'] if iteration is None else iteration,
+                's': parent['s'] if step is None else step}
+        self._next_id += 1
+        self._spans.append(span)
+        return span
+
+    def close_span(self, span):
+        self._spans.remove(span)
+        self._write({'k': 'span', 'n': span['n'], 'id': span['id'], 'u': span['u'], 't': self._ms(span['started']),
+                     'd': round((time.perf_counter() - span['started']) * 1000, 3), 'i': span['i'], 's': span['s']})
+
+    def close(self):
+        self._file.close()
+
+
+def current():
+    """The calling thread's tracer, or None when this thread is not tracing"""
+    return getattr(_local, 'tracer', None)
+
+
+def start_trace(session_id, trace_dir=None):
+    """Begin tracing the calling thread's job; returns the Tracer, or None when tracing is off"""
+    trace_dir = trace_dir or TRACE_DIR
+    if not trace_dir:
+        return None
+    os.makedirs(trace_dir, exist_ok=True)
+    tracer = Tracer(os.path.join(trace_dir, f'{time.strftime("%Y%m%d-%H%M%S")}-{session_id[:8]}.jsonl'), session_id)
+    _local.tracer = tracer
+    return tracer
+
+
+def stop_trace():
+    """Finish the calling thread's trace; returns the trace file path or None"""
+    tracer = current()
+    if tracer is None:
+        return None
+    _local.tracer = None
+    tracer.close()
+    return tracer.path
+
+
+@contextmanager
+def span(name, iteration=None, step=None):
+    """Group the commands and sleeps of a block under name (and optionally an iteration/step)"""
+    tracer = current()
+    if tracer is None:
+        yield
+        return
+    opened = tracer.open_span(name, iteration, step)
+    try:
+        yield
+    finally:
+        tracer.close_span(opened)
+
+
+def sleep(seconds, reason='sleep'):
+    """time.sleep that shows up in the trace as a 'sleep:<reason>' record"""
+    tracer = current()
+    if tracer is None:
+        time.sleep(seconds)
+        return
+    started = time.perf_counter()
+    time.sleep(seconds)
+    tracer.record('sleep', f'sleep:{reason}', started, time.perf_counter())
+
+
+def command_name(command, params):
+    """Trace name of a WebDriver command; CDP calls are named after their method"""
+    if command == 'executeCdpCommand' and params:
+        return f"cdp:{params.get('cmd')}"
+    return command
+
+
+def instrument(driver):
+    """Wrap the driver's command executor so commands are recorded while its thread is tracing.
+
+    Idempotent, and costs one attribute lookup per command when tracing is off.
+    """
+    executor = driver.command_executor
+    if getattr(executor, 'traced', False):
+        return driver
+    execute = executor.execute
+
+    def traced_execute(command, params):
+        tracer = current()
+        if tracer is None:
+            return execute(command, params)
+        started = time.perf_counter()
+        try:
+            result = execute(command, params)
+        except Exception as e:
+            tracer.record('cmd', command_name(command, params), started, time.perf_counter(), type(e).__name__)
+            raise
+        value = result.get('value') if isinstance(result, dict) else None
+        error = value.get('error') if isinstance(value, dict) else None
+        tracer.record('cmd', command_name(command, params), started, time.perf_counter(), error)
+        return result
+
+    executor.execute = traced_execute
+    executor.traced = True
+    return driver
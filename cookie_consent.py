@@ -0,0 +1,143 @@
+"""
+Cookie consent handler shared by the API server, app.py and shadowDom.py
+Finds and clicks "Reject All" inside the consent dialog's shadow DOM in a
+single execute_async_script call, using MutationObservers instead of sleeps
+"""
+
+import time
+
+# Reject button candidates inside the shadow root, most specific first
+REJECT_BUTTON_SELECTORS = [
+    '#cf_consent-buttons__reject-all',
+    'button#cf_consent-buttons__reject-all',
+    '.cf_button--reject',
+    'button.cf_button--reject',
+    "button[class*='reject']",
+]
+
+# arguments: selectors, appear timeout (ms), close timeout (ms), callback
+CONSENT_SCRIPT = """
+const selectors = arguments[0];
+const appearTimeoutMs = arguments[1];
+const closeTimeoutMs = arguments[2];
+const done = arguments[arguments.length - 1];
+const started = performance.now();
+const observers = [];
+const timers = [];
+let poll = null;
+const report = {status: null, selector: null, appeared_ms: null, closed_ms: null};
+let finished = false;
+let clicked = false;
+
+function elapsed() { return Math.round((performance.now() - started) * 10) / 10; }
+
+function finish(status) {
+    if (finished) return;
+    finished = true;
+    observers.forEach(observer => observer.disconnect());
+    timers.forEach(timer => clearTimeout(timer));
+    clearInterval(poll);
+    report.status = status;
+    report.elapsed_ms = elapsed();
+    done(report);
+}
+
+function watch(target, options) {
+    const observer = new MutationObserver(check);
+    observer.observe(target, options);
+    observers.push(observer);
+}
+
+function visible(element) {
+    return element.getClientRects().length > 0;
+}
+
+function findButton(root) {
+    for (const selector of selectors) {
+        const button = root.querySelector(selector);
+        if (button && visible(button)) {
+            report.selector = selector;
+            return button;
+        }
+    }
+    const byText = Array.from(root.querySelectorAll('button'))
+        .find(button => button.textContent.toLowerCase().includes('reject'));
+    if (byText) report.selector = 'text:' + byText.textContent.trim();
+    return byText || null;
+}
+
+let watchedRoot = null;
+
+function check() {
+    if (finished) return;
+    const host = document.querySelector('div.cf_modal_container');
+    const root = host && host.shadowRoot;
+    if (root && root !== watchedRoot) {
+        // Shadow content does not bubble mutations to the document, so observe it directly
+        watchedRoot = root;
+        watch(root, {childList: true, subtree: true, attributes: true, attributeFilter: ['open']});
+    }
+    const dialog = root && root.querySelector('dialog.cf_modal');
+
+    if (clicked) {
+        if (!dialog || !dialog.isConnected || !dialog.hasAttribute('open')) {
+            report.closed_ms = elapsed();
+            finish('rejected');
+        }
+        return;
+    }
+    if (!dialog || !dialog.hasAttribute('open')) return;
+
+    report.appeared_ms = elapsed();
+    const button = findButton(root);
+    if (!button) {
+        finish('no_button');
+        return;
+    }
+    clicked = true;
+    button.click();
+    timers.push(setTimeout(() => finish('still_open'), closeTimeoutMs));
+    check();
+}
+
+watch(document.documentElement, {childList: true, subtree: true});
+// attachShadow() is not a DOM mutation, so poll cheaply until the shadow root exists
+poll = setInterval(() => { if (watchedRoot) clearInterval(poll); else check(); }, 100);
+timers.push(setTimeout(() => { if (!clicked) finish('not_present'); }, appearTimeoutMs));
+check();
+"""
+
+# Outcomes after which the page is usable
+HANDLED_STATUSES = ('rejected', 'not_present')
+
+
+def handle_cookie_consent(driver, timeout=10, close_timeout=5, log=print):
+    """Reject cookies if the consent dialog appears within timeout seconds.
+
+    Returns a report dict with the outcome ('rejected', 'not_present',
+    'no_button', 'still_open' or 'error'), the selector that matched and
+    the in-page and total timings in milliseconds.
+    """
+    log("Looking for cookie consent dialog...")
+    started = time.perf_counter()
+    try:
+        report = driver.execute_async_script(
+            CONSENT_SCRIPT, REJECT_BUTTON_SELECTORS, int(timeout * 1000), int(close_timeout * 1000)
+        )
+    except Exception as e:
+        report = {'status': 'error', 'error': str(e)}
+    report['total_ms'] = round((time.perf_counter() - started) * 1000, 1)
+
+    status = report['status']
+    if status == 'rejected':
+        log(f"Clicked Reject All ({report['selector']}); dialog closed after {report['closed_ms']}ms")
+    elif status == 'not_present':
+        log(f"No cookie consent dialog appeared within {timeout}s")
+    elif status == 'no_button':
+        log("Cookie consent dialog found but Reject All button was not")
+    elif status == 'still_open':
+        log("Clicked Reject All but the dialog did not close")
+    else:
+        log(f"Error handling cookie consent: {report.get('error')}")
+    log(f"Cookie consent handling completed in {report['total_ms']}ms")
+    return report
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Local cache of patched chromedriver binaries keyed by Chrome major version
+The installed Chrome version is detected once (and remembered until the binary
+changes); the matching driver is downloaded and patched the first time only.
+Every later launch starts from the cached binary with no network or patching work.
+
+`python driver_cache.py` fills the cache ahead of time, e.g. while building an image.
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import undetected_chromedriver as uc
+
+CACHE_DIR = os.path.abspath(os.path.expanduser(os.getenv('CHROMEDRIVER_CACHE_DIR', '~/.cache/apex-chromedriver')))
+# Set to skip detection, e.g. when Chrome lives somewhere find_chrome_executable() does not look
+CHROME_BINARY = os.getenv('CHROME_BINARY')
+CHROME_VERSION = os.getenv('CHROME_VERSION')
+
+DRIVER_NAME = 'chromedriver.exe' if sys.platform.startswith('win') else 'chromedriver'
+VERSION_PATTERN = re.compile(r'(\d+)\.\d+\.\d+\.\d+')
+
+# One download/patch at a time within the process
+_build_lock = threading.Lock()
+_detected = None
+
+
+class ChromeNotFoundError(Exception):
+    """Raised when no Chrome binary or version can be found"""
+
+
+def _read_version(chrome_path):
+    """Ask the Chrome binary (or on Windows, its file metadata) for its version"""
+    if sys.platform.startswith('win'):
+        # chrome.exe --version prints nothing on Windows
+        command = ['powershell', '-NoProfile', '-Command', f"(Get-Item '{chrome_path}').VersionInfo.ProductVersion"]
+    else:
+        command = [chrome_path, '--version']
+    output = subprocess.run(command, capture_output=True, text=True, timeout=15).stdout
+    match = VERSION_PATTERN.search(output)
+    if not match:
+        raise ChromeNotFoundError(f"Could not read the Chrome version from {chrome_path!r}: {output.strip()!r}")
+    return match.group(0)
+
+
+def detect_chrome():
+    """(chrome path, full version) of the installed browser, detected once per Chrome binary.
+
+    The result is kept in memory and in the cache directory, keyed by the binary's
+    path and modification time, so a Chrome update triggers a new detection.
+    """
+    global _detected
+    if _detected is not None:
+        return _detected
+
+    chrome_path = CHROME_BINARY or uc.find_chrome_executable()
+    if not chrome_path:
+        raise ChromeNotFoundError('Chrome is not installed or not on PATH; set CHROME_BINARY')
+    if CHROME_VERSION:
+        _detected = (chrome_path, CHROME_VERSION)
+        return _detected
+
+    record_path = os.path.join(CACHE_DIR, 'chrome.json')
+    mtime = os.path.getmtime(chrome_path)
+    try:
+        with open(record_path) as f:
+            record = json.load(f)
+        if record['path'] == chrome_path and record['mtime'] == mtime:
+            _detected = (chrome_path, record['version'])
+            return _detected
+    except (OSError, ValueError, KeyError):
+        pass
+
+    version = _read_version(chrome_path)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(record_path, 'w') as f:
+        json.dump({'path': chrome_path, 'mtime': mtime, 'version': version}, f)
+    _detected = (chrome_path, version)
+    return _detected
+
+
+def major_version(version):
+    return int(version.split('.')[0])
+
+
+def cached_driver_path(major):
+    return os.path.join(CACHE_DIR, str(major), DRIVER_NAME)
+
+
+def _build(major, target):
+    """Download the chromedriver release for a Chrome major version, patch it and move it to target"""
+    staging_dir = os.path.join(CACHE_DIR, f'.building-{major}-{os.getpid()}')
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+    try:
+        # A custom executable path keeps the patcher from deleting the binary when it is collected
+        patcher = uc.Patcher(executable_path=os.path.join(staging_dir, DRIVER_NAME), version_main=major)
+        patcher.version_full = patcher.fetch_release_number()
+        patcher.unzip_package(patcher.fetch_package())
+        if not patcher.patch():
+            raise RuntimeError(f"Patching chromedriver {patcher.version_full} failed")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(patcher.executable_path, target)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def ensure_driver():
+    """Patched chromedriver for the installed Chrome, from the cache when possible.
+
+    Returns a report with chrome_path, chrome_version, version_main, driver_path,
+    cache ('hit' or 'miss') and prepare_seconds.
+    """
+    started = time.perf_counter()
+    chrome_path, version = detect_chrome()
+    major = major_version(version)
+    driver_path = cached_driver_path(major)
+    cache = 'hit'
+    if not os.path.exists(driver_path):
+        with _build_lock:
+            if not os.path.exists(driver_path):
+                cache = 'miss'
+                print(f"[DRIVER CACHE] Preparing chromedriver for Chrome {version}...")
+                _build(major, driver_path)
+    return {
+        'chrome_path': chrome_path,
+        'chrome_version': version,
+        'version_main': major,
+        'driver_path': driver_path,
+        'cache': cache,
+        'prepare_seconds': round(time.perf_counter() - started, 3),
+    }
+
+
+if __name__ == '__main__':
+    report = ensure_driver()
+    print(f"Chrome {report['chrome_version']} at {report['chrome_path']}")
+    print(f"chromedriver {report['driver_path']} (cache {report['cache']}, {report['prepare_seconds']:.2f}s)")
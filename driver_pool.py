@@ -0,0 +1,221 @@
+"""
+Warm pool of pre-launched Chrome drivers
+Jobs check a browser out instead of paying the Chrome cold start on every request
+"""
+
+import os
+import threading
+import time
+from browser import create_driver
+from resource_governor import quit_driver
+
+
+class PooledDriver:
+    """Bookkeeping for one browser owned by the pool"""
+
+    __slots__ = ('driver', 'created_at', 'uses')
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.created_at = time.monotonic()
+        self.uses = 0
+
+
+class DriverPool:
+    """Bounded pool of health-checked browsers with age/use based recycling.
+
+    A size of 0 disables pooling: every acquire launches a fresh browser and
+    every release quits it, which matches the old one-Chrome-per-job behaviour.
+    """
+
+    def __init__(self, size=2, max_age=1800, max_uses=20, factory=create_driver):
+        self.size = size
+        self.max_age = max_age
+        self.max_uses = max_uses
+        self.factory = factory
+        self._idle = []
+        self._checked_out = {}
+        self._launching = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _total(self):
+        return len(self._idle) + len(self._checked_out) + self._launching
+
+    def start(self):
+        """Pre-launch browsers in the background until the pool is full"""
+        if self.size <= 0:
+            return
+        threading.Thread(target=self._fill, daemon=True).start()
+
+    def _fill(self):
+        while True:
+            with self._cond:
+                if self._closed or self._total() >= self.size:
+                    return
+                self._launching += 1
+            self._launch_into_idle()
+
+    def _launch_into_idle(self):
+        """Launch one browser and park it as idle (caller already reserved the slot)"""
+        pooled = None
+        try:
+            pooled = PooledDriver(self.factory())
+        except Exception as e:
+            print(f"[POOL] Failed to launch browser: {e}")
+        with self._cond:
+            self._launching -= 1
+            if pooled and not self._closed:
+                self._idle.append(pooled)
+            elif pooled:
+                self._quit(pooled)
+            self._cond.notify_all()
+
+    def _replenish(self):
+        """Start a background launch if the pool has a free slot"""
+        with self._cond:
+            if self._closed or self.size <= 0 or self._total() >= self.size:
+                return
+            self._launching += 1
+        threading.Thread(target=self._launch_into_idle, daemon=True).start()
+
+    def _expired(self, pooled):
+        return (time.monotonic() - pooled.created_at > self.max_age or
+                pooled.uses >= self.max_uses)
+
+    @staticmethod
+    def _healthy(pooled):
+        try:
+            return pooled.driver.execute_script('return 1') == 1
+        except Exception:
+            return False
+
+    @staticmethod
+    def _quit(pooled):
+        quit_driver(pooled.driver, log=lambda message: print(f"[POOL] {message}"))
+
+    def acquire(self, timeout=None):
+        """Check out a healthy browser, launching one if the pool has room.
+
+        Blocks until a browser is free; raises TimeoutError after `timeout` seconds.
+        """
+        if self.size <= 0:
+            return self.factory()
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            pooled = None
+            launch = False
+            with self._cond:
+                while not self._idle and self._total() >= self.size:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError('No browser available in the driver pool')
+                    self._cond.wait(remaining)
+                if self._idle:
+                    pooled = self._idle.pop(0)
+                    self._checked_out[id(pooled.driver)] = pooled
+                else:
+                    self._launching += 1
+                    launch = True
+
+            if launch:
+                try:
+                    pooled = PooledDriver(self.factory())
+                finally:
+                    with self._cond:
+                        self._launching -= 1
+                        if pooled:
+                            self._checked_out[id(pooled.driver)] = pooled
+                        self._cond.notify_all()
+                return pooled.driver
+
+            if not self._expired(pooled) and self._healthy(pooled):
+                return pooled.driver
+
+            # Stale or dead browser: drop it and try again
+            self._discard(pooled)
+
+    def release(self, driver, origins=()):
+        """Return a browser to the pool after clearing the previous user's state"""
+        if self.size <= 0:
+            self._quit(PooledDriver(driver))
+            return
+
+        with self._cond:
+            pooled = self._checked_out.get(id(driver))
+        if pooled is None:
+            self._quit(PooledDriver(driver))
+            return
+
+        pooled.uses += 1
+        if self._expired(pooled) or not self._reset(pooled, origins):
+            self._discard(pooled)
+            return
+
+        with self._cond:
+            self._checked_out.pop(id(driver), None)
+            if self._closed:
+                self._quit(pooled)
+            else:
+                self._idle.append(pooled)
+            self._cond.notify_all()
+
+    def _reset(self, pooled, origins):
+        """Clear cookies, storage and extra tabs; returns False if the browser is unusable"""
+        driver = pooled.driver
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+            for origin in origins:
+                driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+            driver.get('about:blank')
+            return True
+        except Exception as e:
+            print(f"[POOL] Browser reset failed, discarding: {e}")
+            return False
+
+    def _discard(self, pooled):
+        """Quit a browser, free its slot and launch a replacement"""
+        with self._cond:
+            self._checked_out.pop(id(pooled.driver), None)
+            self._cond.notify_all()
+        self._quit(pooled)
+        self._replenish()
+
+    def idle_drivers(self):
+        """Browsers parked in the pool, keyed by a stable owner id"""
+        with self._cond:
+            return {f'pool-{id(pooled.driver)}': pooled.driver for pooled in self._idle}
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'idle': len(self._idle),
+                'checked_out': len(self._checked_out),
+                'launching': self._launching,
+            }
+
+    def shutdown(self):
+        """Quit every idle browser and stop accepting returns"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for pooled in idle:
+            self._quit(pooled)
+
+
+def pool_from_env(factory=create_driver):
+    """Build a pool sized by DRIVER_POOL_SIZE / DRIVER_MAX_AGE / DRIVER_MAX_USES"""
+    return DriverPool(
+        size=int(os.getenv('DRIVER_POOL_SIZE', '2')),
+        max_age=float(os.getenv('DRIVER_MAX_AGE', '1800')),
+        max_uses=int(os.getenv('DRIVER_MAX_USES', '20')),
+        factory=factory,
+    )
@@ -0,0 +1,153 @@
+"""
+Durable journal of running purchase jobs
+Each job's arguments and every iteration's outcome are committed to SQLite as
+the job runs, so after a crash or restart the server knows which purchases went
+through and can resume an unfinished job at the first iteration without a
+recorded outcome. Job arguments hold credentials and card details and are stored
+Fernet-encrypted; the key lives outside the journal file.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from cryptography.fernet import Fernet
+from job_store import load_key
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal_jobs (
+    session_id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    payload BLOB NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS journal_iterations (
+    session_id TEXT NOT NULL,
+    iteration INTEGER NOT NULL,
+    line_item INTEGER NOT NULL,
+    account TEXT NOT NULL,
+    result TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    PRIMARY KEY (session_id, iteration)
+) WITHOUT ROWID;
+"""
+
+# Result of an iteration whose checkout started but never reported back; its payment may have gone through
+IN_PROGRESS = 'in_progress'
+
+
+class JobJournal:
+    """Unfinished jobs and their per-iteration outcomes in one SQLite file.
+
+    Entries exist while a job is queued or running; finish() deletes them when it
+    ends in any way. Whatever is left at startup belongs to jobs a previous
+    process never completed.
+    """
+
+    def __init__(self, path='apex_journal.db', key=None):
+        self.path = path
+        self._fernet = Fernet(key or Fernet.generate_key())
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Every commit reaches the disk before the next checkout starts
+            conn.execute('PRAGMA synchronous=FULL')
+            self._local.conn = conn
+        return conn
+
+    def begin(self, session_id, username, job_args, total):
+        """Record a queued job; outcomes already journaled for session_id (a resume) are kept"""
+        now = time.time()
+        payload = self._fernet.encrypt(json.dumps(job_args).encode('utf-8'))
+        with self._conn() as conn:
+            conn.execute(
+                'INSERT INTO journal_jobs (session_id, username, total, payload, created_at, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (session_id) DO UPDATE SET '
+                'payload = excluded.payload, total = excluded.total, updated_at = excluded.updated_at',
+                (session_id, username, total, payload, now, now)
+            )
+
+    def start_iteration(self, session_id, iteration, line_item, account):
+        """Mark an iteration as started, before any of its checkout steps run"""
+        self._record(session_id, iteration, line_item, account, IN_PROGRESS)
+
+    def record_iteration(self, session_id, iteration, line_item, account, result):
+        """Store an iteration's outcome (confirmed, declined, validation_error or failed)"""
+        self._record(session_id, iteration, line_item, account, result)
+
+    def _record(self, session_id, iteration, line_item, account, result):
+        now = time.time()
+        with self._conn() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO journal_iterations (session_id, iteration, line_item, account, result, recorded_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (session_id, iteration, line_item, account, result, now)
+            )
+            conn.execute('UPDATE journal_jobs SET updated_at = ? WHERE session_id = ?', (now, session_id))
+
+    def finish(self, session_id):
+        """Forget a job that completed, was stopped or cancelled, or was discarded"""
+        with self._conn() as conn:
+            conn.execute('DELETE FROM journal_iterations WHERE session_id = ?', (session_id,))
+            conn.execute('DELETE FROM journal_jobs WHERE session_id = ?', (session_id,))
+
+    def job_args(self, session_id):
+        """Decrypted arguments of a journaled job, or None"""
+        row = self._conn().execute('SELECT payload FROM journal_jobs WHERE session_id = ?', (session_id,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(self._fernet.decrypt(row['payload']))
+
+    def outcomes(self, session_id):
+        """Iteration -> {'line_item', 'account', 'result'} of everything journaled for a job"""
+        rows = self._conn().execute(
+            'SELECT iteration, line_item, account, result FROM journal_iterations WHERE session_id = ? ORDER BY iteration',
+            (session_id,)
+        ).fetchall()
+        return {row['iteration']: {'line_item': row['line_item'], 'account': row['account'], 'result': row['result']}
+                for row in rows}
+
+    def unfinished(self):
+        """Progress of every journaled job, oldest first; never includes job arguments"""
+        rows = self._conn().execute(
+            'SELECT session_id, username, total, created_at, updated_at FROM journal_jobs ORDER BY created_at'
+        ).fetchall()
+        jobs = []
+        for row in rows:
+            outcomes = self.outcomes(row['session_id'])
+            finished = {iteration for iteration, outcome in outcomes.items() if outcome['result'] != IN_PROGRESS}
+            jobs.append({
+                'session_id': row['session_id'],
+                'username': row['username'],
+                'total_iterations': row['total'],
+                'finished_iterations': len(finished),
+                'purchased': sum(1 for outcome in outcomes.values() if outcome['result'] == 'confirmed'),
+                'in_progress': sorted(iteration for iteration, outcome in outcomes.items()
+                                      if outcome['result'] == IN_PROGRESS),
+                'resume_at': next((iteration for iteration in range(1, row['total'] + 1) if iteration not in finished),
+                                  row['total'] + 1),
+                'created_at': row['created_at'],
+                'updated_at': row['updated_at'],
+            })
+        return jobs
+
+
+def journal_from_env():
+    """Open the journal at JOB_JOURNAL_PATH (None when set empty), keyed by JOB_JOURNAL_KEY or JOB_JOURNAL_KEY_FILE"""
+    path = os.getenv('JOB_JOURNAL_PATH', 'apex_journal.db')
+    if not path:
+        return None
+    key = os.getenv('JOB_JOURNAL_KEY')
+    return JobJournal(
+        path=path,
+        key=key.encode('utf-8') if key else load_key(os.getenv('JOB_JOURNAL_KEY_FILE', path + '.key')),
+    )
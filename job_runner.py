@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Job runner for the multi-worker production mode
+The only process that owns browsers: claims queued jobs from the job store,
+runs them through api_server's scheduler and driver pool, and mirrors each
+session's status, progress and logs back into the store for the API workers
+"""
+
+import os
+import threading
+import time
+from flask import Flask, Response
+from werkzeug.serving import make_server
+
+import api_server
+from job_scheduler import DuplicateJobError, QueueFullError
+from job_store import store_from_env
+
+# How often the runner looks for new jobs and control requests and flushes progress, in seconds
+POLL_INTERVAL = float(os.getenv('RUNNER_POLL_INTERVAL', '0.2'))
+# Finished jobs idle for this long are deleted from the store
+EXPIRE_INTERVAL = 60
+# /metrics of the runner (the API workers hold no automation state)
+METRICS_HOST = os.getenv('RUNNER_METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('RUNNER_METRICS_PORT', '8001'))
+
+
+class JobRunner:
+    """Moves jobs and control requests from the store into api_server, and progress back out"""
+
+    def __init__(self, store):
+        self.store = store
+        self._dirty = set()
+        self._mirrored_seq = {}  # session_id -> last log seq written to the store
+        self._lock = threading.Lock()
+        api_server.change_listeners.append(self._mark_dirty)
+
+    def _mark_dirty(self, session):
+        with self._lock:
+            self._dirty.add(session.session_id)
+
+    def fail_interrupted(self):
+        """Mark jobs a previous runner had claimed but not finished as failed"""
+        for session_id in self.store.interrupted_jobs():
+            self.store.append_log(session_id, "❌ Job interrupted by a runner restart", level='error')
+            self.store.set_status(session_id, 'error')
+
+    def claim(self):
+        for session_id, job_args in self.store.claim_jobs():
+            try:
+                api_server.queue_job(job_args, session_id=session_id)
+            except (QueueFullError, DuplicateJobError) as e:
+                self.store.append_log(session_id, f"❌ {e}", level='error')
+                self.store.set_status(session_id, 'error')
+
+    def handle_controls(self):
+        for session_id, command in self.store.take_controls():
+            in_memory = session_id in api_server.sessions
+            if command == 'stop':
+                if in_memory:
+                    api_server.stop_session(session_id)
+                else:
+                    self.store.cancel_unclaimed(session_id)
+                    self.store.append_log(session_id, "Stop request received from frontend")
+                    self.store.set_status(session_id, 'stopped')
+            elif command == 'reset':
+                if in_memory:
+                    api_server.reset_session(session_id)
+                else:
+                    self.store.cancel_unclaimed(session_id)
+                    self.store.set_status(session_id, 'ready', current_iteration=0, total_iterations=0, timings=[],
+                                          line_items=[])
+                self.store.clear_logs(session_id)
+
+    def mirror(self):
+        """Write every changed session's state and new log records to the store"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        # Browser resource samples change without session events
+        dirty.update(session.session_id for session in api_server.sessions.values() if session.driver is not None)
+        for session_id in dirty:
+            session = api_server.sessions.get(session_id, touch=False)
+            if session is None:
+                continue
+            records = session.logs.since(self._mirrored_seq.get(session_id, 0))
+            with session.changed:
+                snapshot = (session.status, session.current_iteration, session.total_iterations, list(session.timings),
+                            [dict(item) for item in session.line_items])
+            self.store.update(session_id, *snapshot, api_server.governor.samples.get(session_id), records)
+            if records:
+                self._mirrored_seq[session_id] = records[-1].seq
+
+    def expire(self):
+        self.store.expire(api_server.SESSION_TTL)
+        for session_id in list(self._mirrored_seq):
+            if session_id not in api_server.sessions:
+                del self._mirrored_seq[session_id]
+
+    def run(self):
+        self.fail_interrupted()
+        last_expire = time.monotonic()
+        while True:
+            try:
+                self.handle_controls()
+                self.claim()
+                self.mirror()
+                if time.monotonic() - last_expire >= EXPIRE_INTERVAL:
+                    last_expire = time.monotonic()
+                    self.expire()
+            except Exception as e:
+                print(f"[RUNNER] Error: {e}")
+            time.sleep(POLL_INTERVAL)
+
+
+def serve_metrics():
+    """Serve the runner's Prometheus metrics from a background thread"""
+    metrics_app = Flask('job_runner')
+    metrics_app.add_url_rule('/metrics', 'metrics', lambda: Response(api_server.metrics.render(),
+                                                                     mimetype=api_server.CONTENT_TYPE))
+    server = make_server(METRICS_HOST, METRICS_PORT, metrics_app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='runner-metrics', daemon=True).start()
+    print(f"[RUNNER] Metrics available at http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+
+
+def main():
+    # Interrupted jobs are failed, never resumed, so the runner keeps no journal of their credentials;
+    # job arguments live only in the store until a job is claimed
+    api_server.journal = None
+    runner = JobRunner(store_from_env())
+    print(f"[RUNNER] Warming driver pool ({api_server.driver_pool.size} browsers)...")
+    api_server.driver_pool.start()
+    api_server.governor.start()
+    serve_metrics()
+    runner.run()
+
+
+if __name__ == '__main__':
+    main()
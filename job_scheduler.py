@@ -0,0 +1,114 @@
+"""
+Bounded FIFO job scheduler for purchase jobs
+Caps the number of concurrently running browsers and queues the rest
+"""
+
+import collections
+import os
+import threading
+import time
+
+
+class QueueFullError(Exception):
+    """Raised when the waiting queue is at capacity"""
+
+
+class DuplicateJobError(Exception):
+    """Raised when the username already has a queued or running job"""
+
+
+class Job:
+    """A queued unit of browser work"""
+
+    __slots__ = ('session_id', 'username', 'target', 'args', 'enqueued_at')
+
+    def __init__(self, session_id, username, target, args):
+        self.session_id = session_id
+        self.username = username
+        self.target = target
+        self.args = args
+        self.enqueued_at = time.monotonic()
+
+
+class JobScheduler:
+    """Runs at most max_concurrent jobs at a time from a FIFO queue of at most max_queue jobs.
+
+    Each username may have only one job queued or running, so a single user
+    cannot crowd everyone else out of the browser slots.
+    """
+
+    def __init__(self, max_concurrent=2, max_queue=50):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self._queue = collections.deque()
+        self._running = {}
+        self._usernames = set()
+        self._cond = threading.Condition()
+        self._workers = []
+        for index in range(max_concurrent):
+            worker = threading.Thread(target=self._work, name=f'job-worker-{index}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, session_id, username, target, args):
+        """Queue a job and return its 1-based queue position"""
+        with self._cond:
+            if username in self._usernames:
+                raise DuplicateJobError(f'A job for {username} is already queued or running')
+            if len(self._queue) >= self.max_queue:
+                raise QueueFullError('Job queue is full, try again later')
+            self._queue.append(Job(session_id, username, target, args))
+            self._usernames.add(username)
+            self._cond.notify()
+            return len(self._queue)
+
+    def position(self, session_id):
+        """1-based position of a queued job, or None if it is not waiting"""
+        with self._cond:
+            for index, job in enumerate(self._queue):
+                if job.session_id == session_id:
+                    return index + 1
+        return None
+
+    def cancel(self, session_id):
+        """Drop a job that has not started yet; returns True if it was queued"""
+        with self._cond:
+            for job in self._queue:
+                if job.session_id == session_id:
+                    self._queue.remove(job)
+                    self._usernames.discard(job.username)
+                    return True
+        return False
+
+    def stats(self):
+        with self._cond:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+                'running': len(self._running),
+                'queued': len(self._queue),
+            }
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                job = self._queue.popleft()
+                self._running[job.session_id] = job
+            try:
+                job.target(*job.args)
+            except Exception as e:
+                print(f"[SCHEDULER] Job {job.session_id[:8]}... crashed: {e}")
+            finally:
+                with self._cond:
+                    self._running.pop(job.session_id, None)
+                    self._usernames.discard(job.username)
+
+
+def scheduler_from_env():
+    """Build a scheduler sized by MAX_CONCURRENT_BROWSERS / MAX_QUEUED_JOBS"""
+    return JobScheduler(
+        max_concurrent=max(1, int(os.getenv('MAX_CONCURRENT_BROWSERS', os.getenv('DRIVER_POOL_SIZE', '2')))),
+        max_queue=int(os.getenv('MAX_QUEUED_JOBS', '50')),
+    )
@@ -0,0 +1,353 @@
+"""
+SQLite (WAL) store of purchase jobs, their progress and their logs
+Shared by the API worker processes and the job runner in production mode:
+workers insert jobs and read state, the runner claims jobs and mirrors progress
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import tempfile
+import time
+import uuid
+from cryptography.fernet import Fernet, InvalidToken
+from job_scheduler import DuplicateJobError, QueueFullError
+from log_buffer import LogRecord
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    session_id TEXT PRIMARY KEY,
+    username TEXT NOT NULL,
+    status TEXT NOT NULL,
+    current_iteration INTEGER NOT NULL DEFAULT 0,
+    total_iterations INTEGER NOT NULL DEFAULT 0,
+    timings TEXT NOT NULL DEFAULT '[]',
+    line_items TEXT NOT NULL DEFAULT '[]',
+    resources TEXT,
+    payload BLOB,
+    claimed INTEGER NOT NULL DEFAULT 0,
+    control TEXT,
+    last_seq INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    last_activity REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_username ON jobs (username, status);
+CREATE INDEX IF NOT EXISTS jobs_control ON jobs (control) WHERE control IS NOT NULL;
+CREATE TABLE IF NOT EXISTS logs (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    timestamp REAL NOT NULL,
+    level TEXT NOT NULL,
+    iteration INTEGER NOT NULL,
+    step TEXT,
+    message TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+# Columns added after the first release, created on stores that predate them
+MIGRATIONS = {
+    'line_items': "ALTER TABLE jobs ADD COLUMN line_items TEXT NOT NULL DEFAULT '[]'",
+}
+
+# Statuses during which a username holds its one job slot
+ACTIVE_STATUSES = ('queued', 'processing')
+
+# Touch last_activity at most this often per session, so polling is read-only
+TOUCH_INTERVAL = 30
+
+
+class JobStore:
+    """Jobs table plus per-session log rows in one SQLite database.
+
+    Each thread gets its own connection. Job arguments (credentials and card
+    details) are stored Fernet-encrypted and wiped as soon as the runner claims
+    the job, so they never sit on disk in plaintext or for longer than the queue wait.
+    """
+
+    def __init__(self, path='apex_jobs.db', key=None, log_capacity=1000):
+        self.path = path
+        self.log_capacity = log_capacity
+        self._fernet = Fernet(key or Fernet.generate_key())
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+        self._migrate()
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _migrate(self):
+        with self._write() as conn:
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(jobs)')}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(statement)
+
+    def _write(self):
+        """Connection inside an immediate (write-locked) transaction; use as a context manager"""
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        return _Transaction(conn)
+
+    def create_job(self, username, job_args, max_queue):
+        """Insert a queued job and return (session_id, queue position)"""
+        session_id = str(uuid.uuid4())
+        now = time.time()
+        payload = self._fernet.encrypt(json.dumps(job_args).encode('utf-8'))
+        with self._write() as conn:
+            busy = conn.execute(
+                'SELECT 1 FROM jobs WHERE username = ? AND status IN (?, ?) LIMIT 1', (username,) + ACTIVE_STATUSES
+            ).fetchone()
+            if busy:
+                raise DuplicateJobError(f'A job for {username} is already queued or running')
+            queued = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if queued >= max_queue:
+                raise QueueFullError('Job queue is full, try again later')
+            conn.execute(
+                "INSERT INTO jobs (session_id, username, status, payload, created_at, last_activity) "
+                "VALUES (?, ?, 'queued', ?, ?, ?)",
+                (session_id, username, payload, now, now)
+            )
+        return session_id, queued + 1
+
+    def claim_jobs(self):
+        """Hand every unclaimed queued job to the runner as [(session_id, job_args)], oldest first"""
+        claimed = []
+        with self._write() as conn:
+            rows = conn.execute(
+                "SELECT session_id, payload FROM jobs WHERE status = 'queued' AND claimed = 0 ORDER BY created_at"
+            ).fetchall()
+            for row in rows:
+                try:
+                    claimed.append((row['session_id'], json.loads(self._fernet.decrypt(row['payload']))))
+                except (InvalidToken, TypeError, ValueError):
+                    # Queued under another key (or damaged): fail this job alone so it stops holding a slot
+                    conn.execute("UPDATE jobs SET claimed = 1, payload = NULL, status = 'error', last_activity = ? "
+                                 "WHERE session_id = ?", (time.time(), row['session_id']))
+                    self._insert_log(conn, row['session_id'],
+                                     "❌ Job arguments could not be decrypted (JOB_STORE_KEY changed?); please resubmit",
+                                     'error')
+                    continue
+                conn.execute('UPDATE jobs SET claimed = 1, payload = NULL WHERE session_id = ?', (row['session_id'],))
+        return claimed
+
+    def get(self, session_id, touch=True):
+        """Job row as a dict, or None; optionally refreshes its idle timer"""
+        conn = self._conn()
+        row = conn.execute('SELECT * FROM jobs WHERE session_id = ?', (session_id,)).fetchone()
+        if row is None:
+            return None
+        if touch and time.time() - row['last_activity'] > TOUCH_INTERVAL:
+            conn.execute('UPDATE jobs SET last_activity = ? WHERE session_id = ?', (time.time(), session_id))
+        job = dict(row)
+        job.pop('payload')
+        job['timings'] = json.loads(job['timings'])
+        job['line_items'] = json.loads(job['line_items'])
+        job['resources'] = json.loads(job['resources']) if job['resources'] else None
+        return job
+
+    def queue_position(self, session_id):
+        """1-based position of a queued job, or None if it is not waiting"""
+        row = self._conn().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND created_at <= "
+            "(SELECT created_at FROM jobs WHERE session_id = ? AND status = 'queued')", (session_id,)
+        ).fetchone()
+        return row[0] or None
+
+    def logs_since(self, session_id, seq=0, limit=None):
+        """LogRecords with a sequence number greater than seq, oldest first"""
+        rows = self._conn().execute(
+            'SELECT seq, timestamp, level, iteration, step, message FROM logs '
+            'WHERE session_id = ? AND seq > ? ORDER BY seq LIMIT ?',
+            (session_id, seq, -1 if limit is None else limit)
+        ).fetchall()
+        return [LogRecord(*row) for row in rows]
+
+    def latest_logs(self, session_id, limit):
+        """The newest `limit` LogRecords, oldest first"""
+        rows = self._conn().execute(
+            'SELECT seq, timestamp, level, iteration, step, message FROM logs '
+            'WHERE session_id = ? ORDER BY seq DESC LIMIT ?',
+            (session_id, limit)
+        ).fetchall()
+        return [LogRecord(*row) for row in reversed(rows)]
+
+    def update(self, session_id, status, current_iteration, total_iterations, timings, line_items, resources, records):
+        """Mirror a session's state and new log records from the runner"""
+        with self._write() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO logs (session_id, seq, timestamp, level, iteration, step, message) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(session_id, r.seq, r.timestamp, r.level, r.iteration, r.step, r.message) for r in records]
+            )
+            if records:
+                # Same retention as the in-memory ring buffer
+                conn.execute('DELETE FROM logs WHERE session_id = ? AND seq <= ?',
+                             (session_id, records[-1].seq - self.log_capacity))
+            conn.execute(
+                'UPDATE jobs SET status = ?, current_iteration = ?, total_iterations = ?, timings = ?, line_items = ?, '
+                'resources = ?, last_seq = MAX(last_seq, ?), last_activity = ? WHERE session_id = ?',
+                (status, current_iteration, total_iterations, json.dumps(timings), json.dumps(line_items),
+                 json.dumps(resources) if resources else None,
+                 records[-1].seq if records else 0, time.time(), session_id)
+            )
+
+    def append_log(self, session_id, message, level='info'):
+        """Add a log record for a job the runner holds no in-memory session for"""
+        with self._write() as conn:
+            self._insert_log(conn, session_id, message, level)
+
+    def _insert_log(self, conn, session_id, message, level):
+        """Append a log row inside the caller's write transaction"""
+        row = conn.execute('SELECT last_seq, current_iteration FROM jobs WHERE session_id = ?',
+                           (session_id,)).fetchone()
+        if row is None:
+            return
+        seq = row['last_seq'] + 1
+        conn.execute('INSERT INTO logs (session_id, seq, timestamp, level, iteration, step, message) '
+                     'VALUES (?, ?, ?, ?, ?, NULL, ?)',
+                     (session_id, seq, time.time(), level, row['current_iteration'], message))
+        conn.execute('UPDATE jobs SET last_seq = ? WHERE session_id = ?', (seq, session_id))
+
+    def set_status(self, session_id, status, **fields):
+        """Overwrite a job's status (and optionally iteration/timings/line items) without the runner's session"""
+        assignments = ['status = ?', 'last_activity = ?']
+        values = [status, time.time()]
+        for name in ('current_iteration', 'total_iterations'):
+            if name in fields:
+                assignments.append(f'{name} = ?')
+                values.append(fields[name])
+        for name in ('timings', 'line_items'):
+            if name in fields:
+                assignments.append(f'{name} = ?')
+                values.append(json.dumps(fields[name]))
+        with self._write() as conn:
+            conn.execute(f"UPDATE jobs SET {', '.join(assignments)} WHERE session_id = ?", values + [session_id])
+
+    def clear_logs(self, session_id):
+        """Drop a job's log rows; last_seq keeps counting so client cursors stay valid"""
+        with self._write() as conn:
+            conn.execute('DELETE FROM logs WHERE session_id = ?', (session_id,))
+
+    def request_control(self, session_id, command):
+        """Ask the runner to 'stop' or 'reset' a job; returns False if the job doesn't exist"""
+        with self._write() as conn:
+            cursor = conn.execute('UPDATE jobs SET control = ?, last_activity = ? WHERE session_id = ?',
+                                  (command, time.time(), session_id))
+        return cursor.rowcount > 0
+
+    def take_controls(self):
+        """Pending control requests as [(session_id, command)], cleared as they are taken"""
+        with self._write() as conn:
+            rows = conn.execute('SELECT session_id, control FROM jobs WHERE control IS NOT NULL').fetchall()
+            conn.executemany('UPDATE jobs SET control = NULL WHERE session_id = ?',
+                             [(row['session_id'],) for row in rows])
+        return [(row['session_id'], row['control']) for row in rows]
+
+    def cancel_unclaimed(self, session_id):
+        """Take a queued job out of the queue before the runner claims it; returns True if it was waiting"""
+        with self._write() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET claimed = 1, payload = NULL WHERE session_id = ? AND claimed = 0", (session_id,)
+            )
+        return cursor.rowcount > 0
+
+    def expire(self, ttl):
+        """Delete finished jobs idle for longer than ttl seconds; returns their session IDs"""
+        cutoff = time.time() - ttl
+        with self._write() as conn:
+            rows = conn.execute(
+                'SELECT session_id FROM jobs WHERE last_activity < ? AND status NOT IN (?, ?)',
+                (cutoff,) + ACTIVE_STATUSES
+            ).fetchall()
+            expired = [(row['session_id'],) for row in rows]
+            conn.executemany('DELETE FROM logs WHERE session_id = ?', expired)
+            conn.executemany('DELETE FROM jobs WHERE session_id = ?', expired)
+        return [session_id for session_id, in expired]
+
+    def interrupted_jobs(self):
+        """Session IDs of jobs claimed by a runner that never finished them"""
+        rows = self._conn().execute(
+            'SELECT session_id FROM jobs WHERE claimed = 1 AND status IN (?, ?)', ACTIVE_STATUSES
+        ).fetchall()
+        return [row['session_id'] for row in rows]
+
+    def jobs(self):
+        """Summary rows of every job, newest first"""
+        rows = self._conn().execute(
+            'SELECT session_id, status, created_at, last_activity, current_iteration, total_iterations '
+            'FROM jobs ORDER BY created_at DESC'
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def stats(self):
+        rows = self._conn().execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return {status: count for status, count in rows}
+
+
+class _Transaction:
+    """Commits on success and rolls back on error"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+def load_key(key_file):
+    """Fernet key from key_file, created (readable by the owner only) on first use.
+
+    A new key is written to a temporary file and linked into place, so a process
+    starting at the same moment sees either no key file or a complete one.
+    """
+    try:
+        with open(key_file, 'rb') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        pass
+    # mkstemp creates the file with mode 0600
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(key_file)), prefix='.key-')
+    try:
+        key = Fernet.generate_key()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(key)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.link(temp_path, key_file)
+        except FileExistsError:
+            # Another process won the race; use its key
+            with open(key_file, 'rb') as f:
+                return f.read().strip()
+        return key
+    finally:
+        os.remove(temp_path)
+
+
+def store_from_env():
+    """Open the store at JOB_STORE_PATH, encrypting job arguments with JOB_STORE_KEY.
+
+    Without JOB_STORE_KEY the key is kept in JOB_STORE_KEY_FILE (default: <path>.key),
+    so jobs queued before a restart can still be decrypted after it.
+    """
+    path = os.getenv('JOB_STORE_PATH', 'apex_jobs.db')
+    key = os.getenv('JOB_STORE_KEY')
+    return JobStore(
+        path=path,
+        key=key.encode('utf-8') if key else load_key(os.getenv('JOB_STORE_KEY_FILE', path + '.key')),
+        log_capacity=int(os.getenv('LOG_BUFFER_CAPACITY', '1000')),
+    )
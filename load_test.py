@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+"""
+API load test with a fake automation backend
+Serves the real API app (Flask or ASGI) in a child process whose browser work
+is replaced by a latency-only fake, so no Chrome is launched, then drives it
+with concurrent job clients (start, poll, stop, reset) and dashboard pollers.
+Reports request latency percentiles and error rates per endpoint plus the
+server's CPU and memory.
+
+    python load_test.py --jobs 20 --pollers 200 --duration 60
+
+Backends are pluggable: --backend module:callable names a factory called with
+the backend options that returns an object with an install(api_server) method
+(see FakeBackend).
+"""
+
+import argparse
+import importlib
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import psutil
+import requests
+
+from benchmark import percentile
+from checkout_steps import StepTimeoutError
+
+# Seconds each checkout step takes in the fake backend, before --step-scale and jitter
+DEFAULT_STEP_SECONDS = {
+    'navigate': 0.8,
+    'coupon': 0.1,
+    'agree': 0.05,
+    'next': 0.5,
+    'card_number': 0.1,
+    'expiry_month': 0.05,
+    'expiry_year': 0.05,
+    'cvv': 0.1,
+    'fill_signup': 0.6,
+    'fill_card': 0.3,
+    'pay': 1.5,
+}
+FALLBACK_STEP_SECONDS = 0.1
+
+FINAL_STATUSES = ('completed', 'error', 'stopped')
+
+
+class FakeDriver:
+    """Just enough of a WebDriver for the pool, the governor and the session cache"""
+
+    def __init__(self, command_seconds=0.0):
+        self.command_seconds = command_seconds
+        self.window_handles = ['tab-0']
+        self.current_window_handle = 'tab-0'
+        self.switch_to = self
+        self.quit_called = False
+
+    def _command(self):
+        if self.command_seconds:
+            time.sleep(self.command_seconds)
+
+    def window(self, handle):
+        self._command()
+        self.current_window_handle = handle
+
+    def close(self):
+        self._command()
+
+    def get(self, url):
+        self._command()
+
+    def execute_script(self, script, *args):
+        self._command()
+        return 1 if script.strip() == 'return 1' else None
+
+    def execute_cdp_cmd(self, command, params):
+        self._command()
+        return {}
+
+    def find_elements(self, by, value):
+        self._command()
+        return []
+
+    def get_cookies(self):
+        self._command()
+        return [{'name': 'PHPSESSID', 'value': 'fake', 'path': '/'}]
+
+    def quit(self):
+        self.quit_called = True
+
+
+class FakeBackend:
+    """Latency-only stand-in for the browser side of api_server.
+
+    install() swaps the driver pool factory, login, cached-session restore and
+    the checkout step runner; everything between the HTTP layer and those seams
+    (scheduler, sessions, logs, metrics, streams) is the real code.
+    """
+
+    def __init__(self, step_scale=1.0, jitter=0.25, launch_seconds=0.5, login_seconds=1.0, command_seconds=0.0,
+                 decline_rate=0.0, error_rate=0.0, seed=None):
+        self.step_scale = step_scale
+        self.jitter = jitter
+        self.launch_seconds = launch_seconds
+        self.login_seconds = login_seconds
+        self.command_seconds = command_seconds
+        self.decline_rate = decline_rate
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.api = None
+
+    def _pause(self, seconds):
+        time.sleep(max(0.0, seconds * (1 + self.random.uniform(-self.jitter, self.jitter))))
+
+    def create_driver(self):
+        self._pause(self.launch_seconds)
+        return FakeDriver(self.command_seconds)
+
+    def restore_session(self, driver, session_id, username, password, url):
+        return False
+
+    def login(self, driver, session_id, username, password):
+        self.api.add_log(session_id, "Logging in (fake backend)...")
+        self._pause(self.login_seconds)
+        self.api.add_log(session_id, "✅ Login successful!")
+        return True
+
+    def run_steps(self, driver, steps, ctx, log=None, retries=0):
+        timings = []
+        failing_step = self.random.randrange(len(steps)) if self.random.random() < self.error_rate else None
+        for index, step in enumerate(steps):
+            started = time.perf_counter()
+            self._pause(DEFAULT_STEP_SECONDS.get(step.name, FALLBACK_STEP_SECONDS) * self.step_scale)
+            if index == failing_step:
+                raise StepTimeoutError(step.name, step.timeout)
+            elapsed = time.perf_counter() - started
+            timings.append((step.name, elapsed))
+            if log:
+                log(f"Step '{step.name}' done in {elapsed:.2f}s", step=step.name)
+            if step.name == 'pay':
+                declined = self.random.random() < self.decline_rate
+                ctx['outcome'] = {
+                    'outcome': 'declined' if declined else 'confirmed',
+                    'message': 'Card declined (fake backend)' if declined else None,
+                    'url': ctx['url'],
+                    'time_to_outcome_ms': round(elapsed * 1000, 1),
+                }
+        return timings
+
+    def install(self, api_server):
+        from driver_pool import DriverPool
+        self.api = api_server
+        api_server.driver_pool = DriverPool(size=api_server.driver_pool.size, factory=self.create_driver)
+        api_server.login = self.login
+        api_server.restore_session = self.restore_session
+        api_server.run_steps = self.run_steps
+
+
+def load_backend(spec, options):
+    """Backend instance from 'module:callable', called with the backend options"""
+    module_name, _, attribute = spec.partition(':')
+    return getattr(importlib.import_module(module_name), attribute)(**options)
+
+
+def serve(args):
+    """Child process: install the backend into api_server and serve the chosen app"""
+    import api_server
+    load_backend(args.backend, json.loads(args.backend_options)).install(api_server)
+    api_server.driver_pool.start()
+    if args.server == 'asgi':
+        import uvicorn
+        import asgi_server
+        uvicorn.run(asgi_server.app, host='127.0.0.1', port=args.port, log_level='warning')
+    else:
+        from werkzeug.serving import make_server
+        from log_pipeline import route_logger
+        route_logger('werkzeug', api_server.log_pipeline)
+        make_server('127.0.0.1', args.port, api_server.app, threaded=True).serve_forever()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Recorder:
+    """Latency and status code tallies per endpoint, shared by all client threads"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.codes = {}
+        self._lock = threading.Lock()
+
+    def request(self, http, endpoint, method, url, **kwargs):
+        """Send one request and record it; returns the response, or None on a transport error"""
+        started = time.perf_counter()
+        try:
+            response = http.request(method, url, timeout=30, **kwargs)
+            code = str(response.status_code)
+        except requests.RequestException as e:
+            response = None
+            code = type(e).__name__
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(elapsed)
+            codes = self.codes.setdefault(endpoint, {})
+            codes[code] = codes.get(code, 0) + 1
+        return response
+
+    def summary(self):
+        endpoints = {}
+        with self._lock:
+            for endpoint, values in self.latencies.items():
+                codes = self.codes[endpoint]
+                errors = sum(count for code, count in codes.items() if not code.startswith('2'))
+                endpoints[endpoint] = {
+                    'requests': len(values),
+                    'p50_ms': round(percentile(values, 50) * 1000, 1),
+                    'p95_ms': round(percentile(values, 95) * 1000, 1),
+                    'p99_ms': round(percentile(values, 99) * 1000, 1),
+                    'max_ms': round(max(values) * 1000, 1),
+                    'error_rate': round(errors / len(values), 4),
+                    'codes': dict(codes),
+                }
+        return endpoints
+
+
+class ProcessSampler(threading.Thread):
+    """Samples CPU and memory of the server process tree"""
+
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.cpu = []
+        self.rss = []
+        self.threads = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        self.process.cpu_percent(None)
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.cpu.append(self.process.cpu_percent(None))
+                self.rss.append(self.process.memory_info().rss)
+                self.threads.append(self.process.num_threads())
+            except psutil.Error:
+                return
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def summary(self):
+        return {
+            'cpu_percent_avg': round(sum(self.cpu) / len(self.cpu), 1) if self.cpu else 0.0,
+            'cpu_percent_p95': round(percentile(self.cpu, 95), 1),
+            'rss_mb_peak': round(max(self.rss, default=0) / (1024 * 1024), 1),
+            'rss_mb_end': round(self.rss[-1] / (1024 * 1024), 1) if self.rss else 0.0,
+            'threads_peak': max(self.threads, default=0),
+        }
+
+
+def purchase_body(index, accounts):
+    return {
+        'username': f'load{index}@example.com',
+        'password': 'load-test',
+        'cardNumber': '4242424242424242',
+        'cvv': '123',
+        'expiryMonth': '12',
+        'expiryYear': '2030',
+        'numberOfAccounts': accounts,
+        'selectedAccount': '50k-Tradovate',
+    }
+
+
+def job_client(index, base_url, args, recorder, session_ids, deadline):
+    """Start a job, poll it to completion (stopping some early), then reset it"""
+    http = requests.Session()
+    response = recorder.request(http, 'start', 'POST', f'{base_url}/api/purchase', json=purchase_body(index, args.accounts))
+    if response is None or response.status_code != 200:
+        return
+    session_id = response.json()['session_id']
+    session_ids.append(session_id)
+    stop_at = time.monotonic() + args.stop_after if random.random() < args.stop_fraction else None
+    since = 0
+    while time.monotonic() < deadline:
+        time.sleep(args.poll_interval)
+        response = recorder.request(http, 'status', 'GET', f'{base_url}/api/status/{session_id}', params={'since': since})
+        if response is None or response.status_code != 200:
+            continue
+        payload = response.json()
+        since = payload['next_since']
+        if payload['status'] in FINAL_STATUSES:
+            break
+        if stop_at is not None and time.monotonic() >= stop_at:
+            recorder.request(http, 'stop', 'POST', f'{base_url}/api/stop/{session_id}')
+            stop_at = None
+    recorder.request(http, 'reset', 'POST', f'{base_url}/api/reset/{session_id}')
+
+
+def poller_client(base_url, args, recorder, session_ids, done):
+    """A dashboard polling the status of a random job until the run ends"""
+    http = requests.Session()
+    cursors = {}
+    time.sleep(random.uniform(0, args.poll_interval))
+    while not done.is_set():
+        if session_ids:
+            session_id = random.choice(session_ids)
+            response = recorder.request(http, 'status', 'GET', f'{base_url}/api/status/{session_id}',
+                                        params={'since': cursors.get(session_id, 0)})
+            if response is not None and response.status_code == 200:
+                cursors[session_id] = response.json()['next_since']
+        done.wait(args.poll_interval)
+
+
+def wait_until_serving(base_url, server, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'Server exited with code {server.returncode}')
+        try:
+            requests.get(f'{base_url}/api/sessions', timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError('Server did not start in time')
+
+
+def run_load_test(args):
+    port = free_port()
+    base_url = f'http://127.0.0.1:{port}'
+    env = dict(os.environ,
+               MAX_CONCURRENT_BROWSERS=str(args.max_concurrent or args.jobs),
+               DRIVER_POOL_SIZE=str(args.pool_size if args.pool_size is not None else args.max_concurrent or args.jobs),
+               MAX_QUEUED_JOBS=str(max(args.jobs, 50)),
+               # Fake jobs must not land in the real journal (and be offered for resuming) or log file
+               JOB_JOURNAL_PATH='',
+               LOG_FILE='')
+    command = [sys.executable, os.path.abspath(__file__), '--serve', '--port', str(port), '--server', args.server,
+               '--backend', args.backend, '--backend-options', json.dumps(backend_options(args))]
+    with open(args.server_log, 'w') as server_log:
+        server = subprocess.Popen(command, env=env, stdout=server_log, stderr=subprocess.STDOUT)
+    try:
+        wait_until_serving(base_url, server)
+        sampler = ProcessSampler(server.pid)
+        sampler.start()
+        recorder = Recorder()
+        session_ids = []
+        done = threading.Event()
+        started = time.perf_counter()
+        deadline = time.monotonic() + args.duration
+        pollers = [threading.Thread(target=poller_client, args=(base_url, args, recorder, session_ids, done), daemon=True)
+                   for _ in range(args.pollers)]
+        jobs = [threading.Thread(target=job_client, args=(index, base_url, args, recorder, session_ids, deadline), daemon=True)
+                for index in range(args.jobs)]
+        for thread in pollers + jobs:
+            thread.start()
+        for thread in jobs:
+            thread.join()
+        done.set()
+        for thread in pollers:
+            thread.join()
+        wall_seconds = time.perf_counter() - started
+        sampler.stop()
+        metrics_text = requests.get(f'{base_url}/metrics', timeout=5).text
+    finally:
+        server.terminate()
+        server.wait()
+
+    endpoints = recorder.summary()
+    total = sum(endpoint['requests'] for endpoint in endpoints.values())
+    return {
+        'server': args.server,
+        'jobs': args.jobs,
+        'pollers': args.pollers,
+        'wall_seconds': round(wall_seconds, 2),
+        'requests': total,
+        'requests_per_second': round(total / wall_seconds, 1) if wall_seconds else 0.0,
+        'endpoints': endpoints,
+        'server_process': sampler.summary(),
+        'iterations': {line.split('"')[1]: float(line.rsplit(' ', 1)[1])
+                       for line in metrics_text.splitlines() if line.startswith('apex_iterations_total{')},
+    }
+
+
+def backend_options(args):
+    return {
+        'step_scale': args.step_scale,
+        'launch_seconds': args.launch_seconds,
+        'login_seconds': args.login_seconds,
+        'decline_rate': args.decline_rate,
+        'error_rate': args.error_rate,
+    }
+
+
+def print_report(result):
+    print(f"{result['server']} server, {result['jobs']} jobs, {result['pollers']} pollers: "
+          f"{result['requests']} requests in {result['wall_seconds']}s ({result['requests_per_second']} req/s)")
+    print(f"{'endpoint':<10}{'requests':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>9}  codes")
+    for name, endpoint in sorted(result['endpoints'].items()):
+        print(f"{name:<10}{endpoint['requests']:>10}{endpoint['p50_ms']:>10}{endpoint['p95_ms']:>10}"
+              f"{endpoint['p99_ms']:>10}{endpoint['max_ms']:>10}{endpoint['error_rate'] * 100:>8.2f}%  {endpoint['codes']}")
+    process = result['server_process']
+    print(f"Server CPU: avg {process['cpu_percent_avg']}%, p95 {process['cpu_percent_p95']}% | "
+          f"RSS peak {process['rss_mb_peak']} MB, end {process['rss_mb_end']} MB | threads peak {process['threads_peak']}")
+    print(f"Iterations: {result['iterations']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the purchase API against a fake automation backend')
+    parser.add_argument('--server', choices=('flask', 'asgi'), default='flask', help='which API app to serve')
+    parser.add_argument('--jobs', type=int, default=20, help='concurrent purchase jobs')
+    parser.add_argument('--accounts', type=int, default=3, help='purchases per job')
+    parser.add_argument('--pollers', type=int, default=200, help='dashboards polling /api/status')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='seconds between polls of each client')
+    parser.add_argument('--stop-fraction', type=float, default=0.1, help='share of jobs stopped early')
+    parser.add_argument('--stop-after', type=float, default=3.0, help='seconds after start that those jobs are stopped')
+    parser.add_argument('--duration', type=float, default=300, help='upper bound on the run, in seconds')
+    parser.add_argument('--max-concurrent', type=int, default=None, help='MAX_CONCURRENT_BROWSERS (default: --jobs)')
+    parser.add_argument('--pool-size', type=int, default=None, help='DRIVER_POOL_SIZE (default: --max-concurrent)')
+    parser.add_argument('--backend', default='load_test:FakeBackend', help='module:callable building the backend')
+    parser.add_argument('--step-scale', type=float, default=1.0, help='multiplier on the fake step latencies')
+    parser.add_argument('--launch-seconds', type=float, default=0.5, help='fake browser launch time')
+    parser.add_argument('--login-seconds', type=float, default=1.0, help='fake login time')
+    parser.add_argument('--decline-rate', type=float, default=0.0, help='share of fake payments declined')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of fake checkouts failing at a random step')
+    parser.add_argument('--server-log', default=os.devnull, help='file for the server process output')
+    parser.add_argument('--json', action='store_true', help='print the result as JSON')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=0, help=argparse.SUPPRESS)
+    parser.add_argument('--backend-options', default='{}', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    result = run_load_test(args)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+
+if __name__ == '__main__':
+    main()
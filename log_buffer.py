@@ -0,0 +1,81 @@
+"""
+Fixed-capacity ring buffer of structured session log records
+"""
+
+import collections
+import threading
+import time
+from datetime import datetime
+
+
+class LogRecord:
+    """One log entry; seq increases monotonically for the lifetime of the buffer"""
+
+    __slots__ = ('seq', 'timestamp', 'level', 'iteration', 'step', 'message')
+
+    def __init__(self, seq, timestamp, level, iteration, step, message):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.level = level
+        self.iteration = iteration
+        self.step = step
+        self.message = message
+
+    def format(self):
+        """Render as the '[HH:MM:SS] message' line the frontend displays"""
+        return f"[{datetime.fromtimestamp(self.timestamp).strftime('%H:%M:%S')}] {self.message}"
+
+    def to_dict(self):
+        return {
+            'seq': self.seq,
+            'timestamp': self.timestamp,
+            'level': self.level,
+            'iteration': self.iteration,
+            'step': self.step,
+            'message': self.message,
+        }
+
+
+class LogBuffer:
+    """Keeps the newest `capacity` records; older ones are dropped as new ones arrive"""
+
+    def __init__(self, capacity=1000):
+        self._records = collections.deque(maxlen=capacity)
+        self._last_seq = 0
+        self._lock = threading.Lock()
+
+    def append(self, message, level='info', iteration=0, step=None):
+        """Store a record and return it"""
+        with self._lock:
+            self._last_seq += 1
+            record = LogRecord(self._last_seq, time.time(), level, iteration, step, message)
+            self._records.append(record)
+        return record
+
+    def since(self, seq=0, limit=None):
+        """Records with a sequence number greater than seq, oldest first"""
+        with self._lock:
+            if not self._records or seq >= self._last_seq:
+                return []
+            # Sequence numbers are contiguous, so the start offset is direct arithmetic
+            start = max(0, seq - self._records[0].seq + 1)
+            stop = len(self._records) if limit is None else min(len(self._records), start + limit)
+            return [self._records[index] for index in range(start, stop)]
+
+    def latest(self, limit):
+        """The newest `limit` records, oldest first"""
+        with self._lock:
+            start = max(0, len(self._records) - limit)
+            return [self._records[index] for index in range(start, len(self._records))]
+
+    @property
+    def last_seq(self):
+        return self._last_seq
+
+    def clear(self):
+        """Drop all records; sequence numbers keep counting so cursors stay valid"""
+        with self._lock:
+            self._records.clear()
+
+    def __len__(self):
+        return len(self._records)
@@ -0,0 +1,172 @@
+"""
+Non-blocking log output
+Callers enqueue structured records; a background writer batches them to the
+console and to a size-rotated JSON-lines file, so a slow terminal or a piped
+journal never stalls request or automation threads.
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from datetime import datetime
+
+LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+
+
+class RotatingJsonlSink:
+    """Appends JSON lines to path, rolling it over to path.1 ... path.<backups> past max_bytes"""
+
+    def __init__(self, path, max_bytes=10 * 1024 * 1024, backups=5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        self._size = self._file.tell()
+
+    def _rotate(self):
+        self._file.close()
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f'{self.path}.{index}'):
+                os.replace(f'{self.path}.{index}', f'{self.path}.{index + 1}')
+        if self.backups > 0:
+            os.replace(self.path, f'{self.path}.1')
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._size = 0
+
+    def write(self, lines):
+        data = ''.join(line + '\n' for line in lines)
+        if self._size and self._size + len(data) > self.max_bytes:
+            self._rotate()
+        self._file.write(data)
+        self._file.flush()
+        self._size += len(data)
+
+
+class LogPipeline:
+    """Queue in front of the console and file sinks, drained by one writer thread.
+
+    emit() is a level check and a queue put; records below `level` are dropped
+    before they are formatted or queued.
+    """
+
+    def __init__(self, level='info', console=True, file_sink=None, batch_size=500):
+        self.level = LEVELS.get(level, LEVELS['info'])
+        self.console = console
+        self.file_sink = file_sink
+        self.batch_size = batch_size
+        self.written = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+
+    def enabled(self, level):
+        return LEVELS.get(level, LEVELS['info']) >= self.level
+
+    def emit(self, message, level='info', session_id=None, iteration=None, step=None, timestamp=None):
+        """Queue one record for the sinks; returns immediately"""
+        if LEVELS.get(level, LEVELS['info']) < self.level:
+            return
+        self._queue.put((datetime.now().timestamp() if timestamp is None else timestamp,
+                         level, session_id, iteration, step, message))
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def start(self):
+        """Start the writer thread (once); pending records are flushed at interpreter exit"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+        return self
+
+    def flush(self, timeout=5):
+        """Wait until everything queued so far has been written; False on timeout"""
+        if self._thread is None or not self._thread.is_alive():
+            return False
+        written = threading.Event()
+        self._queue.put(written)
+        return written.wait(timeout)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [item for item in batch if not isinstance(item, threading.Event)]
+            try:
+                self._write(records)
+            except Exception as e:
+                sys.stderr.write(f"[LOG] Dropped {len(records)} records: {e}\n")
+            self.written += len(records)
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _write(self, records):
+        if not records:
+            return
+        if self.console:
+            sys.stdout.write(''.join(format_console(record) + '\n' for record in records))
+            sys.stdout.flush()
+        if self.file_sink is not None:
+            self.file_sink.write([json.dumps({
+                'timestamp': timestamp, 'level': level, 'session': session_id,
+                'iteration': iteration, 'step': step, 'message': message,
+            }, ensure_ascii=False) for timestamp, level, session_id, iteration, step, message in records])
+
+
+class PipelineHandler(logging.Handler):
+    """logging handler that hands records to a LogPipeline instead of writing them itself"""
+
+    def __init__(self, pipeline):
+        super().__init__()
+        self.pipeline = pipeline
+
+    def emit(self, record):
+        try:
+            self.pipeline.emit(self.format(record), record.levelname.lower(), timestamp=record.created)
+        except Exception:
+            self.handleError(record)
+
+
+def route_logger(name, pipeline):
+    """Send a library logger (e.g. werkzeug's access log) through the pipeline only"""
+    logger = logging.getLogger(name)
+    logger.handlers[:] = [PipelineHandler(pipeline)]
+    logger.propagate = False
+    # LEVELS match the logging module's numbers
+    logger.setLevel(pipeline.level)
+    return logger
+
+
+def format_console(record):
+    """The console line of a record: session records keep the '[Session abcd1234...] [HH:MM:SS] ...' form"""
+    timestamp, level, session_id, iteration, step, message = record
+    if session_id is None:
+        return message
+    return f"[Session {session_id[:8]}...] [{datetime.fromtimestamp(timestamp).strftime('%H:%M:%S')}] {message}"
+
+
+def pipeline_from_env():
+    """Build a pipeline configured by LOG_LEVEL / LOG_CONSOLE / LOG_FILE / LOG_FILE_MAX_BYTES / LOG_FILE_BACKUPS"""
+    path = os.getenv('LOG_FILE', 'apex_logs.jsonl')
+    file_sink = RotatingJsonlSink(
+        path,
+        max_bytes=int(os.getenv('LOG_FILE_MAX_BYTES', str(10 * 1024 * 1024))),
+        backups=int(os.getenv('LOG_FILE_BACKUPS', '5')),
+    ) if path else None
+    return LogPipeline(
+        level=os.getenv('LOG_LEVEL', 'info').lower(),
+        console=os.getenv('LOG_CONSOLE', '1').lower() in ('1', 'true', 'yes'),
+        file_sink=file_sink,
+    )
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Apex aMember dashboard
+Serves the login, cookie consent, signup and payment pages with the same
+element IDs the bot drives, so the automation can be tuned without network access
+"""
+
+import argparse
+import os
+import random
+import threading
+import time
+import uuid
+from flask import Flask, request, redirect, make_response, render_template_string
+from werkzeug.serving import make_server
+
+app = Flask(__name__)
+
+# Artificial latency applied to every response, in seconds
+app.config['LATENCY'] = float(os.getenv('MOCK_LATENCY', '0'))
+app.config['JITTER'] = float(os.getenv('MOCK_JITTER', '0'))
+# Extra time the payment "processor" takes after the pay click
+app.config['PAY_LATENCY'] = float(os.getenv('MOCK_PAY_LATENCY', '0'))
+# Delay before the consent dialog is injected, in milliseconds
+app.config['CONSENT_DELAY_MS'] = int(os.getenv('MOCK_CONSENT_DELAY_MS', '300'))
+# Size of the decorative assets (banner image, web font, analytics script) each page pulls in
+app.config['ASSET_KB'] = int(os.getenv('MOCK_ASSET_KB', '200'))
+
+# Card numbers the mock processor declines
+DECLINED_CARDS = {'4000000000000002'}
+
+# Logged-in session cookies and open invoices
+logins = {}
+invoices = {}
+state_lock = threading.Lock()
+
+BASE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<title>{{ title }} - Apex Trader Funding (mock)</title>
+<style>@font-face { font-family: 'Brand'; src: url('/assets/brand.woff2'); } body { font-family: 'Brand', sans-serif; }</style>
+<script src="/assets/analytics.js"></script>
+</head>
+<body>
+<img src="/assets/banner.png" alt="">
+<div class="cf_modal_container"></div>
+{% if error %}<div class="error am-error">{{ error }}</div>{% endif %}
+{{ body|safe }}
+<script>
+(function() {
+    if (document.cookie.indexOf('cf_consent=') !== -1) return;
+    setTimeout(function() {
+        var host = document.querySelector('div.cf_modal_container');
+        var root = host.attachShadow({mode: 'open'});
+        root.innerHTML =
+            '<dialog class="cf_modal">' +
+            '<p>We use cookies to improve your experience.</p>' +
+            '<div class="cf_consent-buttons">' +
+            '<button id="cf_consent-buttons__accept-all" class="cf_button cf_button--accept">Accept All</button>' +
+            '<button id="cf_consent-buttons__reject-all" class="cf_button cf_button--reject">Reject All</button>' +
+            '</div></dialog>';
+        var dialog = root.querySelector('dialog.cf_modal');
+        function choose(value) {
+            document.cookie = 'cf_consent=' + value + '; path=/';
+            dialog.close();
+            host.remove();
+        }
+        root.querySelector('#cf_consent-buttons__accept-all').onclick = function() { choose('accepted'); };
+        root.querySelector('#cf_consent-buttons__reject-all').onclick = function() { choose('rejected'); };
+        dialog.showModal();
+    }, {{ consent_delay }});
+})();
+</script>
+</body>
+</html>
+"""
+
+LOGIN_BODY = """
+<form method="post" action="/member/">
+    <input type="text" id="amember-login" name="amember_login">
+    <input type="password" id="amember-pass" name="amember_pass">
+    <input type="submit" value="Login">
+</form>
+"""
+
+DASHBOARD_BODY = """
+<h1>Member Dashboard</h1>
+<p>Welcome back, {{ username }}.</p>
+<a href="/logout">Logout</a>
+"""
+
+SIGNUP_BODY = """
+<h1>Sign up: {{ product }}</h1>
+<form method="post" action="/signup/{{ product }}">
+    <input type="text" id="coupon-0" name="coupon">
+    <input type="checkbox" id="_i_agree-page-0-0-0" name="_i_agree" value="1">
+    <label for="_i_agree-page-0-0-0">I agree to the terms</label>
+    <input type="submit" id="_qf_page-0_next-0" value="Next">
+</form>
+"""
+
+PAY_BODY = """
+<h1>Payment for invoice {{ invoice_id }}</h1>
+<form method="post" action="/pay/{{ invoice_id }}">
+    <input type="text" id="cc_number" name="cc_number" value="{{ cc_number }}">
+    <select id="m-0" name="m">
+        {% for month in months %}<option value="{{ month }}">{{ month }}</option>{% endfor %}
+    </select>
+    <select id="y-0" name="y">
+        {% for year in years %}<option value="{{ year }}">{{ year }}</option>{% endfor %}
+    </select>
+    <input type="text" id="cc_code" name="cc_code">
+    <input type="submit" id="qfauto-0" value="Pay">
+</form>
+"""
+
+THANKS_BODY = """
+<h1 id="thank-you">Thank you for your order!</h1>
+<p>Invoice {{ invoice_id }} has been paid.</p>
+"""
+
+MONTHS = [f'{month:02d}' for month in range(1, 13)]
+YEARS = [str(year) for year in range(2024, 2041)]
+
+
+def render_page(title, body, status=200, error=None, **context):
+    """Render a page inside the shared layout with the consent dialog"""
+    html = render_template_string(
+        BASE_TEMPLATE,
+        title=title,
+        error=error,
+        body=render_template_string(body, **context),
+        consent_delay=app.config['CONSENT_DELAY_MS'],
+    )
+    return make_response(html, status)
+
+
+def current_user():
+    """Return the username bound to the request's session cookie"""
+    with state_lock:
+        return logins.get(request.cookies.get('PHPSESSID'))
+
+
+@app.before_request
+def simulate_latency():
+    """Delay every response by the configured latency"""
+    delay = app.config['LATENCY'] + random.uniform(0, app.config['JITTER'])
+    if delay > 0:
+        time.sleep(delay)
+
+
+ASSET_TYPES = {
+    '.png': 'image/png',
+    '.woff2': 'font/woff2',
+    '.js': 'application/javascript',
+}
+
+
+@app.route('/assets/<name>')
+def asset(name):
+    """Page weight the checkout does not need, served with the same artificial latency"""
+    extension = os.path.splitext(name)[1]
+    if extension not in ASSET_TYPES:
+        return make_response('', 404)
+    if extension == '.js':
+        body = b'/*' + b' ' * (app.config['ASSET_KB'] * 1024) + b'*/'
+    else:
+        body = b'\0' * (app.config['ASSET_KB'] * 1024)
+    response = make_response(body)
+    response.headers['Content-Type'] = ASSET_TYPES[extension]
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+
+@app.route('/')
+def index():
+    return redirect('/member/')
+
+
+@app.route('/member/', methods=['GET', 'POST'])
+def member():
+    """Login form, or the dashboard once logged in"""
+    if request.method == 'POST':
+        username = request.form.get('amember_login', '')
+        password = request.form.get('amember_pass', '')
+        if not username or not password or password == 'wrong':
+            return render_page('Login', LOGIN_BODY, error='Invalid username or password')
+        token = uuid.uuid4().hex
+        with state_lock:
+            logins[token] = username
+        response = redirect('/member/')
+        response.set_cookie('PHPSESSID', token)
+        return response
+
+    username = current_user()
+    if not username:
+        return render_page('Login', LOGIN_BODY)
+    return render_page('Dashboard', DASHBOARD_BODY, username=username)
+
+
+@app.route('/logout')
+def logout():
+    with state_lock:
+        logins.pop(request.cookies.get('PHPSESSID'), None)
+    response = redirect('/member/')
+    response.delete_cookie('PHPSESSID')
+    return response
+
+
+@app.route('/signup/<product>', methods=['GET', 'POST'])
+def signup(product):
+    """First checkout page: coupon, terms and next"""
+    if not current_user():
+        return redirect('/member/')
+    if request.method == 'POST':
+        if request.form.get('_i_agree') != '1':
+            return render_page('Signup', SIGNUP_BODY, error='You must agree to the terms', product=product)
+        invoice_id = uuid.uuid4().hex[:10]
+        with state_lock:
+            invoices[invoice_id] = {'product': product, 'coupon': request.form.get('coupon', ''), 'paid': False}
+        return redirect(f'/pay/{invoice_id}')
+    return render_page('Signup', SIGNUP_BODY, product=product)
+
+
+@app.route('/pay/<invoice_id>', methods=['GET', 'POST'])
+def pay(invoice_id):
+    """Second checkout page: card details and the pay button"""
+    if not current_user():
+        return redirect('/member/')
+    with state_lock:
+        invoice = invoices.get(invoice_id)
+    if not invoice:
+        return render_page('Not found', '<p>Unknown invoice</p>', status=404)
+
+    context = {'invoice_id': invoice_id, 'months': MONTHS, 'years': YEARS, 'cc_number': ''}
+    if request.method == 'POST':
+        cc_number = request.form.get('cc_number', '').replace(' ', '')
+        if not cc_number.isdigit() or len(cc_number) < 12 or not request.form.get('cc_code'):
+            context['cc_number'] = cc_number
+            return render_page('Payment', PAY_BODY, error='Please enter valid card details', **context)
+        if app.config['PAY_LATENCY'] > 0:
+            time.sleep(app.config['PAY_LATENCY'])
+        if cc_number in DECLINED_CARDS:
+            return render_page('Payment', PAY_BODY, error='Your card was declined', **context)
+        with state_lock:
+            invoice['paid'] = True
+        return redirect(f'/thanks/{invoice_id}')
+    return render_page('Payment', PAY_BODY, **context)
+
+
+@app.route('/thanks/<invoice_id>')
+def thanks(invoice_id):
+    return render_page('Thank you', THANKS_BODY, invoice_id=invoice_id)
+
+
+def start_in_thread(host='127.0.0.1', port=0, latency=None, jitter=None, pay_latency=None):
+    """Start the mock server in a background thread and return (server, base_url)"""
+    if latency is not None:
+        app.config['LATENCY'] = latency
+    if jitter is not None:
+        app.config['JITTER'] = jitter
+    if pay_latency is not None:
+        app.config['PAY_LATENCY'] = pay_latency
+    server = make_server(host, port, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f'http://{host}:{server.server_port}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local mock of the Apex aMember dashboard')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--latency', type=float, default=app.config['LATENCY'], help='seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=app.config['JITTER'], help='random extra latency, in seconds')
+    parser.add_argument('--pay-latency', type=float, default=app.config['PAY_LATENCY'], help='seconds the pay request takes')
+    args = parser.parse_args()
+
+    app.config.update(LATENCY=args.latency, JITTER=args.jitter, PAY_LATENCY=args.pay_latency)
+    print(f"Mock Apex dashboard available at http://{args.host}:{args.port}")
+    print(f"Set APEX_BASE_URL=http://{args.host}:{args.port} to point the bot at it")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
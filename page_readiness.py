@@ -0,0 +1,115 @@
+"""
+Navigation that returns as soon as the page is usable
+Starts the load over CDP (Page.navigate answers once the navigation is under
+way), then waits in the page for DOMContentLoaded, the target element and a
+quiet network, and reports the measured time-to-interactive
+"""
+
+import os
+import time
+from command_trace import sleep
+
+# Page-load strategy for new browsers: 'normal' makes every WebDriver command wait for
+# all subresources, 'eager' only for DOMContentLoaded, 'none' for nothing
+PAGE_LOAD_STRATEGY = os.getenv('PAGE_LOAD_STRATEGY', 'eager')
+
+# The network counts as idle once no resource has finished loading for this long
+NETWORK_IDLE_MS = int(os.getenv('NETWORK_IDLE_MS', '300'))
+
+# Resolves once the document that replaced `previousOrigin` has parsed, shows the
+# selector and has had no resource finish for idleMs. Resource timing entries are
+# read from the page's own buffer, so nothing is injected before the page loads.
+# arguments: previous performance.timeOrigin, CSS selector (or null), idleMs, timeoutMs
+READY_SCRIPT = """
+const [previousOrigin, selector, idleMs, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+if (performance.timeOrigin === previousOrigin) {
+    done({status: 'stale'});
+    return;
+}
+const started = performance.now();
+let elementAt = null;
+function lastNetworkActivity() {
+    let last = 0;
+    for (const entry of performance.getEntriesByType('resource')) last = Math.max(last, entry.responseEnd);
+    const nav = performance.getEntriesByType('navigation')[0];
+    return Math.max(last, nav ? nav.domContentLoadedEventEnd : 0);
+}
+function check() {
+    const parsed = document.readyState !== 'loading';
+    const element = parsed && (selector ? document.querySelector(selector) : document.body);
+    const now = performance.now();
+    if (element && elementAt === null) elementAt = now;
+    const networkIdleAt = lastNetworkActivity();
+    if (element && now - networkIdleAt >= idleMs) {
+        const nav = performance.getEntriesByType('navigation')[0];
+        done({
+            status: 'ready',
+            dom_content_loaded_ms: nav ? Math.round(nav.domContentLoadedEventEnd) : null,
+            element_ms: Math.round(elementAt),
+            network_idle_ms: Math.round(networkIdleAt),
+            interactive_ms: Math.round(now),
+        });
+        return;
+    }
+    if (now - started >= timeoutMs) {
+        done({status: 'timeout', ready_state: document.readyState, element: !!element});
+        return;
+    }
+    setTimeout(check, 25);
+}
+check();
+"""
+
+
+class NavigationError(Exception):
+    """Raised when a page fails to load or never becomes usable"""
+
+    def __init__(self, url, reason):
+        super().__init__(f"Navigation to {url} failed: {reason}")
+        self.url = url
+        self.reason = reason
+
+
+def navigate(driver, url, selector=None, timeout=30, idle_ms=NETWORK_IDLE_MS):
+    """Load url and return once it is interactive.
+
+    Interactive means DOMContentLoaded has fired, `selector` (CSS, optional) matches
+    and no resource has finished for idle_ms. Returns a report with the in-page
+    milestones (ms since navigation start) and the wall-clock time_to_interactive_ms.
+    """
+    started = time.perf_counter()
+    previous_origin = driver.execute_script('return performance.timeOrigin')
+    result = driver.execute_cdp_cmd('Page.navigate', {'url': url})
+    if result.get('errorText'):
+        raise NavigationError(url, result['errorText'])
+    return wait_until_interactive(driver, url, previous_origin, selector, timeout, idle_ms, started)
+
+
+def wait_until_interactive(driver, url, previous_origin, selector=None, timeout=30, idle_ms=NETWORK_IDLE_MS,
+                           started=None):
+    """Wait for the document that replaced previous_origin to become interactive (see navigate)"""
+    started = time.perf_counter() if started is None else started
+    deadline = started + timeout
+    while True:
+        remaining_ms = int((deadline - time.perf_counter()) * 1000)
+        if remaining_ms <= 0:
+            raise NavigationError(url, f'not interactive after {timeout}s')
+        try:
+            report = driver.execute_async_script(READY_SCRIPT, previous_origin, selector, idle_ms,
+                                                 min(remaining_ms, 10000))
+        except Exception:
+            # The old document unloaded while the script was running; ask the new one
+            report = {'status': 'stale'}
+        if report['status'] == 'ready':
+            report['time_to_interactive_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            return report
+        if report['status'] == 'stale':
+            sleep(0.025, 'stale_page')
+
+
+def format_navigation(report):
+    """Render a navigation report as a single log line"""
+    return (f"Page interactive in {report['time_to_interactive_ms'] / 1000:.2f}s "
+            f"(DOMContentLoaded {report['dom_content_loaded_ms']}ms, element {report['element_ms']}ms, "
+            f"network idle {report['network_idle_ms']}ms)")
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Multi-worker production deployment of the purchase API
+`python production_server.py` starts the job runner (the one process that owns
+browsers) and API_WORKERS uvicorn worker processes. The workers answer every
+endpoint from the shared SQLite job store, so any worker can serve any session
+and request handling scales with cores.
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+from dotenv import load_dotenv
+import uvicorn
+
+from api_common import FINAL_STATUSES, SSE_HEADERS, log_event, parse_purchase, sse_event, stream_cursor
+from job_scheduler import DuplicateJobError, QueueFullError
+from job_store import store_from_env
+
+load_dotenv()
+
+API_WORKERS = int(os.getenv('API_WORKERS', str(os.cpu_count() or 1)))
+MAX_QUEUED_JOBS = int(os.getenv('MAX_QUEUED_JOBS', '50'))
+STATUS_LOG_LIMIT = int(os.getenv('STATUS_LOG_LIMIT', '200'))
+# Workers see runner progress through the store, so event streams poll it
+STREAM_POLL_INTERVAL = float(os.getenv('STREAM_POLL_INTERVAL', '0.5'))
+STREAM_KEEPALIVE = 15
+# A finished job's stream closes once no closing logs have arrived for this long
+FINAL_QUIET_SECONDS = 2
+
+store = None
+
+
+def get_store():
+    """Open the job store lazily, after the launcher process has created its schema and key file"""
+    global store
+    if store is None:
+        store = store_from_env()
+    return store
+
+
+def queue_purchase(data):
+    """Validate a purchase request and insert its job; returns (payload, status code, headers)"""
+    try:
+        job_args = parse_purchase(data)
+    except ValueError as e:
+        return {'error': str(e)}, 400, {}
+
+    try:
+        session_id, position = get_store().create_job(job_args[0], job_args, MAX_QUEUED_JOBS)
+    except QueueFullError as e:
+        return {'error': str(e)}, 429, {'Retry-After': '30'}
+    except DuplicateJobError as e:
+        return {'error': str(e)}, 409, {}
+
+    return {
+        'message': 'Purchase process queued successfully',
+        'status': 'queued',
+        'queue_position': position,
+        'session_id': session_id
+    }, 200, {}
+
+
+def status_payload(session_id, args):
+    """Build the /api/status response from the store; returns (payload, status code)"""
+    job = get_store().get(session_id)
+    if not job:
+        return {'error': 'Session not found'}, 404
+
+    try:
+        since = int(args.get('since', 0))
+        limit = min(int(args.get('limit', STATUS_LOG_LIMIT)), STATUS_LOG_LIMIT)
+    except ValueError:
+        return {'error': 'since and limit must be integers'}, 400
+
+    # Without a cursor (the bundled frontend) show the newest lines, not the first ones of a long job
+    records = (get_store().logs_since(session_id, since, limit) if 'since' in args
+               else get_store().latest_logs(session_id, limit))
+    payload = {
+        'status': job['status'],
+        'queue_position': get_store().queue_position(session_id) if job['status'] == 'queued' else None,
+        'current_iteration': job['current_iteration'],
+        'total_iterations': job['total_iterations'],
+        'timings': job['timings'],
+        'line_items': job['line_items'],
+        'resources': job['resources'],
+        'logs': [record.format() for record in records],
+        'next_since': records[-1].seq if records else max(since, 0),
+        'last_seq': job['last_seq']
+    }
+    if args.get('structured'):
+        payload['log_records'] = [record.to_dict() for record in records]
+    return payload, 200
+
+
+def stream_snapshot(session_id, cursor):
+    """Job row and the log records after cursor, or (None, []) once the job is gone"""
+    job = get_store().get(session_id)
+    if job is None:
+        return None, []
+    return job, get_store().logs_since(session_id, cursor)
+
+
+def sessions_payload():
+    """Summary of every job in the store"""
+    active_sessions = {}
+    for job in get_store().jobs():
+        active_sessions[job['session_id']] = {
+            'status': job['status'],
+            'created_at': job['created_at'],
+            'last_activity': job['last_activity'],
+            'current_iteration': job['current_iteration'],
+            'total_iterations': job['total_iterations']
+        }
+    return {
+        'active_sessions': active_sessions,
+        'total_sessions': len(active_sessions),
+        'jobs_by_status': get_store().stats()
+    }
+
+
+async def start_purchase(request):
+    """Start the purchase process with data from frontend"""
+    try:
+        payload, status_code, headers = await run_in_threadpool(queue_purchase, await request.json())
+        return JSONResponse(payload, status_code=status_code, headers=headers)
+    except Exception as e:
+        return JSONResponse({'error': f'Server error: {str(e)}'}, status_code=500)
+
+
+async def get_status(request):
+    """Get current status and logs for specific session"""
+    payload, status_code = await run_in_threadpool(status_payload, request.path_params['session_id'],
+                                                   request.query_params)
+    return JSONResponse(payload, status_code=status_code)
+
+
+async def stream_status(request):
+    """Push session changes as Server-Sent Events, polling the store for runner progress"""
+    session_id = request.path_params['session_id']
+    if await run_in_threadpool(get_store().get, session_id) is None:
+        return JSONResponse({'error': 'Session not found'}, status_code=404)
+    cursor = stream_cursor(request.headers, request.query_params)
+
+    async def generate():
+        nonlocal cursor
+        last_status = None
+        last_iteration = None
+        last_line_items = None
+        quiet_since = asyncio.get_running_loop().time()
+        while True:
+            job, records = await run_in_threadpool(stream_snapshot, session_id, cursor)
+            if job is None:
+                yield sse_event('end', {'status': last_status})
+                return
+            events = [log_event(record) for record in records]
+            cursor = records[-1].seq if records else max(cursor, job['last_seq'])
+            iteration = (job['current_iteration'], job['total_iterations'])
+            if iteration != last_iteration:
+                last_iteration = iteration
+                events.append(sse_event('iteration', {'current_iteration': iteration[0], 'total_iterations': iteration[1]}))
+            if job['line_items'] != last_line_items:
+                last_line_items = job['line_items']
+                events.append(sse_event('line_items', {'line_items': last_line_items}))
+            if job['status'] != last_status:
+                last_status = job['status']
+                queue_position = (await run_in_threadpool(get_store().queue_position, session_id)
+                                  if last_status == 'queued' else None)
+                events.append(sse_event('status', {'status': last_status, 'queue_position': queue_position}))
+            now = asyncio.get_running_loop().time()
+            if events:
+                quiet_since = now
+                for event in events:
+                    yield event
+            elif last_status in FINAL_STATUSES and now - quiet_since >= FINAL_QUIET_SECONDS:
+                # Finished and quiet: the job's closing logs have all been delivered
+                yield sse_event('end', {'status': last_status})
+                return
+            elif now - quiet_since >= STREAM_KEEPALIVE:
+                quiet_since = now
+                yield ': keepalive\n\n'
+            await asyncio.sleep(STREAM_POLL_INTERVAL)
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers=SSE_HEADERS)
+
+
+async def control(request, command, message):
+    if not await run_in_threadpool(get_store().request_control, request.path_params['session_id'], command):
+        return JSONResponse({'error': 'Session not found'}, status_code=404)
+    return JSONResponse(message)
+
+
+async def stop_purchase(request):
+    """Ask the runner to stop the purchase process for specific session"""
+    return await control(request, 'stop', {'message': 'Stop request processed', 'status': 'stopped'})
+
+
+async def reset(request):
+    """Ask the runner to reset the status for specific session"""
+    return await control(request, 'reset', {'message': 'Status reset successfully'})
+
+
+async def list_sessions(request):
+    """List all sessions in the store (for debugging)"""
+    return JSONResponse(await run_in_threadpool(sessions_payload))
+
+
+app = Starlette(
+    routes=[
+        Route('/api/purchase', start_purchase, methods=['POST']),
+        Route('/api/status/{session_id}', get_status, methods=['GET']),
+        Route('/api/stream/{session_id}', stream_status, methods=['GET']),
+        Route('/api/stop/{session_id}', stop_purchase, methods=['POST']),
+        Route('/api/reset/{session_id}', reset, methods=['POST']),
+        Route('/api/sessions', list_sessions, methods=['GET']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+)
+
+
+def main():
+    get_store()  # create the schema (and the key file, without JOB_STORE_KEY) before the workers race to
+
+    print("Starting APEX Purchasing Bot production server...")
+    print(f"Job store: {os.getenv('JOB_STORE_PATH', 'apex_jobs.db')}")
+    runner = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'job_runner.py')])
+    try:
+        print(f"Server will be available at http://localhost:8000 ({API_WORKERS} workers)")
+        uvicorn.run('production_server:app', host='0.0.0.0', port=8000, workers=API_WORKERS)
+    finally:
+        runner.terminate()
+        runner.wait()
+
+
+if __name__ == '__main__':
+    main()
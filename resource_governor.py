@@ -0,0 +1,221 @@
+"""
+Chrome resource governor
+Tracks each job's browser process tree, samples RSS/CPU, refuses new browsers
+when free memory runs low and kills bot Chrome processes no session owns
+"""
+
+import os
+import threading
+import time
+import uuid
+import psutil
+
+# Switch added to every browser this process launches, with a token unique to the process, so its
+# browsers can be told apart from a user's own Chrome and from those of app.py, the benchmarks or
+# another server instance. undetected-chromedriver launches Chrome detached, so parentage alone
+# cannot identify them.
+PROCESS_TOKEN = uuid.uuid4().hex
+BROWSER_MARKER = f'--apex-purchasing-bot={PROCESS_TOKEN}'
+
+
+class InsufficientMemoryError(Exception):
+    """Raised when launching another browser would push the host below its free-memory floor"""
+
+
+def driver_root_pids(driver):
+    """PIDs of the chromedriver service and the browser started for a driver"""
+    pids = []
+    service = getattr(driver, 'service', None)
+    process = getattr(service, 'process', None)
+    if process is not None and getattr(process, 'pid', None):
+        pids.append(process.pid)
+    browser_pid = getattr(driver, 'browser_pid', None)
+    if browser_pid:
+        pids.append(browser_pid)
+    return pids
+
+
+def process_tree(pids):
+    """psutil.Process objects for the given PIDs and all their descendants"""
+    processes = {}
+    for pid in pids:
+        try:
+            root = psutil.Process(pid)
+            processes[root.pid] = root
+            for child in root.children(recursive=True):
+                processes[child.pid] = child
+        except psutil.Error:
+            continue
+    return processes
+
+
+def kill_processes(processes, timeout=3):
+    """Terminate processes, escalating to SIGKILL for any that linger; returns the number killed"""
+    alive = []
+    for process in processes:
+        try:
+            process.terminate()
+            alive.append(process)
+        except psutil.Error:
+            continue
+    gone, still_alive = psutil.wait_procs(alive, timeout=timeout)
+    for process in still_alive:
+        try:
+            process.kill()
+        except psutil.Error:
+            continue
+    return len(alive)
+
+
+def quit_driver(driver, log=print):
+    """Quit a driver and kill whatever part of its process tree survives the quit"""
+    processes = process_tree(driver_root_pids(driver))
+    try:
+        driver.quit()
+    except Exception as e:
+        log(f"⚠️ driver.quit() failed, killing browser processes: {e}")
+    leftovers = [process for process in processes.values() if process.is_running()]
+    if leftovers:
+        kill_processes(leftovers)
+
+
+def bot_process_roots():
+    """Browsers carrying this process's marker and chromedriver services started by this process"""
+    roots = []
+    me = psutil.Process()
+    owner = me.username()
+    for process in psutil.process_iter(['pid', 'ppid', 'name', 'cmdline', 'create_time', 'username']):
+        try:
+            name = (process.info['name'] or '').lower()
+            cmdline = process.info['cmdline'] or []
+        except psutil.Error:
+            continue
+        # Never touch processes of other users, or Chrome that is not ours
+        if 'chrom' not in name or process.info['username'] != owner:
+            continue
+        if BROWSER_MARKER in cmdline or ('chromedriver' in name and process.info['ppid'] == me.pid):
+            roots.append(process)
+    return roots
+
+
+class ResourceGovernor:
+    """Samples per-session browser resources and reaps orphaned bot browsers in the background.
+
+    live_drivers is a callable returning {owner_id: driver} for every browser
+    that is still legitimately in use (session browsers and pooled ones).
+    """
+
+    def __init__(self, live_drivers, min_free_mb=1024, sample_interval=5, reap_interval=60, orphan_grace=120):
+        self.live_drivers = live_drivers
+        self.min_free_mb = min_free_mb
+        self.sample_interval = sample_interval
+        self.reap_interval = reap_interval
+        self.orphan_grace = orphan_grace
+        self.samples = {}  # owner_id -> latest resource sample
+        self.orphans_killed = 0
+        self._trees = {}  # owner_id -> {pid: Process}; reused so cpu_percent has a baseline
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def free_memory_mb(self):
+        return psutil.virtual_memory().available / (1024 * 1024)
+
+    def admit(self):
+        """Raise InsufficientMemoryError if there is not enough free memory for another browser"""
+        free_mb = self.free_memory_mb()
+        if free_mb < self.min_free_mb:
+            raise InsufficientMemoryError(
+                f'Only {free_mb:.0f} MB free, need {self.min_free_mb} MB to launch another browser'
+            )
+
+    def guard(self, factory):
+        """Wrap a driver factory so every launch passes memory admission first"""
+        def guarded_factory():
+            self.admit()
+            return factory()
+        return guarded_factory
+
+    def sample(self, owner_id, driver):
+        """Measure RSS and CPU across a driver's process tree"""
+        with self._lock:
+            known = self._trees.get(owner_id, {})
+        current = process_tree(driver_root_pids(driver))
+        # Keep existing Process objects so cpu_percent() measures since the last sample
+        tree = {pid: known.get(pid, process) for pid, process in current.items()}
+        rss = 0
+        cpu = 0.0
+        for process in tree.values():
+            try:
+                rss += process.memory_info().rss
+                cpu += process.cpu_percent(None)
+            except psutil.Error:
+                continue
+        sample = {
+            'rss_mb': round(rss / (1024 * 1024), 1),
+            'cpu_percent': round(cpu, 1),
+            'processes': len(tree),
+            'sampled_at': time.time(),
+        }
+        with self._lock:
+            self._trees[owner_id] = tree
+            self.samples[owner_id] = sample
+        return sample
+
+    def sample_all(self):
+        live = self.live_drivers()
+        for owner_id, driver in live.items():
+            self.sample(owner_id, driver)
+        with self._lock:
+            for owner_id in list(self._trees):
+                if owner_id not in live:
+                    self._trees.pop(owner_id, None)
+                    self.samples.pop(owner_id, None)
+
+    def total_rss_mb(self):
+        with self._lock:
+            return sum(sample['rss_mb'] for sample in self.samples.values())
+
+    def reap_orphans(self):
+        """Kill Chrome/chromedriver processes launched by this server that belong to no live driver"""
+        live_pids = set()
+        for driver in self.live_drivers().values():
+            live_pids.update(process_tree(driver_root_pids(driver)))
+        now = time.time()
+        orphans = {}
+        for root in bot_process_roots():
+            if root.pid in live_pids or now - root.info['create_time'] < self.orphan_grace:
+                continue
+            orphans.update(process_tree([root.pid]))
+        if orphans:
+            killed = kill_processes(list(orphans.values()))
+            self.orphans_killed += killed
+            print(f"[GOVERNOR] Killed {killed} orphaned browser process(es)")
+        return len(orphans)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='resource-governor', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        last_reap = time.monotonic()
+        while True:
+            time.sleep(self.sample_interval)
+            try:
+                self.sample_all()
+                if time.monotonic() - last_reap >= self.reap_interval:
+                    last_reap = time.monotonic()
+                    self.reap_orphans()
+            except Exception as e:
+                print(f"[GOVERNOR] Error: {e}")
+
+
+def governor_from_env(live_drivers):
+    """Build a governor configured by MIN_FREE_MEMORY_MB / RESOURCE_SAMPLE_INTERVAL / ORPHAN_REAP_INTERVAL"""
+    return ResourceGovernor(
+        live_drivers,
+        min_free_mb=float(os.getenv('MIN_FREE_MEMORY_MB', '1024')),
+        sample_interval=float(os.getenv('RESOURCE_SAMPLE_INTERVAL', '5')),
+        reap_interval=float(os.getenv('ORPHAN_REAP_INTERVAL', '60')),
+        orphan_grace=float(os.getenv('ORPHAN_GRACE_SECONDS', '120')),
+    )
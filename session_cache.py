@@ -0,0 +1,107 @@
+"""
+Encrypted per-user cache of authenticated dashboard cookies
+Lets repeat jobs for the same account skip the login page and consent dialog
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from cryptography.fernet import Fernet, InvalidToken
+
+# aMember's login session and remember-me cookies; analytics and Cloudflare cookies
+# expire on their own schedule and say nothing about the login
+AUTH_COOKIE_NAMES = ('PHPSESSID', 'amember_nr')
+
+
+class SessionCache:
+    """Username -> encrypted cookie jar, valid until the TTL or the expiry of the login cookies.
+
+    Entries are bound to the password they were created with, so a job can only
+    reuse a cached login when it supplies the same credentials.
+    """
+
+    def __init__(self, ttl=1800, key=None, auth_cookies=AUTH_COOKIE_NAMES):
+        self.ttl = ttl
+        self.auth_cookies = set(auth_cookies)
+        self._fernet = Fernet(key or Fernet.generate_key())
+        self._mac_key = os.urandom(32)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _password_digest(self, username, password):
+        message = f'{username}\0{password}'.encode('utf-8')
+        return hmac.new(self._mac_key, message, hashlib.sha256).digest()
+
+    def store(self, username, password, cookies):
+        """Encrypt and cache the cookie jar of a freshly authenticated browser"""
+        if not cookies:
+            return
+        expires_at = time.time() + self.ttl
+        for cookie in cookies:
+            if cookie['name'] in self.auth_cookies and cookie.get('expiry'):
+                expires_at = min(expires_at, cookie['expiry'])
+        token = self._fernet.encrypt(json.dumps(cookies).encode('utf-8'))
+        with self._lock:
+            self._entries[username] = (expires_at, self._password_digest(username, password), token)
+
+    def load(self, username, password):
+        """Return the cached cookies for a user, or None if missing, expired or mismatched"""
+        with self._lock:
+            entry = self._entries.get(username)
+        if not entry:
+            return None
+        expires_at, digest, token = entry
+        if time.time() >= expires_at:
+            self.invalidate(username)
+            return None
+        if not hmac.compare_digest(digest, self._password_digest(username, password)):
+            return None
+        try:
+            return json.loads(self._fernet.decrypt(token))
+        except InvalidToken:
+            self.invalidate(username)
+            return None
+
+    def invalidate(self, username):
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+def to_cdp_cookie(cookie):
+    """Convert a Selenium cookie dict to a CDP Network.CookieParam"""
+    param = {
+        'name': cookie['name'],
+        'value': cookie['value'],
+        'domain': cookie.get('domain'),
+        'path': cookie.get('path', '/'),
+        'secure': cookie.get('secure', False),
+        'httpOnly': cookie.get('httpOnly', False),
+    }
+    if cookie.get('sameSite'):
+        param['sameSite'] = cookie['sameSite']
+    if cookie.get('expiry'):
+        param['expires'] = cookie['expiry']
+    return param
+
+
+def inject_cookies(driver, cookies):
+    """Install cookies into the browser without first loading a page on their domain"""
+    driver.execute_cdp_cmd('Network.setCookies', {'cookies': [to_cdp_cookie(cookie) for cookie in cookies]})
+
+
+def cache_from_env():
+    """Build a cache from SESSION_CACHE_TTL, an optional SESSION_CACHE_KEY and SESSION_AUTH_COOKIES"""
+    key = os.getenv('SESSION_CACHE_KEY')
+    auth_cookies = os.getenv('SESSION_AUTH_COOKIES', ','.join(AUTH_COOKIE_NAMES))
+    return SessionCache(
+        ttl=float(os.getenv('SESSION_CACHE_TTL', '1800')),
+        key=key.encode('ascii') if key else None,
+        auth_cookies=[name.strip() for name in auth_cookies.split(',') if name.strip()],
+    )
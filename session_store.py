@@ -0,0 +1,126 @@
+"""
+Thread-safe session store with a background expiry reaper
+"""
+
+import heapq
+import threading
+import time
+import uuid
+from log_buffer import LogBuffer
+
+
+class Session:
+    """State of one user's purchase job.
+
+    Field writes that readers wait on go through the `changed` condition,
+    which doubles as the record lock.
+    """
+
+    __slots__ = ('session_id', 'status', 'logs', 'current_iteration', 'total_iterations', 'timings',
+                 'line_items', 'should_stop', 'driver', 'changed', 'created_at', 'last_activity')
+
+    def __init__(self, session_id, log_capacity=1000):
+        now = time.time()
+        self.session_id = session_id
+        self.status = 'ready'  # ready, queued, processing, completed, error, stopped
+        self.logs = LogBuffer(log_capacity)
+        self.current_iteration = 0
+        self.total_iterations = 0
+        self.timings = []
+        self.line_items = []  # per-product progress: account, count, done, purchased, failed, status
+        self.should_stop = False
+        self.driver = None
+        self.changed = threading.Condition()  # notified on every log, iteration or status change
+        self.created_at = now
+        self.last_activity = now
+
+
+class SessionStore:
+    """Lock-protected map of session id -> Session.
+
+    Expiry is driven by a min-heap of (deadline, session_id) with exactly one
+    entry per session. Touching a session only updates last_activity; when the
+    reaper pops an entry whose session was touched since, it re-queues it at the
+    real deadline. The reaper therefore sleeps until the earliest possible
+    expiry instead of sweeping every session on a timer.
+    """
+
+    def __init__(self, ttl=3600, log_capacity=1000, on_expire=None):
+        self.ttl = ttl
+        self.log_capacity = log_capacity
+        self.on_expire = on_expire
+        self._sessions = {}
+        self._deadlines = []
+        self._cond = threading.Condition()
+        self._reaper = None
+
+    def create(self, session_id=None):
+        """Add a new session, under a given ID (e.g. one assigned by the job store) or a fresh UUID"""
+        session = Session(session_id or str(uuid.uuid4()), self.log_capacity)
+        with self._cond:
+            self._sessions[session.session_id] = session
+            heapq.heappush(self._deadlines, (session.last_activity + self.ttl, session.session_id))
+            self._cond.notify()
+        return session
+
+    def get(self, session_id, touch=True):
+        with self._cond:
+            session = self._sessions.get(session_id)
+        if session and touch:
+            session.last_activity = time.time()
+        return session
+
+    def remove(self, session_id):
+        """Drop a session; its heap entry is discarded lazily by the reaper"""
+        with self._cond:
+            return self._sessions.pop(session_id, None)
+
+    def values(self):
+        with self._cond:
+            return list(self._sessions.values())
+
+    def __contains__(self, session_id):
+        with self._cond:
+            return session_id in self._sessions
+
+    def __len__(self):
+        with self._cond:
+            return len(self._sessions)
+
+    def reap(self, now=None):
+        """Remove every session whose deadline has passed and return them"""
+        now = time.time() if now is None else now
+        expired = []
+        with self._cond:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                _, session_id = heapq.heappop(self._deadlines)
+                session = self._sessions.get(session_id)
+                if session is None:
+                    continue
+                deadline = session.last_activity + self.ttl
+                if deadline > now:
+                    heapq.heappush(self._deadlines, (deadline, session_id))
+                else:
+                    expired.append(self._sessions.pop(session_id))
+        for session in expired:
+            if self.on_expire:
+                try:
+                    self.on_expire(session)
+                except Exception as e:
+                    print(f"[REAPER] Error expiring session {session.session_id[:8]}...: {e}")
+        return expired
+
+    def start_reaper(self):
+        """Start the background thread that expires idle sessions on time"""
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=self._reap_forever, name='session-reaper', daemon=True)
+            self._reaper.start()
+
+    def _reap_forever(self):
+        while True:
+            with self._cond:
+                if self._deadlines:
+                    self._cond.wait(max(0.0, self._deadlines[0][0] - time.time()))
+                else:
+                    self._cond.wait()
+            self.reap()
@@ -0,0 +1,163 @@
+"""
+Tab-pipelined checkout within one logged-in browser
+While one tab waits for the payment processor, the next tab loads and fills its
+signup and card pages, so a job keeps up to `depth` purchases in flight without
+launching more Chrome processes. At most `total` purchases are ever started.
+"""
+
+import time
+from browser import open_tab
+from command_trace import sleep, span
+from checkout_steps import PAY_STEP, SessionExpiredError, Step, StepTimeoutError, run_steps
+
+# Upper bound on tabs per job, whatever the request asks for
+MAX_PIPELINE_DEPTH = 8
+
+# The pay click without its outcome wait; the pipeline polls each paying tab itself
+PAY_CLICK_STEP = Step(PAY_STEP.name, PAY_STEP.ready, PAY_STEP.action, timeout=PAY_STEP.timeout, idempotent=False)
+
+# Pause between outcome polls while every tab is waiting on payment
+OUTCOME_POLL_SECONDS = 0.05
+
+
+class PipelineTab:
+    """One browser tab and the purchase it is carrying, if any"""
+
+    def __init__(self, handle):
+        self.handle = handle
+        self.iteration = None
+        self.ctx = None
+        self.timings = None
+        self.detect = None  # outcome condition while a payment is pending
+        self.deadline = None
+
+    @property
+    def paying(self):
+        return self.detect is not None
+
+
+class TabPipeline:
+    """Runs `total` checkouts over up to `depth` tabs of one authenticated browser.
+
+    Each tab fills its pages and clicks pay, then is left to the payment
+    processor while the pipeline moves to an idle tab for the next account.
+    Outcomes are polled tab by tab. A purchase slot is taken before a tab starts
+    filling, so no more than `total` pay clicks can ever happen, and after a stop
+    only the payments already submitted are waited for.
+
+    Callbacks: make_ctx(iteration) -> step context, on_start(iteration),
+    on_result(iteration, ctx, timings), on_error(iteration, ctx, error),
+    relogin() -> bool and should_stop() -> bool. Iterations count from 1.
+    """
+
+    def __init__(self, driver, steps, total, depth, make_ctx, on_result, on_error,
+                 on_start=None, should_stop=None, relogin=None, max_relogins=1, log=None):
+        self.driver = driver
+        self.prepare_steps = [step for step in steps if step is not PAY_STEP] + [PAY_CLICK_STEP]
+        self.total = total
+        self.depth = max(1, min(depth, total, MAX_PIPELINE_DEPTH))
+        self.make_ctx = make_ctx
+        self.on_result = on_result
+        self.on_error = on_error
+        self.on_start = on_start or (lambda iteration: None)
+        self.should_stop = should_stop or (lambda: False)
+        self.relogin = relogin
+        self.max_relogins = max_relogins
+        self.log = log
+        self.started = 0
+        self.aborted = False  # set when a re-login failed; no new purchases are started
+
+    def run(self):
+        """Drive every tab until all purchases have an outcome; returns how many were started"""
+        tabs = self._open_tabs()
+        try:
+            while True:
+                for tab in tabs:
+                    if tab.paying:
+                        with span('outcome', iteration=tab.iteration, step=PAY_STEP.name):
+                            self._poll(tab)
+                idle = next((tab for tab in tabs if not tab.paying), None)
+                if idle is not None and self._may_start():
+                    self.started += 1
+                    with span('checkout', iteration=self.started):
+                        self._start(idle, self.started)
+                    continue
+                if not any(tab.paying for tab in tabs):
+                    break
+                sleep(OUTCOME_POLL_SECONDS, 'outcome_poll')
+        finally:
+            self._close_tabs(tabs)
+        return self.started
+
+    def _may_start(self):
+        return self.started < self.total and not self.aborted and not self.should_stop()
+
+    def _open_tabs(self):
+        tabs = [PipelineTab(self.driver.current_window_handle)]
+        for _ in range(self.depth - 1):
+            tabs.append(PipelineTab(open_tab(self.driver)))
+        return tabs
+
+    def _close_tabs(self, tabs):
+        try:
+            for tab in tabs[1:]:
+                self.driver.switch_to.window(tab.handle)
+                self.driver.close()
+            self.driver.switch_to.window(tabs[0].handle)
+        except Exception:
+            # The browser is going back to the pool, whose reset closes leftover tabs
+            pass
+
+    def _step_log(self, iteration):
+        if self.log is None:
+            return None
+        return lambda message, step=None: self.log(f"Account {iteration}: {message}", step=step)
+
+    def _start(self, tab, iteration):
+        """Fill the checkout for one account in tab and click pay"""
+        self.driver.switch_to.window(tab.handle)
+        self.on_start(iteration)
+        ctx = self.make_ctx(iteration)
+        for relogin in range(self.max_relogins + 1):
+            try:
+                timings = run_steps(self.driver, self.prepare_steps, ctx, log=self._step_log(iteration))
+                break
+            except SessionExpiredError as e:
+                ctx.setdefault('retries', []).append({'step': e.step_name, 'reason': 'session_expired'})
+                # Tabs share cookies, so logging in again in this tab restores all of them
+                if relogin < self.max_relogins and self.relogin is not None:
+                    if self.relogin():
+                        continue
+                    self.aborted = True
+                self.on_error(iteration, ctx, e)
+                return
+            except Exception as e:
+                self.on_error(iteration, ctx, e)
+                return
+        tab.iteration, tab.ctx, tab.timings = iteration, ctx, timings
+        tab.detect = PAY_STEP.done(None, ctx)
+        tab.deadline = time.perf_counter() + PAY_STEP.timeout
+
+    def _poll(self, tab):
+        """Check a paying tab once and hand over its outcome when it is known"""
+        try:
+            self.driver.switch_to.window(tab.handle)
+            outcome = tab.detect(self.driver)
+        except Exception as e:
+            self._finish(tab, error=e)
+            return
+        if outcome:
+            # The pay step lasts from its click to the outcome, as in the serial flow
+            tab.timings = [(name, seconds + outcome['time_to_outcome_ms'] / 1000 if name == PAY_STEP.name else seconds)
+                           for name, seconds in tab.timings]
+            self._finish(tab)
+        elif time.perf_counter() > tab.deadline:
+            self._finish(tab, error=StepTimeoutError(PAY_STEP.name, PAY_STEP.timeout))
+
+    def _finish(self, tab, error=None):
+        iteration, ctx, timings = tab.iteration, tab.ctx, tab.timings
+        tab.iteration = tab.ctx = tab.timings = tab.detect = tab.deadline = None
+        if error is None:
+            self.on_result(iteration, ctx, timings)
+        else:
+            self.on_error(iteration, ctx, error)
@@ -0,0 +1,5 @@
+import os
+
+# Keep test runs away from the working directory's journal and log files
+os.environ['JOB_JOURNAL_PATH'] = ''
+os.environ['LOG_FILE'] = ''
@@ -0,0 +1,14 @@
+import pytest
+
+from api_common import MAX_ACCOUNTS_PER_JOB, parse_line_items
+
+
+def test_number_of_accounts_requests_are_not_capped():
+    [item] = parse_line_items({'selectedAccount': '50k-Tradovate', 'numberOfAccounts': MAX_ACCOUNTS_PER_JOB + 1})
+    assert item['count'] == MAX_ACCOUNTS_PER_JOB + 1
+
+
+def test_line_items_are_capped_in_total():
+    half = MAX_ACCOUNTS_PER_JOB // 2 + 1
+    with pytest.raises(ValueError):
+        parse_line_items({'lineItems': [{'account': '50k', 'count': half}, {'account': '100k', 'count': half}]})
@@ -0,0 +1,130 @@
+import pytest
+
+import api_server
+from driver_pool import DriverPool
+from job_journal import JobJournal
+from job_scheduler import DuplicateJobError
+from load_test import FakeBackend
+
+
+def logged_session(count):
+    session = api_server.sessions.create()
+    for number in range(1, count + 1):
+        session.logs.append(f'line {number}')
+    return session
+
+
+def test_status_without_since_returns_the_newest_lines():
+    session = logged_session(250)
+    payload, status_code = api_server.status_payload(session.session_id, {'limit': '200'})
+    assert status_code == 200
+    assert len(payload['logs']) == 200
+    assert payload['logs'][-1].endswith('line 250')
+    assert payload['next_since'] == 250
+
+
+def test_status_with_since_pages_forward_from_the_cursor():
+    session = logged_session(250)
+    payload, _ = api_server.status_payload(session.session_id, {'since': '0', 'limit': '10'})
+    assert [line.split('] ')[1] for line in payload['logs']] == [f'line {number}' for number in range(1, 11)]
+    assert payload['next_since'] == 10
+
+
+@pytest.fixture
+def fake_backend(monkeypatch, tmp_path):
+    """api_server with the load-test backend instead of Chrome and a journal in tmp_path"""
+    backend = FakeBackend(step_scale=0, jitter=0, launch_seconds=0, login_seconds=0, seed=1)
+    backend.api = api_server
+    monkeypatch.setattr(api_server, 'driver_pool', DriverPool(size=0, factory=backend.create_driver))
+    monkeypatch.setattr(api_server, 'login', backend.login)
+    monkeypatch.setattr(api_server, 'restore_session', backend.restore_session)
+    monkeypatch.setattr(api_server, 'run_steps', backend.run_steps)
+    monkeypatch.setattr(api_server, 'journal', JobJournal(str(tmp_path / 'journal.db')))
+    return backend
+
+
+def job_args(count=4):
+    return ['user', 'secret', '4242424242424242', '01', '2030', '123', count, 'COUPON', '50k', False, 1,
+            [{'account': '50k', 'count': count}]]
+
+
+def interrupted_job(session_id, outcomes, in_progress=()):
+    """Journal a job the way a crashed server leaves it"""
+    args = job_args()
+    api_server.journal.begin(session_id, 'user', args, args[6])
+    for iteration, result in outcomes.items():
+        api_server.journal.record_iteration(session_id, iteration, 0, '50k', result)
+    for iteration in in_progress:
+        api_server.journal.start_iteration(session_id, iteration, 0, '50k')
+
+
+def run_job(session_id, resume=None):
+    api_server.sessions.create(session_id)
+    api_server.run_automation(session_id, *job_args(), resume=resume)
+    return api_server.sessions.get(session_id)
+
+
+def test_handled_error_removes_the_job_from_the_journal(fake_backend, monkeypatch):
+    def wrong_password(driver, session_id, username, password):
+        api_server.set_status(session_id, 'error')
+        return False
+
+    monkeypatch.setattr(api_server, 'login', wrong_password)
+    api_server.journal.begin('job-login', 'user', job_args(), 4)
+    session = run_job('job-login')
+    assert session.status == 'error'
+    assert api_server.journal.job_args('job-login') is None
+
+
+def test_resume_runs_only_the_accounts_without_an_outcome(fake_backend):
+    interrupted_job('job-resume', {1: 'confirmed', 3: 'declined'})
+    [job] = api_server.unfinished_jobs()
+    assert job['resume_at'] == 2
+
+    session = run_job('job-resume', resume={'start_at': 2, 'outcomes': api_server.journal.outcomes('job-resume')})
+    assert session.status == 'completed'
+    assert session.line_items[0]['purchased'] == 3
+    assert api_server.unfinished_jobs() == []
+
+
+def test_resume_after_a_mid_checkout_interruption_needs_start_at(fake_backend):
+    interrupted_job('job-mid', {1: 'confirmed'}, in_progress=[2])
+    payload, status_code, _ = api_server.resume_job('job-mid', {})
+    assert status_code == 409
+    assert payload['in_progress'] == [2]
+
+
+def test_skipping_logs_only_the_account_that_was_mid_checkout(fake_backend):
+    interrupted_job('job-skip', {1: 'confirmed'}, in_progress=[3])
+    session = run_job('job-skip', resume={'start_at': 4, 'outcomes': api_server.journal.outcomes('job-skip')})
+    messages = [record.message for record in session.logs.since(0)]
+    assert [message for message in messages if 'was in progress' in message] == [
+        '⚠️ Account 3 was in progress when the server stopped; skipping it']
+    assert any('[2], which never started' in message for message in messages)
+    assert session.line_items[0]['purchased'] == 2
+
+
+class StubScheduler:
+    def __init__(self, error=None):
+        self.error = error
+
+    def submit(self, session_id, username, target, args):
+        if self.error:
+            raise self.error
+        return 1
+
+
+def test_resuming_reuses_a_session_still_in_memory(fake_backend, monkeypatch):
+    session = api_server.sessions.create('job-reuse')
+    session.status = 'error'
+    monkeypatch.setattr(api_server, 'scheduler', StubScheduler())
+    api_server.queue_job(job_args(), 'job-reuse', resume={'start_at': 1, 'outcomes': {}})
+    assert api_server.sessions.get('job-reuse') is session
+    assert session.status == 'queued'
+
+    monkeypatch.setattr(api_server, 'scheduler', StubScheduler(DuplicateJobError('user already has a job')))
+    session.status = 'error'
+    with pytest.raises(DuplicateJobError):
+        api_server.queue_job(job_args(), 'job-reuse', resume={'start_at': 1, 'outcomes': {}})
+    assert api_server.sessions.get('job-reuse') is session
+    assert session.status == 'error'
@@ -0,0 +1,101 @@
+import re
+
+import pytest
+from selenium.common.exceptions import StaleElementReferenceException
+
+from checkout_steps import CONFIRMED_URL_PATTERN, ActionUncertainError, SessionExpiredError, Step, run_steps
+
+
+class StubDriver:
+    """Shows the login form once logged_out is set"""
+
+    def __init__(self):
+        self.logged_out = False
+
+    def find_elements(self, by, value):
+        return ['login-form'] if self.logged_out and value == 'amember-login' else []
+
+
+def never(element, ctx):
+    return lambda driver: False
+
+
+def test_pay_is_not_repeated_when_the_session_is_lost_after_the_click():
+    driver = StubDriver()
+    clicks = []
+
+    def pay(driver, element, ctx):
+        clicks.append(1)
+        driver.logged_out = True
+
+    step = Step('pay', None, pay, timeout=0.1, done=never, idempotent=False)
+    with pytest.raises(ActionUncertainError) as raised:
+        run_steps(driver, [step], {}, retries=2)
+    assert not isinstance(raised.value, SessionExpiredError)
+    assert clicks == [1]
+
+
+def test_pay_is_not_repeated_when_its_outcome_condition_raises_session_expired():
+    driver = StubDriver()
+    clicks = []
+
+    def pay(driver, element, ctx):
+        clicks.append(1)
+
+    def logged_out(element, ctx):
+        def condition(driver):
+            raise SessionExpiredError('pay')
+        return condition
+
+    step = Step('pay', None, pay, timeout=0.1, done=logged_out, idempotent=False)
+    with pytest.raises(ActionUncertainError):
+        run_steps(driver, [step], {}, retries=2)
+    assert clicks == [1]
+
+
+def test_idempotent_step_still_reports_a_lost_session():
+    driver = StubDriver()
+    driver.logged_out = True
+    step = Step('coupon', None, lambda driver, element, ctx: None, timeout=0.1, done=never)
+    with pytest.raises(SessionExpiredError):
+        run_steps(driver, [step], {}, retries=0)
+
+
+def test_transient_failure_before_the_click_is_retried():
+    driver = StubDriver()
+    checks = []
+    clicks = []
+
+    def ready(ctx):
+        def condition(driver):
+            checks.append(1)
+            if len(checks) == 1:
+                raise StaleElementReferenceException('pay button replaced')
+            return 'pay-button'
+        return condition
+
+    step = Step('pay', ready, lambda driver, element, ctx: clicks.append(element), timeout=0.05, idempotent=False)
+    ctx = {}
+    run_steps(driver, [step], ctx, retries=2)
+    assert clicks == ['pay-button']
+    assert [retry['reason'] for retry in ctx['retries']] == ['StaleElementReferenceException']
+
+
+@pytest.mark.parametrize('url', [
+    'https://shop.example/member/thanks',
+    'https://shop.example/member/thanks/',
+    'https://shop.example/thank-you',
+    'https://shop.example/member/thanks?id=9f2c&amember_redirect_url=x',
+    'https://shop.example/member/thanks#receipt',
+    'https://shop.example/payment-success',
+])
+def test_thank_you_urls_count_as_confirmed(url):
+    assert re.search(CONFIRMED_URL_PATTERN, url, re.IGNORECASE)
+
+
+@pytest.mark.parametrize('url', [
+    'https://shop.example/member/thanksgiving-sale',
+    'https://shop.example/signup/pay',
+])
+def test_other_urls_are_not_confirmed(url):
+    assert not re.search(CONFIRMED_URL_PATTERN, url, re.IGNORECASE)
@@ -0,0 +1,34 @@
+from cryptography.fernet import Fernet
+
+from job_journal import IN_PROGRESS, JobJournal
+
+
+def test_journal_keeps_encrypted_arguments_and_outcomes_until_finish(tmp_path):
+    path = str(tmp_path / 'journal.db')
+    key = Fernet.generate_key()
+    journal = JobJournal(path, key=key)
+    journal.begin('job-1', 'user', ['user', 'hunter2', '4242424242424242'], 3)
+    journal.record_iteration('job-1', 1, 0, '50k', 'confirmed')
+    journal.start_iteration('job-1', 2, 0, '50k')
+
+    with open(path, 'rb') as journal_file:
+        assert b'hunter2' not in journal_file.read()
+    reopened = JobJournal(path, key=key)
+    assert reopened.job_args('job-1') == ['user', 'hunter2', '4242424242424242']
+    assert reopened.outcomes('job-1')[2]['result'] == IN_PROGRESS
+    [job] = reopened.unfinished()
+    assert (job['finished_iterations'], job['purchased'], job['in_progress'], job['resume_at']) == (1, 1, [2], 2)
+
+    reopened.finish('job-1')
+    assert reopened.unfinished() == []
+    assert reopened.job_args('job-1') is None
+
+
+def test_resume_at_skips_outcomes_recorded_out_of_order(tmp_path):
+    journal = JobJournal(str(tmp_path / 'journal.db'))
+    journal.begin('job-1', 'user', [], 4)
+    for iteration in (1, 3):
+        journal.record_iteration('job-1', iteration, 0, '50k', 'confirmed')
+    [job] = journal.unfinished()
+    assert job['resume_at'] == 2
+    assert job['finished_iterations'] == 2
@@ -0,0 +1,24 @@
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+
+from cryptography.fernet import Fernet
+
+from job_store import load_key
+
+
+def test_load_key_creates_an_owner_only_key_once(tmp_path):
+    key_file = str(tmp_path / 'jobs.db.key')
+    key = load_key(key_file)
+    Fernet(key)
+    assert stat.S_IMODE(os.stat(key_file).st_mode) == 0o600
+    assert load_key(key_file) == key
+    assert os.listdir(tmp_path) == ['jobs.db.key']
+
+
+def test_concurrent_first_use_agrees_on_one_complete_key(tmp_path):
+    key_file = str(tmp_path / 'jobs.db.key')
+    with ThreadPoolExecutor(8) as executor:
+        keys = set(executor.map(lambda _: load_key(key_file), range(32)))
+    assert len(keys) == 1
+    Fernet(keys.pop())
@@ -0,0 +1,27 @@
+from log_buffer import LogBuffer
+
+
+def filled(count, capacity=1000):
+    logs = LogBuffer(capacity)
+    for number in range(1, count + 1):
+        logs.append(f'line {number}')
+    return logs
+
+
+def test_ring_buffer_keeps_the_newest_records_and_counts_on():
+    logs = filled(12, capacity=5)
+    assert len(logs) == 5
+    assert logs.last_seq == 12
+    assert [record.seq for record in logs.since(0)] == [8, 9, 10, 11, 12]
+
+
+def test_since_returns_records_after_the_cursor_up_to_limit():
+    logs = filled(10)
+    assert [record.seq for record in logs.since(3, 4)] == [4, 5, 6, 7]
+    assert logs.since(10) == []
+
+
+def test_latest_returns_the_newest_records_oldest_first():
+    logs = filled(10)
+    assert [record.seq for record in logs.latest(3)] == [8, 9, 10]
+    assert [record.seq for record in logs.latest(50)] == list(range(1, 11))
@@ -0,0 +1,38 @@
+import os
+
+import psutil
+
+import resource_governor
+from resource_governor import BROWSER_MARKER, bot_process_roots
+
+
+class StubProcess:
+    def __init__(self, pid, name, cmdline, ppid=1, username=None):
+        self.pid = pid
+        self.info = {'pid': pid, 'ppid': ppid, 'name': name, 'cmdline': cmdline, 'create_time': 0,
+                     'username': username or psutil.Process().username()}
+
+
+def roots_among(monkeypatch, processes):
+    monkeypatch.setattr(resource_governor.psutil, 'process_iter', lambda attrs: processes)
+    return [process.pid for process in bot_process_roots()]
+
+
+def test_only_browsers_with_this_process_token_are_bot_roots(monkeypatch):
+    processes = [
+        StubProcess(10, 'chrome', ['chrome', BROWSER_MARKER]),
+        StubProcess(11, 'chrome', ['chrome', '--apex-purchasing-bot=another-process']),
+        StubProcess(12, 'chrome', ['chrome', '--apex-purchasing-bot']),
+        StubProcess(13, 'chrome', ['chrome']),
+        StubProcess(14, 'chrome', ['chrome', BROWSER_MARKER], username='someone-else'),
+    ]
+    assert roots_among(monkeypatch, processes) == [10]
+
+
+def test_only_chromedrivers_started_by_this_process_are_bot_roots(monkeypatch):
+    processes = [
+        StubProcess(20, 'chromedriver', ['/tmp/undetected/chromedriver'], ppid=os.getpid()),
+        StubProcess(21, 'chromedriver', ['/tmp/undetected/chromedriver'], ppid=os.getpid() + 1),
+        StubProcess(22, 'undetected_chromedriver', ['/home/u/.cache/apex-chromedriver/chromedriver']),
+    ]
+    assert roots_among(monkeypatch, processes) == [20]
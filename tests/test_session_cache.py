@@ -0,0 +1,23 @@
+import time
+
+import session_cache
+from session_cache import SessionCache
+
+
+def test_short_lived_analytics_cookies_do_not_expire_the_login(monkeypatch):
+    cache = SessionCache(ttl=1800)
+    soon = time.time() + 1
+    cache.store('user', 'secret', [
+        {'name': 'PHPSESSID', 'value': 'abc', 'path': '/'},
+        {'name': '__cf_bm', 'value': 'x', 'path': '/', 'expiry': soon},
+        {'name': '_ga', 'value': 'y', 'path': '/', 'expiry': soon},
+    ])
+    later = soon + 60
+    monkeypatch.setattr(session_cache.time, 'time', lambda: later)
+    assert [cookie['name'] for cookie in cache.load('user', 'secret')] == ['PHPSESSID', '__cf_bm', '_ga']
+
+
+def test_login_cookie_expiry_ends_the_cached_login():
+    cache = SessionCache(ttl=1800)
+    cache.store('user', 'secret', [{'name': 'PHPSESSID', 'value': 'abc', 'path': '/', 'expiry': time.time() - 1}])
+    assert cache.load('user', 'secret') is None
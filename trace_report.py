@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Time attribution report for WebDriver command traces (see command_trace.py)
+Prints a per-step breakdown of where the time went (chromedriver round-trips,
+scripts, in-page waits, CDP calls, sleeps, and explicit waits/Python between
+commands) plus the slowest commands, and optionally writes a folded-stack file
+for flamegraph.pl or speedscope.
+
+    python trace_report.py traces/*.jsonl --folded checkout.folded
+"""
+
+import argparse
+import json
+from collections import defaultdict
+
+# Column order of the breakdown; 'wait' is span time not covered by any command or sleep
+CATEGORIES = ('webdriver', 'script', 'async_script', 'cdp', 'sleep', 'wait')
+NO_STEP = '(no step)'
+
+
+def category(record):
+    """Which breakdown column a command or sleep record counts towards"""
+    if record['k'] == 'sleep':
+        return 'sleep'
+    name = record['n']
+    if name == 'executeScript':
+        return 'script'
+    if name == 'executeAsyncScript':
+        # In-page waits: readiness checks and the consent dialog observer
+        return 'async_script'
+    if name.startswith('cdp:'):
+        return 'cdp'
+    return 'webdriver'
+
+
+def load_trace(path):
+    """Records of one trace file, without its header line"""
+    with open(path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return [record for record in records if record['k'] != 'trace']
+
+
+def self_times(records):
+    """Span id -> span duration minus the time of its direct children"""
+    child_ms = defaultdict(float)
+    for record in records:
+        child_ms[record['u']] += record['d']
+    return {record['id']: max(0.0, record['d'] - child_ms[record['id']]) for record in records if record['k'] == 'span'}
+
+
+def breakdown(traces):
+    """Per-step totals by category, command counts and iterations seen"""
+    steps = defaultdict(lambda: {'total_ms': 0.0, 'commands': 0, 'iterations': set(),
+                                 **{name: 0.0 for name in CATEGORIES}})
+    for records in traces:
+        own = self_times(records)
+        for record in records:
+            row = steps[record['s'] or NO_STEP]
+            if record['i'] is not None:
+                row['iterations'].add(record['i'])
+            if record['k'] == 'span':
+                row['wait'] += own[record['id']]
+                row['total_ms'] += own[record['id']]
+                continue
+            row[category(record)] += record['d']
+            row['total_ms'] += record['d']
+            if record['k'] == 'cmd':
+                row['commands'] += 1
+    return steps
+
+
+def command_stats(traces):
+    """Command name -> (count, total ms, failures)"""
+    stats = defaultdict(lambda: [0, 0.0, 0])
+    for records in traces:
+        for record in records:
+            if record['k'] == 'cmd':
+                entry = stats[record['n']]
+                entry[0] += 1
+                entry[1] += record['d']
+                entry[2] += 1 if record.get('e') else 0
+    return stats
+
+
+def folded_stacks(traces, root='job'):
+    """'frame;frame;... microseconds' lines, one per distinct stack, self time only"""
+    totals = defaultdict(int)
+    for records in traces:
+        spans = {record['id']: record for record in records if record['k'] == 'span'}
+        own = self_times(records)
+
+        def path(span_id):
+            frames = []
+            while span_id in spans:
+                frames.append(spans[span_id]['n'])
+                span_id = spans[span_id]['u']
+            return [root] + frames[::-1]
+
+        for record in records:
+            if record['k'] == 'span':
+                totals[';'.join(path(record['id']))] += round(own[record['id']] * 1000)
+            else:
+                totals[';'.join(path(record['u']) + [record['n']])] += round(record['d'] * 1000)
+    return [f'{stack} {value}' for stack, value in sorted(totals.items()) if value > 0]
+
+
+def print_report(steps, commands, top=10):
+    header = f"{'step':<18}{'iters':>6}{'total ms':>11}{'ms/iter':>9}{'cmds':>6}" + ''.join(f'{name:>13}' for name in CATEGORIES)
+    print(header)
+    print('-' * len(header))
+    grand_total = sum(row['total_ms'] for row in steps.values()) or 1.0
+    for name, row in sorted(steps.items(), key=lambda item: -item[1]['total_ms']):
+        iterations = len(row['iterations']) or 1
+        print(f"{name:<18}{len(row['iterations']):>6}{row['total_ms']:>11.1f}{row['total_ms'] / iterations:>9.1f}"
+              f"{row['commands']:>6}" + ''.join(f'{row[column]:>13.1f}' for column in CATEGORIES))
+    print()
+    print('Share of traced time: ' + ', '.join(
+        f"{column} {100 * sum(row[column] for row in steps.values()) / grand_total:.1f}%" for column in CATEGORIES))
+    print()
+    print(f"Slowest commands (top {top} by total time):")
+    for name, (count, total_ms, failures) in sorted(commands.items(), key=lambda item: -item[1][1])[:top]:
+        failed = f", {failures} failed" if failures else ''
+        print(f"  {name:<28}{count:>6} calls {total_ms:>10.1f} ms total {total_ms / count:>8.2f} ms mean{failed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarise WebDriver command traces')
+    parser.add_argument('traces', nargs='+', help='JSONL trace files written with TRACE_DIR set')
+    parser.add_argument('--folded', help='write flamegraph-compatible folded stacks (microseconds) to this file')
+    parser.add_argument('--top', type=int, default=10, help='number of commands to list')
+    parser.add_argument('--json', action='store_true', help='print the breakdown as JSON')
+    args = parser.parse_args()
+
+    traces = [load_trace(path) for path in args.traces]
+    steps = breakdown(traces)
+    commands = command_stats(traces)
+
+    if args.json:
+        print(json.dumps({
+            'steps': {name: dict(row, iterations=sorted(row['iterations'])) for name, row in steps.items()},
+            'commands': {name: {'count': count, 'total_ms': round(total_ms, 3), 'failures': failures}
+                         for name, (count, total_ms, failures) in commands.items()},
+        }, indent=2))
+    else:
+        print_report(steps, commands, args.top)
+
+    if args.folded:
+        with open(args.folded, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(folded_stacks(traces)) + '\n')
+        if not args.json:
+            print(f"Folded stacks written to {args.folded}")
+
+
+if __name__ == '__main__':
+    main()